@@ -1,41 +1,993 @@
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-import subprocess
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    # Sin el paquete zstandard las respuestas solo se comprimen con gzip
+    zstandard = None
+
+from genProyTree_v2 import (FORMATS, ProjectTreeGenerator, ScanCache, ScanCancelled, ScanTimeout,
+                            TreeNode, TreeWatcher, failed_batch_result, iter_output, scan_batch_root,
+                            split_patterns, summarize_batch)
+
+# Pool acotado para el trabajo bloqueante de sistema de ficheros: el event loop
+# nunca escanea directorios, solo espera a que termine un worker.
+MAX_WORKERS = int(os.environ.get('TREE_MAX_WORKERS', min(4, os.cpu_count() or 1)))
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='tree')
+# Pool aparte para el trabajo corto de servir desde la caché (un stat por directorio,
+# comprimir, calcular el ETag): un acierto no espera detrás de escaneos largos
+CACHE_WORKERS = int(os.environ.get('TREE_CACHE_WORKERS', 2))
+cache_executor = ThreadPoolExecutor(max_workers=CACHE_WORKERS, thread_name_prefix='tree-cache')
+# Límite de hilos de escaneo que puede pedir una sola petición ("jobs")
+MAX_SCAN_JOBS = int(os.environ.get('TREE_MAX_SCAN_JOBS', 16))
+# Caché persistente de listados compartida por todas las peticiones (opcional)
+CACHE_DIR = os.environ.get('TREE_CACHE_DIR')
+# Un trozo del streaming se envía al llegar a este tamaño o tras este tiempo
+STREAM_CHUNK_BYTES = 64 * 1024
+STREAM_CHUNK_DELAY = 0.05
+# Caché de resultados en memoria: entradas, bytes totales y vida máxima (0 = sin TTL)
+RESULT_CACHE_ENTRIES = int(os.environ.get('TREE_RESULT_CACHE_ENTRIES', 64))
+RESULT_CACHE_BYTES = int(os.environ.get('TREE_RESULT_CACHE_BYTES', 64 * 1024 * 1024))
+RESULT_CACHE_TTL = float(os.environ.get('TREE_RESULT_CACHE_TTL', 60))
+# Conexiones de /tree/watch simultáneas (cada una mantiene un hilo y sus watches)
+MAX_WATCHERS = int(os.environ.get('TREE_MAX_WATCHERS', 8))
+# Segundos sin cambios tras los que se envía un comentario keepalive por SSE
+WATCH_KEEPALIVE = 15.0
+# Entradas por página de /tree/children (por defecto y máximo que se puede pedir)
+CHILDREN_PAGE_SIZE = 200
+CHILDREN_MAX_PAGE_SIZE = 5000
+# Listados filtrados de /tree/children que se conservan para paginar sin volver a listar
+CHILDREN_CACHE_ENTRIES = int(os.environ.get('TREE_CHILDREN_CACHE_ENTRIES', 8))
+# Plazo de cada petición síncrona a /tree
+REQUEST_TIMEOUT = float(os.environ.get('TREE_REQUEST_TIMEOUT', 120))
+# Trabajos de /tree/jobs: escaneos simultáneos (límite global), en cola,
+# plazo por defecto y máximo, y tiempo que se conservan los terminados
+MAX_JOBS = int(os.environ.get('TREE_MAX_JOBS', 2))
+MAX_QUEUED_JOBS = int(os.environ.get('TREE_MAX_QUEUED_JOBS', 16))
+JOB_TIMEOUT = float(os.environ.get('TREE_JOB_TIMEOUT', 300))
+JOB_RETENTION = float(os.environ.get('TREE_JOB_RETENTION', 600))
+job_executor = ThreadPoolExecutor(max_workers=MAX_JOBS, thread_name_prefix='tree-job')
+# /tree/batch: procesos para repartir las raíces (el pool se crea con la primera
+# petición) y raíces admitidas por petición
+BATCH_PROCESSES = int(os.environ.get('TREE_BATCH_PROCESSES', os.cpu_count() or 1))
+MAX_BATCH_PATHS = int(os.environ.get('TREE_BATCH_MAX_PATHS', 64))
+batch_pool: Optional[ProcessPoolExecutor] = None
+# Límites en segundos de los histogramas de /metrics
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Compresión de las respuestas de /tree: tamaño mínimo del cuerpo y niveles
+COMPRESS_MIN_BYTES = int(os.environ.get('TREE_COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+# Codificación -> (crear compresor, modo de vaciado al final de cada bloque en
+# streaming), por orden de preferencia
+COMPRESSORS = {'gzip': (lambda: zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31), zlib.Z_SYNC_FLUSH)}
+if zstandard is not None:
+    COMPRESSORS = {
+        'zstd': (lambda: zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj(),
+                 zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+        **COMPRESSORS,
+    }
+BOOLEAN_OPTIONS = ('show_hidden', 'show_sizes', 'debug', 'debug_full', 'gitignore', 'follow_symlinks',
+                   'one_file_system')
+
+
+
+class CachedTree:
+    """Salida de /tree con su ETag y las respuestas comprimidas ya calculadas.
+    
+    bodies guarda los cuerpos comprimidos por (es JSON, codificación), para no
+    volver a comprimir la misma salida en cada refresco.
+    """
+    
+    __slots__ = ('key', 'output', 'dir_mtimes', 'etag', 'created', 'bodies')
+    
+    def __init__(self, key: str, output: str, dir_mtimes: Dict[str, int], etag: str):
+        self.key = key
+        self.output = output
+        self.dir_mtimes = dir_mtimes
+        self.etag = etag
+        self.created = time.monotonic()
+        self.bodies: Dict[Tuple[bool, str], bytes] = {}
+
+
+class ResultCache:
+    """Caché LRU de salidas de /tree, acotada en número de entradas y en bytes.
+    
+    Cada entrada guarda el mtime de todos los directorios escaneados: se sirve
+    solo si siguen igual (altas, bajas y renombrados) y no ha vencido el TTL,
+    que cubre los cambios de contenido que no tocan ningún directorio.
+    Solo se usa desde el event loop, así que no necesita cerrojos.
+    """
+    
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()
+        self.total_bytes = 0
+        # Escaneos en curso por clave, para que las peticiones idénticas esperen al mismo
+        self.inflight: Dict[str, asyncio.Task] = {}
+        self.counters = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'coalesced': 0}
+    
+    @staticmethod
+    def make_key(path: str, config: Dict) -> str:
+        options = {k: v for k, v in config.items() if k != 'cache_dir'}
+        return json.dumps([os.path.abspath(path), options], sort_keys=True)
+    
+    @staticmethod
+    def is_fresh(dir_mtimes: Dict[str, int]) -> bool:
+        """Comprueba con un stat por directorio que nada ha cambiado (bloqueante)"""
+        for path, mtime in dir_mtimes.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    return False
+            except OSError:
+                return False
+        return True
+    
+    async def get(self, key: str) -> Optional[CachedTree]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.counters['misses'] += 1
+            return None
+        expired = self.ttl > 0 and time.monotonic() - entry.created > self.ttl
+        loop = asyncio.get_running_loop()
+        if expired or not await loop.run_in_executor(cache_executor, self.is_fresh, entry.dir_mtimes):
+            self.counters['stale'] += 1
+            self.counters['misses'] += 1
+            self.discard(key)
+            return None
+        self.counters['hits'] += 1
+        self.entries.move_to_end(key)
+        return entry
+    
+    @staticmethod
+    def entry_size(entry: CachedTree) -> int:
+        return len(entry.output.encode('utf-8')) + sum(len(body) for body in entry.bodies.values())
+    
+    def put(self, entry: CachedTree):
+        size = self.entry_size(entry)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        self.discard(entry.key)
+        self.entries[entry.key] = entry
+        self.total_bytes += size
+        self.trim()
+    
+    def add_body(self, entry: CachedTree, variant: Tuple[bool, str], body: bytes):
+        """Guarda una respuesta comprimida de una entrada (solo si sigue en la caché)"""
+        if self.entries.get(entry.key) is not entry or variant in entry.bodies:
+            return
+        entry.bodies[variant] = body
+        self.total_bytes += len(body)
+        self.trim()
+    
+    def trim(self):
+        while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self.discard(oldest)
+            self.counters['evictions'] += 1
+    
+    def discard(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= self.entry_size(entry)
+    
+    def info(self) -> Dict:
+        return {
+            **self.counters,
+            'entries': len(self.entries),
+            'bytes': self.total_bytes,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl': self.ttl,
+        }
+
+
+class Metrics:
+    """Métricas agregadas de todas las peticiones, en el formato de texto de Prometheus.
+    
+    Los workers del pool las actualizan al terminar cada árbol, así que todo
+    pasa por un cerrojo.
+    """
+    
+    HELP = {
+        'tree_request_seconds': ('histogram', 'Tiempo total de generación de un árbol'),
+        'tree_phase_seconds': ('histogram', 'Tiempo por fase de cada árbol generado'),
+        'tree_requests_total': ('counter', 'Árboles generados por formato y resultado'),
+        'tree_entries_total': ('counter', 'Entradas procesadas en los escaneos'),
+        'tree_rendered_bytes_total': ('counter', 'Bytes de salida renderizados'),
+        'tree_result_cache_events_total': ('counter', 'Eventos de la caché de resultados'),
+        'tree_result_cache_entries': ('gauge', 'Entradas en la caché de resultados'),
+        'tree_active_watchers': ('gauge', 'Conexiones abiertas de /tree/watch'),
+        'tree_jobs': ('gauge', 'Trabajos de /tree/jobs por estado'),
+        'tree_response_bytes_total': ('counter', 'Bytes de cuerpo enviados por /tree por codificación'),
+        'tree_not_modified_total': ('counter', 'Respuestas 304 de /tree (el cliente ya tenía la salida)'),
+    }
+    
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # (métrica, etiquetas) -> [cuenta por límite..., suma, total]
+        self.histograms: Dict[Tuple[str, str], list] = {}
+        self.counters: Dict[Tuple[str, str], float] = {}
+    
+    @staticmethod
+    def labels(**values) -> str:
+        return ','.join(f'{key}="{value}"' for key, value in values.items())
+    
+    def observe(self, name: str, labels: str, value: float):
+        with self.lock:
+            histogram = self.histograms.setdefault((name, labels), [0] * (len(self.buckets) + 2))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+    
+    def increment(self, name: str, labels: str = '', amount: float = 1):
+        with self.lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + amount
+    
+    def observe_tree(self, generator: ProjectTreeGenerator, elapsed: float, error: bool = False):
+        """Registra un árbol terminado con el desglose por fases del generador"""
+        self.observe_report(generator.config['format'], generator.profile_report(), elapsed, error)
+    
+    def observe_report(self, output_format: str, report: Dict, elapsed: float, error: bool = False):
+        """Registra un árbol a partir de su profile_report (p. ej. uno generado en otro proceso)"""
+        self.increment('tree_requests_total', self.labels(format=output_format, result='error' if error else 'ok'))
+        if error:
+            return
+        self.observe('tree_request_seconds', self.labels(format=output_format), elapsed)
+        for phase, seconds in report['phases'].items():
+            self.observe('tree_phase_seconds', self.labels(phase=phase), seconds)
+        self.increment('tree_entries_total', amount=report['entries'])
+        self.increment('tree_rendered_bytes_total', amount=report['rendered_bytes'])
+    
+    def render(self, gauges: Dict[Tuple[str, str], float]) -> str:
+        with self.lock:
+            samples = {}
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                lines = samples.setdefault(name, [])
+                prefix = f'{labels},' if labels else ''
+                for bound, count in zip(self.buckets, histogram):
+                    lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram[-1]}')
+                suffix = f'{{{labels}}}' if labels else ''
+                lines.append(f'{name}_sum{suffix} {histogram[-2]}')
+                lines.append(f'{name}_count{suffix} {histogram[-1]}')
+            for (name, labels), value in sorted({**self.counters, **gauges}.items()):
+                samples.setdefault(name, []).append(f'{name}{{{labels}}} {value}' if labels else f'{name} {value}')
+        
+        text = []
+        for name, (kind, description) in self.HELP.items():
+            if name in samples:
+                text.append(f'# HELP {name} {description}')
+                text.append(f'# TYPE {name} {kind}')
+                text.extend(samples[name])
+        return '\n'.join(text) + '\n'
+
+
+result_cache = ResultCache(RESULT_CACHE_ENTRIES, RESULT_CACHE_BYTES, RESULT_CACHE_TTL)
+# clave -> (mtime del directorio, instante, listado); se usa desde los workers
+children_cache: OrderedDict = OrderedDict()
+children_cache_lock = threading.Lock()
+active_watchers = 0
+metrics = Metrics(METRIC_BUCKETS)
 
 app = FastAPI()
 
 # Servimos archivos estáticos (el HTML)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+
+def build_request_config(data: Dict) -> Dict:
+    """Traduce el cuerpo de /tree a la configuración que usaría la CLI"""
+    output_format = data.get("format", "ascii")
+    if output_format not in FORMATS:
+        raise ValueError(f"Formato no soportado: {output_format}")
+    return {
+        'format': output_format,
+        'ignore_dirs': split_patterns(data.get("ignore_dirs", "")),
+        'ignore_files': split_patterns(data.get("ignore_files", "")),
+        'gitignore': bool(data.get("gitignore")),
+        'max_depth': int(data.get("max_depth", 0)),
+        'follow_symlinks': bool(data.get("follow_symlinks", True)),
+        'one_file_system': bool(data.get("one_file_system")),
+        'jobs': min(max(1, int(data.get("jobs", 1))), MAX_SCAN_JOBS),
+        # Resumen de los N más grandes en vez del árbol (0 = árbol completo)
+        'top': max(0, int(data.get("top", 0))),
+        # Anotar archivos duplicados (lee el contenido de los candidatos)
+        'find_duplicates': bool(data.get("find_duplicates")),
+        'cache_dir': CACHE_DIR,
+        # Tiempos por fase para /metrics
+        'profile': True,
+        # JSON sin indentación: bastante más pequeño en árboles grandes
+        'compact': bool(data.get("compact")),
+        'track_mtimes': True,
+        'show_hidden': bool(data.get("show_hidden")),
+        'show_sizes': bool(data.get("show_sizes", True)),
+        'debug': bool(data.get("debug") or data.get("debug_full")),
+        'debug_full': bool(data.get("debug_full")),
+        'stats': False,
+        'show_config': False,
+        'project_name': data.get("project_name") or None,
+    }
+
+
+def tree_validator(key: str, generator: ProjectTreeGenerator) -> str:
+    """ETag débil de una salida de /tree.
+    
+    Resume la petición, el mtime de cada directorio escaneado, el
+    (mtime_ns, tamaño) de cada archivo (files_digest) y los totales de
+    archivos y bytes, no la salida: el Markdown lleva la hora de generación,
+    y un árbol sin cambios debe conservar su ETag aunque se vuelva a
+    renderizar. Es débil porque dos salidas equivalentes pueden no ser
+    idénticas byte a byte.
+    """
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16)
+    for path, mtime in sorted(generator.dir_mtimes.items()):
+        digest.update(f'{path}\0{mtime}\0'.encode('utf-8', 'surrogateescape'))
+    # Reescribir un archivo no cambia el mtime de su directorio ni, si otro
+    # compensa el tamaño, los totales
+    if generator.files_digest is not None:
+        digest.update(generator.files_digest.to_bytes(16, 'big'))
+    digest.update(f"{generator.stats['total_files']}\0{generator.stats['total_size']}".encode())
+    return f'W/"{digest.hexdigest()}"'
+
+
+def render_tree(path: str, config: Dict) -> CachedTree:
+    """Genera el árbol en proceso con la misma salida que imprime la CLI.
+    
+    Devuelve también el mtime de los directorios escaneados para la caché.
+    """
+    generator = ProjectTreeGenerator(config)
+    generator.deadline = time.monotonic() + REQUEST_TIMEOUT
+    start = time.perf_counter()
+    try:
+        output = ''.join(iter_output(generator, path))
+    except Exception:
+        metrics.observe_tree(generator, time.perf_counter() - start, error=True)
+        raise
+    finally:
+        generator.close()
+    metrics.observe_tree(generator, time.perf_counter() - start)
+    key = result_cache.make_key(path, config)
+    return CachedTree(key, output, generator.dir_mtimes, tree_validator(key, generator))
+
+
+async def cached_render(path: str, config: Dict) -> CachedTree:
+    """Sirve desde la caché o escanea, uniendo las peticiones idénticas en curso"""
+    key = result_cache.make_key(path, config)
+    entry = await result_cache.get(key)
+    if entry is not None:
+        return entry
+    
+    task = result_cache.inflight.get(key)
+    if task is not None:
+        result_cache.counters['coalesced'] += 1
+    else:
+        async def scan():
+            try:
+                loop = asyncio.get_running_loop()
+                entry = await loop.run_in_executor(executor, render_tree, path, config)
+                result_cache.put(entry)
+                return entry
+            finally:
+                del result_cache.inflight[key]
+        
+        task = asyncio.ensure_future(scan())
+        result_cache.inflight[key] = task
+    # El plazo del generador se comprueba en cada directorio; este cubre además
+    # una llamada al sistema bloqueada (un montaje colgado) para no retener al cliente
+    return await asyncio.wait_for(asyncio.shield(task), REQUEST_TIMEOUT + 1)
+
+
+def next_batch(chunks: Iterator[str]) -> Optional[str]:
+    """Agrupa trozos de salida hasta llenar un bloque o agotar el tiempo de espera"""
+    parts = []
+    size = 0
+    deadline = time.monotonic() + STREAM_CHUNK_DELAY
+    for chunk in chunks:
+        parts.append(chunk)
+        size += len(chunk)
+        if size >= STREAM_CHUNK_BYTES or time.monotonic() >= deadline:
+            break
+    return ''.join(parts) if parts else None
+
+
+def close_output(chunks: Iterator[str], generator: ProjectTreeGenerator):
+    """Cierra un recorrido en streaming: confirma la caché de escaneo y suelta su conexión"""
+    chunks.close()
+    generator.close()
+
+
+def accepted_encoding(header: str) -> Optional[str]:
+    """La codificación de COMPRESSORS preferida que admite un Accept-Encoding, o None"""
+    accepted = {}
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in COMPRESSORS:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    compressor = COMPRESSORS[encoding][0]()
+    return compressor.compress(body) + compressor.flush()
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Comparación débil de If-None-Match, como pide RFC 9110 para GET y HEAD"""
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    return any((tag[2:] if tag.startswith('W/') else tag) == opaque
+               for tag in (part.strip() for part in header.split(',')))
+
+
+async def tree_response(request: Request, entry: CachedTree, as_json: bool = True) -> Response:
+    """Respuesta de /tree con su ETag.
+    
+    Es un 304 sin cuerpo si el cliente ya tiene esa salida; si no, se comprime
+    con la codificación que acepte en cuanto pasa de COMPRESS_MIN_BYTES.
+    """
+    headers = {'ETag': entry.etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+    if etag_matches(request.headers.get('if-none-match'), entry.etag):
+        metrics.increment('tree_not_modified_total')
+        return Response(status_code=304, headers=headers)
+    
+    if as_json:
+        body = json.dumps({"output": entry.output}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    else:
+        body = entry.output.encode('utf-8')
+    encoding = accepted_encoding(request.headers.get('accept-encoding', ''))
+    if encoding is not None and len(body) >= COMPRESS_MIN_BYTES:
+        variant = (as_json, encoding)
+        compressed = entry.bodies.get(variant)
+        if compressed is None:
+            loop = asyncio.get_running_loop()
+            compressed = await loop.run_in_executor(cache_executor, compress_body, body, encoding)
+            result_cache.add_body(entry, variant, compressed)
+        body = compressed
+        headers['Content-Encoding'] = encoding
+    else:
+        encoding = 'identity'
+    metrics.increment('tree_response_bytes_total', Metrics.labels(encoding=encoding), len(body))
+    media_type = 'application/json' if as_json else 'text/plain; charset=utf-8'
+    return Response(body, media_type=media_type, headers=headers)
+
+
+async def stream_tree(request: Request, path: str, config: Dict):
+    """Devuelve una respuesta que emite el árbol mientras se escanea.
+    
+    El primer bloque se genera antes de responder para que los errores de
+    ruta o formato sigan devolviendo un 400. Si el cliente lo acepta, cada
+    bloque se comprime y se vacía al enviarse, así que sigue llegando a
+    medida que se escanea. El ETag solo se conoce al final: se envía cuando
+    la misma petición se sirve desde la caché.
+    """
+    # Texto plano y no el JSON de /tree: entrada y ETag propios, para que un
+    # If-None-Match de una representación no valide la otra
+    key = result_cache.make_key(path, {**config, 'stream': True})
+    entry = await result_cache.get(key)
+    if entry is not None:
+        return await tree_response(request, entry, as_json=False)
+    
+    loop = asyncio.get_running_loop()
+    generator = ProjectTreeGenerator(config)
+    generator.deadline = time.monotonic() + REQUEST_TIMEOUT
+    chunks = iter_output(generator, path)
+    start = time.perf_counter()
+    try:
+        first = await loop.run_in_executor(executor, next_batch, chunks)
+    except Exception:
+        metrics.observe_tree(generator, time.perf_counter() - start, error=True)
+        close_output(chunks, generator)
+        raise
+    
+    encoding = accepted_encoding(request.headers.get('accept-encoding', ''))
+    if encoding is not None:
+        compressor = COMPRESSORS[encoding][0]()
+        flush_mode = COMPRESSORS[encoding][1]
+    
+    async def body():
+        # Se guarda una copia para la caché mientras no supere su límite de bytes
+        parts = []
+        size = 0
+        sent = 0
+        batch = first
+        future = None
+        try:
+            while batch is not None:
+                data = batch.encode('utf-8')
+                if encoding is not None:
+                    data = compressor.compress(data) + compressor.flush(flush_mode)
+                sent += len(data)
+                yield data
+                if parts is not None:
+                    parts.append(batch)
+                    size += len(batch)
+                    if size > result_cache.max_bytes:
+                        parts = None
+                future = executor.submit(next_batch, chunks)
+                batch = await asyncio.wrap_future(future)
+        finally:
+            # Si el cliente se desconecta a medias el bloque en curso puede seguir en
+            # el pool: se cancela el escaneo y se cierra cuando ese bloque termine
+            if batch is not None:
+                generator.cancel()
+            if future is None:
+                close_output(chunks, generator)
+            else:
+                future.add_done_callback(lambda _: close_output(chunks, generator))
+        if encoding is not None:
+            data = compressor.flush()
+            sent += len(data)
+            yield data
+        metrics.increment('tree_response_bytes_total', Metrics.labels(encoding=encoding or 'identity'), sent)
+        # En streaming el tiempo total incluye la espera al cliente; las fases no
+        metrics.observe_tree(generator, time.perf_counter() - start)
+        if parts is not None:
+            etag = await loop.run_in_executor(cache_executor, tree_validator, key, generator)
+            result_cache.put(CachedTree(key, ''.join(parts), generator.dir_mtimes, etag))
+    
+    headers = {'Vary': 'Accept-Encoding'}
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8", headers=headers)
+
+
 @app.post("/tree")
 async def tree(request: Request):
     data = await request.json()
     path = data.get("path", ".")
-    output_format = data.get("format", "ascii")
-    cmd = [
-        "python3", "genProyTree_v2.py", path,
-        "--format", output_format,
-        "--ignore-dirs", data.get("ignore_dirs", ""),
-        "--ignore-files", data.get("ignore_files", ""),
-        "--max-depth", str(data.get("max_depth", 0)),
-    ]
-    if data.get("show_hidden"):
-        cmd.append("--show-hidden")
-    if data.get("show_sizes", True):
-        cmd.append("--show-sizes")
-    if data.get("debug"):
-        cmd.append("--debug")
-    if data.get("project_name"):
-        cmd += ["--project-name", data["project_name"]]
-
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    if proc.returncode != 0:
-        return JSONResponse(content={"error": proc.stderr}, status_code=400)
-    return {"output": proc.stdout}
+    try:
+        config = build_request_config(data)
+        if data.get("stream"):
+            return await stream_tree(request, path, config)
+        entry = await cached_render(path, config)
+    except (ScanTimeout, asyncio.TimeoutError):
+        return JSONResponse(content={"error": f"El escaneo superó el límite de {REQUEST_TIMEOUT:g}s; "
+                                              "usa /tree/jobs para escaneos largos"}, status_code=504)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return await tree_response(request, entry)
+
+
+class TreeJob:
+    """Escaneo lanzado con POST /tree/jobs, que se consulta y cancela por su id.
+    
+    Se ejecuta en job_executor, cuyo tamaño es el límite global de escaneos
+    simultáneos. La cancelación y el plazo son cooperativos (se comprueban en
+    cada directorio); si una llamada al sistema se queda bloqueada, el trabajo
+    se da por vencido igualmente y su hilo queda ocupado hasta que vuelva.
+    """
+    
+    FINISHED = ('done', 'error', 'cancelled', 'timeout')
+    
+    def __init__(self, path: str, config: Dict, timeout: float):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.timeout = timeout
+        # El plazo empieza a contar al salir de la cola, en run()
+        self.generator = ProjectTreeGenerator(config)
+        self.lock = threading.Lock()
+        self.status = 'queued'
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.output: Optional[str] = None
+        self.error: Optional[str] = None
+    
+    def finish(self, status: str, output: Optional[str] = None, error: Optional[str] = None) -> bool:
+        """Pasa a un estado final; False si el trabajo ya había terminado"""
+        with self.lock:
+            if self.status in self.FINISHED:
+                return False
+            self.status = status
+            self.output = output
+            self.error = error
+            self.finished = time.time()
+            return True
+    
+    def run(self):
+        with self.lock:
+            if self.status != 'queued':
+                return
+            self.status = 'running'
+            self.started = time.time()
+            self.generator.deadline = time.monotonic() + self.timeout
+        start = time.perf_counter()
+        try:
+            # Se comprueba también entre trozos: renderizar un árbol enorme ya escaneado
+            # no pasa por ningún directorio
+            self.generator.check_cancelled()
+            parts = []
+            for chunk in iter_output(self.generator, self.path):
+                parts.append(chunk)
+                self.generator.check_cancelled()
+            finished = self.finish('done', output=''.join(parts))
+        except ScanTimeout as e:
+            finished = self.finish('timeout', error=str(e))
+        except ScanCancelled as e:
+            finished = self.finish('cancelled', error=str(e))
+        except Exception as e:
+            finished = self.finish('error', error=str(e))
+        finally:
+            self.generator.close()
+        if finished:
+            metrics.observe_tree(self.generator, time.perf_counter() - start, error=self.status != 'done')
+    
+    def cancel(self):
+        self.generator.cancel()
+        self.finish('cancelled', error="Escaneo cancelado")
+    
+    def refresh(self):
+        """Da por vencido un trabajo que sigue en marcha pasado su plazo (llamada bloqueada)"""
+        deadline = self.generator.deadline
+        if self.status == 'running' and deadline is not None and time.monotonic() > deadline:
+            self.generator.cancel()
+            self.finish('timeout', error="El escaneo superó su tiempo máximo")
+    
+    def info(self, include_output: bool = True) -> Dict:
+        self.refresh()
+        end = self.finished or time.time()
+        data = {
+            'id': self.id,
+            'status': self.status,
+            'path': self.path,
+            'format': self.generator.config['format'],
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'elapsed': round(end - self.started, 3) if self.started else 0,
+            'timeout': self.timeout,
+            'progress': self.generator.progress(),
+            'error': self.error,
+        }
+        if include_output and self.status == 'done':
+            data['output'] = self.output
+        return data
+
+
+# Trabajos por id en orden de creación; solo se tocan desde el event loop
+jobs: OrderedDict = OrderedDict()
+
+
+def purge_jobs():
+    """Olvida los trabajos terminados hace más de JOB_RETENTION segundos"""
+    now = time.time()
+    for job_id in [job_id for job_id, job in jobs.items()
+                   if job.finished is not None and now - job.finished > JOB_RETENTION]:
+        del jobs[job_id]
+
+
+# Trabajos enviados a job_executor que aún no han vuelto; solo se tocan desde el
+# event loop. Uno vencido o cancelado sigue aquí mientras su hilo esté bloqueado
+job_futures: Set[Future] = set()
+
+
+def active_jobs() -> int:
+    job_futures.difference_update([future for future in job_futures if future.done()])
+    return len(job_futures)
+
+
+@app.post("/tree/jobs")
+async def create_job(request: Request):
+    """Lanza un escaneo en segundo plano y devuelve su id sin esperar al resultado"""
+    data = await request.json()
+    path = data.get("path", ".")
+    purge_jobs()
+    for job in jobs.values():
+        job.refresh()
+    if active_jobs() >= MAX_JOBS + MAX_QUEUED_JOBS:
+        return JSONResponse(content={"error": "Demasiados escaneos en curso, inténtalo más tarde"},
+                            status_code=429, headers={"Retry-After": "5"})
+    try:
+        config = build_request_config(data)
+        timeout = min(float(data.get("timeout") or JOB_TIMEOUT), JOB_TIMEOUT)
+        if timeout <= 0:
+            raise ValueError("El plazo debe ser positivo")
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    
+    job = TreeJob(path, config, timeout)
+    jobs[job.id] = job
+    job_futures.add(job_executor.submit(job.run))
+    return JSONResponse(content=job.info(), status_code=202,
+                        headers={"Location": f"/tree/jobs/{job.id}"})
+
+
+@app.get("/tree/jobs")
+async def list_jobs():
+    """Estado de todos los trabajos conservados (sin la salida)"""
+    purge_jobs()
+    return {"jobs": [job.info(include_output=False) for job in jobs.values()],
+            "max_jobs": MAX_JOBS, "max_queued_jobs": MAX_QUEUED_JOBS}
+
+
+@app.get("/tree/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Progreso en vivo (entradas, directorio actual) y la salida cuando termina"""
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": f"No existe el trabajo {job_id}"}, status_code=404)
+    return job.info()
+
+
+@app.delete("/tree/jobs/{job_id}")
+async def delete_job(job_id: str):
+    """Cancela un trabajo en curso, o olvida uno terminado"""
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": f"No existe el trabajo {job_id}"}, status_code=404)
+    if job.status in TreeJob.FINISHED:
+        del jobs[job_id]
+    else:
+        job.cancel()
+    return job.info(include_output=False)
+
+
+def get_batch_pool() -> ProcessPoolExecutor:
+    """Pool de procesos de /tree/batch, creado la primera vez que se usa"""
+    global batch_pool
+    if batch_pool is None:
+        # spawn y no fork: un fork del servidor heredaría cerrojos tomados por otros hilos
+        batch_pool = ProcessPoolExecutor(max_workers=BATCH_PROCESSES,
+                                         mp_context=multiprocessing.get_context('spawn'))
+    return batch_pool
+
+
+def discard_batch_pool(pool: ProcessPoolExecutor):
+    """Olvida un pool roto (murió uno de sus procesos) para que el siguiente lote cree otro"""
+    global batch_pool
+    if batch_pool is pool:
+        batch_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_batch_root(pool: ProcessPoolExecutor, path: str, config: Dict) -> Dict:
+    # Un pool ya roto falla al enviar: así el error llega a gather como el de cualquier raíz
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, scan_batch_root, path, config, None, REQUEST_TIMEOUT)
+
+
+@app.post("/tree/batch")
+async def tree_batch(request: Request):
+    """Genera el árbol de varias raíces repartidas en el pool de procesos"""
+    data = await request.json()
+    paths = data.get("paths")
+    if not isinstance(paths, list) or not paths or not all(isinstance(path, str) for path in paths):
+        return JSONResponse(content={"error": "Se esperaba 'paths' con una lista de rutas"}, status_code=400)
+    if len(paths) > MAX_BATCH_PATHS:
+        return JSONResponse(content={"error": f"Como máximo {MAX_BATCH_PATHS} rutas por lote"}, status_code=400)
+    try:
+        config = {**build_request_config(data), 'track_mtimes': False}
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    
+    pool = get_batch_pool()
+    start = time.perf_counter()
+    # Cada raíz tiene su propio plazo, que empieza al salir de la cola del pool; el
+    # lote entero tiene otro, como /tree, para no retener al cliente con raíces
+    # encoladas o una llamada al sistema bloqueada. Los errores vuelven en su resultado
+    tasks = [asyncio.ensure_future(run_batch_root(pool, path, config)) for path in paths]
+    _, pending = await asyncio.wait(tasks, timeout=REQUEST_TIMEOUT + 1)
+    for task in pending:
+        # Las que siguen en la cola no llegan a ejecutarse
+        task.cancel()
+    results = []
+    for path, task in zip(paths, tasks):
+        if task in pending:
+            result = failed_batch_result(path, f"El lote superó el límite de {REQUEST_TIMEOUT:g}s")
+            result['status'] = 'timeout'
+        elif task.exception() is not None:
+            if isinstance(task.exception(), BrokenProcessPool):
+                discard_batch_pool(pool)
+            result = failed_batch_result(path, str(task.exception()) or type(task.exception()).__name__)
+        else:
+            result = task.result()
+        results.append(result)
+    summary = summarize_batch(results, time.perf_counter() - start)
+    for result in results:
+        metrics.observe_report(config['format'], result.pop('profile', None), result['seconds'],
+                               error=result['status'] != 'ok')
+    return {"results": results, "summary": summary}
+
+def query_options(params) -> Dict:
+    """Convierte los parámetros de la URL en las mismas opciones que el cuerpo de /tree"""
+    data = dict(params)
+    for key in BOOLEAN_OPTIONS:
+        if key in data:
+            data[key] = data[key].lower() in ('1', 'true', 'yes', 'on')
+    return data
+
+
+def sse_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@app.get("/tree/watch")
+async def tree_watch(request: Request):
+    """Server-Sent Events: una instantánea del árbol (JSON) y después solo deltas.
+    
+    Acepta las mismas opciones que /tree como parámetros de la URL.
+    """
+    global active_watchers
+    data = query_options(request.query_params)
+    path = data.get("path", ".")
+    try:
+        config = {**build_request_config(data), 'format': 'json', 'jobs': 1, 'track_mtimes': False}
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    if not os.path.isdir(path):
+        return JSONResponse(content={"error": f"La ruta {path} no es un directorio"}, status_code=400)
+    if active_watchers >= MAX_WATCHERS:
+        return JSONResponse(content={"error": "Demasiadas vigilancias activas"}, status_code=503)
+    active_watchers += 1
+    
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            stop.set()
+    
+    def run():
+        """Hilo propio por conexión: no ocupa el pool acotado de /tree"""
+        generator = ProjectTreeGenerator(config)
+        try:
+            watcher = TreeWatcher(generator, path)
+            put(sse_event('snapshot', json.dumps(watcher.structure.to_dict(), ensure_ascii=False)))
+            for deltas in watcher.watch(stop, timeout=WATCH_KEEPALIVE):
+                if deltas:
+                    # Los nodos añadidos viajan como subárbol de diccionarios
+                    put(sse_event('delta', json.dumps(deltas, ensure_ascii=False, default=TreeNode.to_dict)))
+                else:
+                    put(": keepalive\n\n")
+        except Exception as e:
+            put(sse_event('error', json.dumps({"error": str(e)}, ensure_ascii=False)))
+        finally:
+            generator.close()
+            put(None)
+    
+    async def body():
+        global active_watchers
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield item
+        finally:
+            stop.set()
+            active_watchers -= 1
+    
+    threading.Thread(target=run, name='tree-watch', daemon=True).start()
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+
+def list_children_page(root: str, path: str, config: Dict, cursor: Optional[str],
+                       limit: int) -> Tuple[List[TreeNode], Optional[str]]:
+    """Una página de /tree/children (bloqueante, se ejecuta en el pool).
+    
+    El listado filtrado de cada directorio se guarda en un LRU pequeño validado
+    por su mtime y por el TTL de la caché de resultados: las páginas siguientes
+    de un directorio enorme cuestan un stat() y una búsqueda binaria en lugar
+    de otro scandir completo.
+    """
+    generator = ProjectTreeGenerator(config)
+    full_path = os.path.normpath(os.path.join(root, path))
+    key = ResultCache.make_key(full_path, {**config, 'root': os.path.abspath(root)})
+    try:
+        mtime = os.stat(full_path).st_mtime_ns
+    except OSError:
+        mtime = None
+    
+    listing = None
+    with children_cache_lock:
+        entry = children_cache.get(key)
+        if entry is not None:
+            expired = RESULT_CACHE_TTL > 0 and time.monotonic() - entry[1] > RESULT_CACHE_TTL
+            if entry[0] == mtime and not expired:
+                children_cache.move_to_end(key)
+                listing = entry[2]
+            else:
+                del children_cache[key]
+    
+    if listing is None:
+        listing = generator.read_children(root, path)
+        # Igual que la caché de escaneo: un directorio recién tocado puede cambiar
+        # otra vez sin que su mtime lo refleje
+        if mtime is not None and time.time_ns() - mtime >= ScanCache.RACY_WINDOW_NS:
+            with children_cache_lock:
+                children_cache[key] = (mtime, time.monotonic(), listing)
+                while len(children_cache) > CHILDREN_CACHE_ENTRIES:
+                    children_cache.popitem(last=False)
+    return generator.page_children(full_path, listing, cursor, limit)
+
+
+@app.get("/tree/children")
+async def tree_children(request: Request):
+    """Un nivel de un directorio, paginado con cursor, para expandir nodos bajo demanda.
+    
+    Parámetros: root (raíz del proyecto, para las reglas ancladas y los
+    .gitignore), path (directorio a listar, por defecto la raíz), cursor y
+    limit, más las mismas opciones de filtrado que /tree.
+    """
+    data = query_options(request.query_params)
+    root = data.get("root") or data.get("path") or "."
+    path = data.get("path") or root
+    try:
+        config = {**build_request_config(data), 'cache_dir': None, 'track_mtimes': False}
+        limit = min(max(1, int(data.get("limit", CHILDREN_PAGE_SIZE))), CHILDREN_MAX_PAGE_SIZE)
+        loop = asyncio.get_running_loop()
+        nodes, next_cursor = await loop.run_in_executor(
+            executor, list_children_page, root, path, config, data.get("cursor"), limit)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return {
+        "path": path,
+        # Los directorios aún no se han escaneado: su tamaño es desconocido
+        "entries": [
+            {"name": node.name, "path": node.path, "type": node.type,
+             "size": None if node.is_dir else node.size, "icon": node.icon}
+            for node in nodes
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+@app.get("/tree/cache")
+async def tree_cache():
+    """Contadores de la caché de resultados (aciertos, fallos, expulsiones...)"""
+    return result_cache.info()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Histogramas de latencia por fase y contadores en formato Prometheus"""
+    gauges = {
+        ('tree_result_cache_entries', ''): len(result_cache.entries),
+        ('tree_active_watchers', ''): active_watchers,
+    }
+    for status in ('queued', 'running') + TreeJob.FINISHED:
+        gauges[('tree_jobs', Metrics.labels(status=status))] = sum(1 for job in jobs.values() if job.status == status)
+    for event in ('hits', 'misses', 'stale', 'evictions', 'coalesced'):
+        gauges[('tree_result_cache_events_total', Metrics.labels(event=event))] = result_cache.counters[event]
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # Página principal: sirve el HTML
 @app.get("/")
 async def main():
     return FileResponse("static/project_tree_generator.html")
-s
\ No newline at end of file
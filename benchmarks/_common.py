@@ -0,0 +1,145 @@
+"""
+Piezas comunes de los benchmarks (y de las pruebas): configuración base del
+generador y árboles sintéticos.
+
+Importar este módulo añade la raíz del repositorio a sys.path, así que los
+benchmarks pueden importar genProyTree_v2 y app justo después.
+"""
+
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+SEED = 20240614
+# Bytes de cada archivo de build_looped_tree
+FILE_SIZE = 1000
+# Cabecera común de los archivos "mismo tamaño, mismo principio" de build_duplicates_tree
+ELF_HEADER = b'\x7fELF' + bytes(60) * 512
+
+# Configuración mínima del generador; cada benchmark añade encima lo que mide
+CONFIG = {
+    'format': 'ascii', 'ignore_dirs': [], 'ignore_files': [], 'max_depth': 0,
+    'show_hidden': True, 'show_sizes': True, 'debug': False, 'stats': False,
+    'show_config': False, 'project_name': None, 'cache_dir': None,
+}
+
+
+def make_config(**options) -> dict:
+    """CONFIG con las opciones dadas por encima"""
+    return {**CONFIG, **options}
+
+
+def tree_file(root: str, index: int, per_dir: int = 50, dirs_per_group: int = 50,
+              extension: str = '.py') -> str:
+    """Ruta del archivo número index en un árbol de build_tree con los mismos parámetros"""
+    return os.path.join(root, f'paquete_{index // (per_dir * dirs_per_group):04d}',
+                        f'modulo_{index // per_dir:06d}', f'archivo_{index:07d}{extension}')
+
+
+def build_tree(base: str, files: int, per_dir: int = 50, dirs_per_group: int = 50,
+               size_mod: int = 100, name: str = 'arbol', extension: str = '.py') -> str:
+    """Árbol raíz/paquete_N/modulo_M con per_dir archivos por módulo y
+    dirs_per_group módulos por paquete; el archivo i ocupa i % size_mod bytes"""
+    root = os.path.join(base, name)
+    for index in range(files):
+        path = tree_file(root, index, per_dir, dirs_per_group, extension)
+        if index % per_dir == 0:
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('x' * (index % size_mod))
+    return root
+
+
+def build_duplicates_tree(base: str, files: int, max_size: int) -> str:
+    """Árbol tipo rootfs para --find-duplicates: archivos de tamaño aleatorio,
+    un 10 % copias de otros y un 10 % del mismo tamaño y cabecera que solo
+    se distinguen por el final"""
+    rng = random.Random(SEED)
+    root = os.path.join(base, 'rootfs')
+    originals = []
+    for index in range(files):
+        dir_path = os.path.join(root, f'usr/lib/paquete_{index // 100:04d}')
+        os.makedirs(dir_path, exist_ok=True)
+        path = os.path.join(dir_path, f'archivo_{index:06d}')
+        kind = index % 10
+        if kind == 0 and originals:
+            # Copia de un archivo anterior
+            with open(rng.choice(originals), 'rb') as f:
+                data = f.read()
+        elif kind == 1:
+            # Mismo tamaño y cabecera que los demás de su clase, distinto final
+            data = ELF_HEADER + rng.randbytes(max_size // 2 - len(ELF_HEADER))
+        else:
+            data = rng.randbytes(rng.randint(1, max_size))
+            originals.append(path)
+        with open(path, 'wb') as f:
+            f.write(data)
+    return root
+
+
+def build_looped_tree(base: str, dirs: int, files: int, loops: bool = True) -> str:
+    """`dirs` módulos de `files` archivos de FILE_SIZE bytes; con loops, cada
+    módulo enlaza 'arriba' -> '..' y 'raiz' -> la raíz, y 'copias' repite
+    por enlace duro los archivos del primero"""
+    root = os.path.join(base, 'con_bucles' if loops else 'sin_bucles')
+    for index in range(dirs):
+        dir_path = os.path.join(root, f'paquete_{index // 20:03d}', f'modulo_{index:04d}')
+        os.makedirs(dir_path)
+        for number in range(files):
+            with open(os.path.join(dir_path, f'archivo_{number:03d}.py'), 'w') as f:
+                f.write('x' * FILE_SIZE)
+        if loops:
+            os.symlink('..', os.path.join(dir_path, 'arriba'))
+            os.symlink(root, os.path.join(dir_path, 'raiz'))
+    if loops:
+        # Cada archivo del primer módulo, otra vez por enlace duro
+        source = os.path.join(root, 'paquete_000', 'modulo_0000')
+        copies = os.path.join(root, 'copias')
+        os.makedirs(copies)
+        for number in range(files):
+            name = f'archivo_{number:03d}.py'
+            os.link(os.path.join(source, name), os.path.join(copies, name))
+    return root
+
+
+def build_deep_tree(base: str, depth: int, file_size: int = 0) -> str:
+    """Crea `depth` directorios 'd' anidados con un f.txt en cada nivel (mkdirat/openat).
+
+    La ruta del más profundo supera PATH_MAX: se crean relativos al anterior.
+    """
+    root = os.path.join(base, 'profundo')
+    os.mkdir(root)
+    fd = os.open(root, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        for _ in range(depth):
+            file_fd = os.open('f.txt', os.O_WRONLY | os.O_CREAT, dir_fd=fd)
+            os.write(file_fd, b'x' * file_size)
+            os.close(file_fd)
+            os.mkdir('d', dir_fd=fd)
+            child = os.open('d', os.O_RDONLY | os.O_DIRECTORY, dir_fd=fd)
+            os.close(fd)
+            fd = child
+    finally:
+        os.close(fd)
+    return root
+
+
+def remove_deep_tree(root: str, depth: int):
+    """Borra un árbol de build_deep_tree (shutil.rmtree es recursivo).
+
+    Cada nivel se sube junto a la raíz antes de borrarlo, así que ninguna
+    ruta pasa de unos pocos componentes.
+    """
+    base = os.path.dirname(root)
+    current = root
+    for level in range(depth):
+        moved = os.path.join(base, f'nivel_{level}')
+        os.rename(os.path.join(current, 'd'), moved)
+        os.unlink(os.path.join(current, 'f.txt'))
+        os.rmdir(current)
+        current = moved
+    os.rmdir(current)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark de archivos comprimidos: leer el índice frente a extraer y escanear.
+
+Genera un rootfs sintético y lo empaqueta como tar, tar.gz, zip e .ipk (ar
+con control.tar.gz y data.tar.gz). Para cada uno compara:
+  - extraer + escanear: lo que había que hacer antes (tar/unzip/ar del
+    sistema a un directorio temporal, generar el árbol y borrarlo)
+  - índice: generar el árbol directamente del archivo con ArchiveIndex
+Que los dos caminos producen el mismo árbol lo comprueba tests/test_archive.py.
+
+Uso:
+    python benchmarks/bench_archive.py [--files 20000] [--file-size 8192]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import time
+
+from _common import make_config
+
+from genProyTree_v2 import ProjectTreeGenerator
+
+SEED = 20240607
+
+
+def build_rootfs(base: str, files: int, file_size: int) -> str:
+    """Árbol tipo rootfs: usr/lib, usr/share, etc... con contenido poco comprimible"""
+    rng = random.Random(SEED)
+    root = os.path.join(base, 'rootfs')
+    tops = ('usr/lib', 'usr/share/doc', 'usr/bin', 'etc', 'lib/modules', 'opt/app')
+    for index in range(files):
+        if index % 50 == 0:
+            dir_path = os.path.join(root, rng.choice(tops), f'paquete_{index // 50:04d}')
+            os.makedirs(dir_path, exist_ok=True)
+        with open(os.path.join(dir_path, f'archivo_{index:06d}'), 'wb') as f:
+            f.write(rng.randbytes(rng.randint(file_size // 2, file_size * 3 // 2)))
+    return root
+
+
+def pack(base: str, root: str) -> dict:
+    """Crea los archivos de prueba y devuelve {formato: ruta}"""
+    archives = {
+        'tar': os.path.join(base, 'rootfs.tar'),
+        'tar.gz': os.path.join(base, 'rootfs.tar.gz'),
+        'zip': os.path.join(base, 'rootfs.zip'),
+        'ipk': os.path.join(base, 'paquete.ipk'),
+    }
+    subprocess.run(['tar', '-cf', archives['tar'], '-C', root, '.'], check=True)
+    subprocess.run(['tar', '-czf', archives['tar.gz'], '-C', root, '.'], check=True)
+    subprocess.run(['zip', '-qr', archives['zip'], '.'], cwd=root, check=True)
+
+    package = os.path.join(base, 'ipk')
+    os.makedirs(os.path.join(package, 'control'))
+    with open(os.path.join(package, 'control', 'control'), 'w') as f:
+        f.write('Package: rootfs\nVersion: 1.0\n')
+    with open(os.path.join(package, 'debian-binary'), 'w') as f:
+        f.write('2.0\n')
+    subprocess.run(['tar', '-czf', os.path.join(package, 'control.tar.gz'), '-C',
+                    os.path.join(package, 'control'), '.'], check=True)
+    shutil.copy(archives['tar.gz'], os.path.join(package, 'data.tar.gz'))
+    subprocess.run(['ar', 'rc', archives['ipk'], 'debian-binary', 'control.tar.gz', 'data.tar.gz'],
+                   cwd=package, check=True)
+    return archives
+
+
+def extract(kind: str, archive: str, target: str):
+    if kind == 'zip':
+        subprocess.run(['unzip', '-q', archive, '-d', target], check=True)
+    elif kind == 'ipk':
+        subprocess.run(['ar', 'x', archive, 'data.tar.gz'], cwd=target, check=True)
+        data = os.path.join(target, 'data.tar.gz')
+        subprocess.run(['tar', '-xzf', data, '-C', target], check=True)
+        os.remove(data)
+    else:
+        subprocess.run(['tar', '-xf', archive, '-C', target], check=True)
+
+
+def render(path: str) -> list:
+    """Líneas del árbol sin la raíz, que lleva el nombre del archivo o del directorio"""
+    lines = ProjectTreeGenerator(make_config()).generate(path).splitlines()
+    return [line for line in lines[1:] if 'CONTROL' not in line and 'control (' not in line]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=20000)
+    parser.add_argument('--file-size', type=int, default=8192)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base:
+        root = build_rootfs(base, args.files, args.file_size)
+        archives = pack(base, root)
+        print(f"{args.files} archivos, {sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(root) for f in fs) / 1e6:.0f} MB sin comprimir")
+
+        for kind, archive in archives.items():
+            target = tempfile.mkdtemp(dir=base)
+            start = time.perf_counter()
+            extract(kind, archive, target)
+            render(target)
+            shutil.rmtree(target)
+            extracted = time.perf_counter() - start
+
+            start = time.perf_counter()
+            render(archive)
+            direct = time.perf_counter() - start
+
+            print(f"{kind:<7} {os.path.getsize(archive) / 1e6:7.1f} MB  extraer + escanear {extracted:6.2f}s  "
+                  f"índice {direct:6.2f}s  x{extracted / direct:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark del modo lote: muchas raíces en un pool de procesos.
+
+Compara tres maneras de generar el árbol de N repositorios pequeños:
+lanzar la CLI una vez por repositorio (lo que había que hacer antes), el
+lote en un solo proceso y el lote repartido en 2, 4... procesos. Informa
+del tiempo de reloj y de la aceleración frente a la CLI por repositorio;
+la aceleración del pool está acotada por los núcleos de la máquina.
+
+Uso:
+    python benchmarks/bench_batch.py [--repos 32] [--files 2000] [--processes 1,2,4]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import ROOT, make_config
+
+from genProyTree_v2 import run_batch, summarize_batch
+
+SCRIPT = os.path.join(ROOT, 'genProyTree_v2.py')
+CONFIG = make_config(ignore_dirs=['.git', '__pycache__', 'node_modules'],
+                     ignore_files=['*.pyc', '*.log'], show_hidden=False)
+
+
+def build_repos(base: str, repos: int, files: int) -> list:
+    roots = []
+    for repo in range(repos):
+        root = os.path.join(base, f'repo_{repo:03d}')
+        for index in range(files):
+            if index % 40 == 0:
+                dir_path = os.path.join(root, f'paquete_{index // 400:03d}', f'modulo_{index // 40:04d}')
+                os.makedirs(dir_path)
+            name = f'archivo_{index:05d}.py' if index % 10 else f'registro_{index:05d}.log'
+            with open(os.path.join(dir_path, name), 'w') as f:
+                f.write('x' * (index % 50))
+        roots.append(root)
+    return roots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repos', type=int, default=32)
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--processes', default='1,2,4',
+                        help='Tamaños de pool a medir, separados por comas')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base:
+        roots = build_repos(base, args.repos, args.files)
+        output_dir = os.path.join(base, 'arboles')
+        os.makedirs(output_dir)
+        print(f"{args.repos} repositorios x {args.files} archivos, {os.cpu_count()} núcleos")
+
+        start = time.perf_counter()
+        for root in roots:
+            subprocess.run([sys.executable, SCRIPT, root, '-o', os.path.join(output_dir, 'cli.txt')],
+                           capture_output=True, check=True)
+        baseline = time.perf_counter() - start
+        print(f"CLI por repositorio:   {baseline:7.2f}s")
+
+        for processes in (int(p) for p in args.processes.split(',')):
+            start = time.perf_counter()
+            results = list(run_batch(roots, CONFIG, output_dir, processes))
+            summary = summarize_batch(results, time.perf_counter() - start)
+            print(f"Lote con {processes:2d} procesos:  {summary['wall_seconds']:7.2f}s  "
+                  f"x{baseline / summary['wall_seconds']:.2f} frente a la CLI  "
+                  f"{summary['entries_per_second']} entradas/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark de /tree/children frente a /tree en un directorio muy ancho.
+
+Mide lo que cuesta abrir un proyecto en la interfaz: la primera página de
+un directorio con 100k entradas frente a generar el árbol completo como hace
+/tree, y recorrer todas las páginas con y sin la caché de listados del
+servidor. Que las páginas encadenadas por cursor devuelven exactamente las
+entradas del árbol completo lo comprueba tests/test_children_page.py.
+
+Uso:
+    python benchmarks/bench_children_page.py [--entries 100000] [--limit 200]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from _common import make_config
+
+import app
+from genProyTree_v2 import ProjectTreeGenerator
+
+CONFIG = make_config(format='json')
+
+
+def build_wide_dir(base: str, entries: int) -> str:
+    root = os.path.join(base, 'ancho')
+    os.makedirs(root)
+    for index in range(entries):
+        if index % 100 == 0:
+            os.mkdir(os.path.join(root, f'dir_{index:07d}'))
+        else:
+            open(os.path.join(root, f'archivo_{index:07d}.txt'), 'w').close()
+    # Fuera de la ventana en la que la caché de listados no se fía del mtime
+    past = time.time() - 60
+    os.utime(root, (past, past))
+    return root
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=100000)
+    parser.add_argument('--limit', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base:
+        path = build_wide_dir(base, args.entries)
+
+        generator = ProjectTreeGenerator(CONFIG)
+        start = time.perf_counter()
+        generator.scan_directory(path)
+        full = time.perf_counter() - start
+
+        def paginate(list_page, max_pages=None):
+            """Recorre las páginas: (nombres, páginas, segundos de la primera, total)"""
+            names = []
+            pages = 0
+            cursor = None
+            start = time.perf_counter()
+            while True:
+                nodes, cursor = list_page(cursor)
+                names.extend(node.name for node in nodes)
+                pages += 1
+                if pages == 1:
+                    first = time.perf_counter() - start
+                if cursor is None or pages == max_pages:
+                    return names, pages, first, time.perf_counter() - start
+
+        generator = ProjectTreeGenerator(CONFIG)
+        # Sin caché cada página vuelve a listar el directorio entero: basta con unas pocas
+        uncached = paginate(lambda cursor: generator.list_children(path, path, cursor, args.limit), 20)
+        config = {**app.build_request_config({'show_hidden': True}), 'ignore_dirs': [], 'ignore_files': [],
+                  'cache_dir': None, 'track_mtimes': False}
+        cached = paginate(lambda cursor: app.list_children_page(path, path, config, cursor, args.limit))
+
+        print(f"Árbol completo (/tree):          {full:.3f}s")
+        for label, (_, pages, first, total) in (('sin caché', uncached), ('con caché', cached)):
+            print(f"/tree/children {label}: primera página {first:.3f}s, "
+                  f"{pages} páginas en {total:.3f}s ({total / pages * 1000:.1f} ms/página)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark de árboles profundos: recorrido iterativo vs recursivo.
+
+1. Mide el escaneo y el renderizado de un árbol sintético de 5.000 niveles
+   (cuya ruta supera PATH_MAX) en todos los formatos.
+2. Compara el coste de los frames de la recursión con la pila explícita en
+   árboles normales: escaneo (scan_node) y JSON (iter_json vs json.dumps).
+
+Uso:
+    python benchmarks/bench_deep_tree.py [--depth 5000] [--dirs 2000] [--files 20]
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+from _common import build_deep_tree, build_tree, make_config, remove_deep_tree
+
+from genProyTree_v2 import ProjectTreeGenerator
+
+
+def recursive_scan(generator: ProjectTreeGenerator, node, depth: int) -> bool:
+    """Referencia recursiva equivalente al scan_node anterior"""
+    if not generator.populate_directory(node, depth):
+        return False
+    for child in node.children:
+        if child.is_dir:
+            recursive_scan(generator, child, depth + 1)
+    generator.finalize_directory(node)
+    return True
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def time_deep(path: str, depth: int):
+    print(f"Árbol de {depth} niveles:")
+    for output_format in ('ascii', 'markdown', 'mermaid', 'json'):
+        generator = ProjectTreeGenerator(make_config(format=output_format))
+        elapsed, lines = timed(lambda: sum(chunk.count('\n') for chunk in generator.iter_generate(path)))
+        print(f"  {output_format:<9} {elapsed:6.2f}s  {lines} líneas")
+
+
+def compare_frames(path: str):
+    print("Árbol normal (recursivo vs iterativo):")
+    generator = ProjectTreeGenerator(make_config())
+    generator.start_scan(path)
+    recursive, _ = timed(lambda: recursive_scan(generator, generator.make_root_node(path), 0))
+    iterative, structure = timed(lambda: generator.scan_directory(path))
+    print(f"  escaneo   recursivo {recursive:.3f}s  iterativo {iterative:.3f}s")
+
+    data = structure.to_dict()
+    recursive, _ = timed(lambda: json.dumps(data, indent=2, ensure_ascii=False))
+    iterative, _ = timed(lambda: generator.generate_json(structure))
+    print(f"  json      json.dumps {recursive:.3f}s  iter_json {iterative:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--depth', type=int, default=5000)
+    parser.add_argument('--dirs', type=int, default=2000)
+    parser.add_argument('--files', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base:
+        deep = build_deep_tree(base, args.depth)
+        try:
+            time_deep(deep, args.depth)
+        finally:
+            remove_deep_tree(deep, args.depth)
+        compare_frames(build_tree(base, args.dirs * args.files, per_dir=args.files,
+                                  size_mod=1, name='normal'))
+
+
+if __name__ == '__main__':
+    main()
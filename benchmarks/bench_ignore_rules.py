@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark del motor de exclusión: bucle de fnmatch vs reglas compiladas.
+
+Compara el bucle anterior de should_ignore (un fnmatch por patrón y entrada)
+con IgnoreRules, que compila todos los patrones en una sola expresión
+(que los dos ignoran lo mismo lo comprueba tests/test_ignore_rules.py).
+
+Uso:
+    python benchmarks/bench_ignore_rules.py [--patterns 200] [--names 50000]
+"""
+
+import argparse
+import fnmatch
+import random
+import time
+
+import _common  # noqa: F401 (raíz del repositorio en sys.path)
+
+from genProyTree_v2 import IgnoreRules
+
+EXTENSIONS = ['py', 'js', 'log', 'tmp', 'o', 'so', 'pyc', 'md', 'json', 'c', 'h']
+
+
+def make_patterns(count: int):
+    patterns = ['*.pyc', '*.tmp', '*.log', '*.DS_Store', 'Thumbs.db']
+    while len(patterns) < count:
+        patterns.append(f"gen_{len(patterns)}_*.{random.choice(EXTENSIONS)}")
+    return patterns
+
+
+def make_names(count: int):
+    return [f"{random.choice(['main', 'util', 'gen_7_x', 'test'])}_{i}.{random.choice(EXTENSIONS)}"
+            for i in range(count)]
+
+
+def fnmatch_loop(names, patterns):
+    """Réplica del bucle original de should_ignore"""
+    ignored = 0
+    for name in names:
+        for pattern in patterns:
+            if fnmatch.fnmatch(name, pattern):
+                ignored += 1
+                break
+    return ignored
+
+
+def compiled(names, patterns):
+    rules = IgnoreRules([], patterns)
+    return sum(1 for name in names if rules.match(name, name, False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--patterns', type=int, default=200)
+    parser.add_argument('--names', type=int, default=50000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    patterns = make_patterns(args.patterns)
+    names = make_names(args.names)
+
+    for label, func in (('fnmatch', fnmatch_loop), ('compilado', compiled)):
+        start = time.perf_counter()
+        func(names, patterns)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<10} {elapsed:.3f}s ({args.names / elapsed:,.0f} entradas/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark de las salidas JSON: indentada, compacta y NDJSON.
+
+Para cada variante mide el tamaño de la salida, el tiempo y el pico de RSS
+escribiendo a un archivo por trozos, como hace la CLI con --output. Cada
+variante se mide en un subproceso propio para que los picos no se mezclen.
+
+Uso:
+    python benchmarks/bench_ndjson_output.py [--files 200000] [--per-dir 50]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import build_tree, make_config
+
+from genProyTree_v2 import ProjectTreeGenerator
+
+VARIANTS = {
+    'json': {'format': 'json'},
+    'compacto': {'format': 'json', 'compact': True},
+    'ndjson': {'format': 'ndjson'},
+}
+
+
+def measure(variant: str, path: str, output: str):
+    """Ejecutado en el subproceso: imprime segundos e incremento de RSS en KB"""
+    generator = ProjectTreeGenerator(make_config(**VARIANTS[variant]))
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    with open(output, 'w', encoding='utf-8') as f:
+        for chunk in generator.iter_generate(path):
+            f.write(chunk)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(elapsed, peak - baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=200000)
+    parser.add_argument('--per-dir', type=int, default=50)
+    parser.add_argument('--measure', nargs=3, metavar=('VARIANTE', 'RUTA', 'SALIDA'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    with tempfile.TemporaryDirectory() as base:
+        path = build_tree(base, args.files, args.per_dir)
+        outputs = {}
+        for variant in VARIANTS:
+            outputs[variant] = os.path.join(base, f'salida.{variant}')
+            result = subprocess.run([sys.executable, __file__, '--measure', variant, path, outputs[variant]],
+                                    capture_output=True, text=True, check=True).stdout
+            elapsed, kilobytes = result.split()
+            size = os.path.getsize(outputs[variant])
+            print(f"{variant:<9} {size / 1024 / 1024:8.1f} MB de salida  {float(elapsed):6.2f}s  "
+                  f"pico RSS {int(kilobytes) / 1024:7.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
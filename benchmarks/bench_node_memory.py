@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memoria del modelo de nodos.
+
+Compara el pico de RSS por millón de entradas entre el modelo compacto
+(TreeNode con __slots__ y rutas reconstruidas) y el modelo anterior de un
+diccionario por nodo con la ruta completa. Cada modelo se mide en un
+subproceso propio para que los picos no se mezclen.
+
+Uso:
+    python benchmarks/bench_node_memory.py [--files 200000] [--per-dir 50]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+from _common import build_tree, make_config
+
+from genProyTree_v2 import ProjectTreeGenerator
+
+
+def dict_scan(generator: ProjectTreeGenerator, path: str) -> dict:
+    """Réplica del modelo anterior: un dict por nodo con su ruta completa"""
+    structure = {'name': os.path.basename(path), 'path': path, 'type': 'directory',
+                 'size': 0, 'icon': generator.icons['directory'], 'children': []}
+    stack = [structure]
+    while stack:
+        node = stack.pop()
+        with os.scandir(node['path']) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+        for entry in entries:
+            if entry.is_dir():
+                child = {'name': entry.name, 'path': entry.path, 'type': 'directory', 'size': 0,
+                         'icon': generator.icons['directory'], 'children': []}
+                stack.append(child)
+            else:
+                child = {'name': entry.name, 'path': entry.path, 'type': 'file',
+                         'size': entry.stat().st_size, 'icon': generator.get_file_icon(entry.name)}
+            node['children'].append(child)
+    return structure
+
+
+def measure(model: str, path: str):
+    """Ejecutado en el subproceso: imprime el incremento de RSS en KB"""
+    generator = ProjectTreeGenerator(make_config(format='json'))
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if model == 'dict':
+        structure = dict_scan(generator, path)
+    else:
+        structure = generator.scan_directory(path)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    del structure
+    print(peak - baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=200000)
+    parser.add_argument('--per-dir', type=int, default=50)
+    parser.add_argument('--measure', nargs=2, metavar=('MODELO', 'RUTA'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    with tempfile.TemporaryDirectory() as base:
+        path = build_tree(base, args.files, args.per_dir, size_mod=1)
+        entries = args.files + args.files // args.per_dir
+        for model in ('dict', 'compacto'):
+            output = subprocess.run([sys.executable, __file__, '--measure', model, path],
+                                    capture_output=True, text=True, check=True).stdout
+            kilobytes = int(output)
+            per_million = kilobytes / 1024 * 1_000_000 / entries
+            print(f"{model:<9} {kilobytes / 1024:8.1f} MB -> {per_million:8.1f} MB por millón de entradas")
+
+
+if __name__ == '__main__':
+    main()
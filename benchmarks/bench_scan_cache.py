@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la caché persistente de escaneo (--cache-dir).
+
+Genera un árbol sin cambios y mide tres pasadas: sin caché, la primera con
+caché (la llena) y una pasada en caliente que reutiliza todos los listados.
+
+Uso:
+    python benchmarks/bench_scan_cache.py [--files 500000] [--per-dir 100]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from _common import build_tree, make_config
+
+from genProyTree_v2 import ProjectTreeGenerator, ScanCache
+
+
+def scan(path: str, cache_dir=None):
+    generator = ProjectTreeGenerator(make_config(cache_dir=cache_dir))
+    start = time.perf_counter()
+    generator.scan_directory(path)
+    return time.perf_counter() - start, generator.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=500000)
+    parser.add_argument('--per-dir', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base:
+        path = build_tree(base, args.files, args.per_dir, dirs_per_group=100,
+                          size_mod=64, extension='.txt')
+        # Los directorios recién modificados no se guardan (ventana de mtime)
+        time.sleep(ScanCache.RACY_WINDOW_NS / 1e9)
+        cache_dir = os.path.join(base, 'cache')
+
+        cold, _ = scan(path)
+        print(f"sin caché      {cold:.3f}s")
+        for label in ('caché (llena)', 'caché (warm)'):
+            elapsed, stats = scan(path, cache_dir)
+            cache = stats['cache']
+            print(f"{label:<14} {elapsed:.3f}s  aciertos={cache['hits']} fallos={cache['misses']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark de --diff entre instantáneas: el coste sigue a los cambios, no al árbol.
+
+Genera árboles de distinto tamaño, guarda una instantánea, aplica un número
+fijo de cambios (altas, bajas y modificaciones repartidas por el árbol) y
+guarda otra. Para cada caso compara:
+  - diff por hashes: diff_snapshots, que solo baja por los directorios
+    cuyo hash difiere
+  - comparación completa: leer todas las filas de las dos instantáneas y
+    compararlas por ruta, lo que costaría sin los hashes por directorio
+El diff por hashes debe mantenerse casi constante al crecer el árbol con los
+mismos cambios y crecer con el número de cambios (que los dos encuentran los
+mismos cambios lo comprueba tests/test_snapshot_diff.py).
+
+Uso:
+    python benchmarks/bench_snapshot_diff.py [--sizes 10000,50000,200000] [--changes 10,100,1000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from _common import build_tree, make_config, tree_file
+
+from genProyTree_v2 import ProjectTreeGenerator, TreeSnapshot, diff_snapshots
+
+SEED = 20240611
+DIRS_PER_GROUP = 100
+
+
+def apply_changes(root: str, files: int, changes: int):
+    """Un tercio de altas, un tercio de bajas y un tercio de modificaciones"""
+    rng = random.Random(SEED + changes)
+    for number, index in enumerate(rng.sample(range(files), changes)):
+        path = tree_file(root, index, dirs_per_group=DIRS_PER_GROUP)
+        if number % 3 == 0:
+            with open(os.path.join(os.path.dirname(path), f'nuevo_{index:07d}.py'), 'w') as f:
+                f.write('nuevo')
+        elif number % 3 == 1:
+            os.remove(path)
+        else:
+            with open(path, 'a') as f:
+                f.write('cambio')
+
+
+def snapshot(root: str, path: str) -> float:
+    start = time.perf_counter()
+    ProjectTreeGenerator(make_config(snapshot=path)).write_snapshot(root)
+    return time.perf_counter() - start
+
+
+def hashed_diff(old_path: str, new_path: str) -> tuple:
+    old, new = TreeSnapshot(old_path), TreeSnapshot(new_path)
+    start = time.perf_counter()
+    found = sum(1 for _ in diff_snapshots(old, new))
+    elapsed = time.perf_counter() - start
+    old.close()
+    new.close()
+    return elapsed, found
+
+
+def full_diff(old_path: str, new_path: str) -> tuple:
+    """Todas las filas de las dos instantáneas, comparadas por ruta"""
+    start = time.perf_counter()
+    tables = []
+    for snapshot_path in (old_path, new_path):
+        db = TreeSnapshot(snapshot_path).db
+        paths = {}
+        rows = {}
+        for node_id, parent, name, is_dir, size, mtime_ns in db.execute(
+                'SELECT id, parent, name, is_dir, size, mtime_ns FROM nodes ORDER BY id'):
+            path = f'{paths[parent]}/{name}' if parent is not None else ''
+            paths[node_id] = path
+            if not is_dir:
+                rows[path] = (size, mtime_ns)
+        db.close()
+        tables.append(rows)
+    old_rows, new_rows = tables
+    found = sum(1 for path in old_rows.keys() | new_rows.keys() if old_rows.get(path) != new_rows.get(path))
+    return time.perf_counter() - start, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,50000,200000',
+                        help='Archivos por árbol, separados por comas')
+    parser.add_argument('--changes', default='10,100,1000',
+                        help='Cambios a aplicar sobre el árbol más grande, separados por comas')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    change_counts = [int(count) for count in args.changes.split(',')]
+
+    with tempfile.TemporaryDirectory() as base:
+        cases = [(size, change_counts[0]) for size in sizes]
+        cases += [(sizes[-1], count) for count in change_counts[1:]]
+        for files, changes in cases:
+            root = build_tree(os.path.join(base, f'{files}_{changes}'), files,
+                              dirs_per_group=DIRS_PER_GROUP, name=f'arbol_{files}')
+            old_path = os.path.join(base, f'{files}_{changes}_antes.snap')
+            new_path = os.path.join(base, f'{files}_{changes}_despues.snap')
+            written = snapshot(root, old_path)
+            apply_changes(root, files, changes)
+            snapshot(root, new_path)
+
+            hashed, _ = hashed_diff(old_path, new_path)
+            full, _ = full_diff(old_path, new_path)
+            print(f"{files:7d} archivos, {changes:5d} cambios: instantánea {written:6.2f}s  "
+                  f"diff por hashes {hashed * 1000:8.1f} ms  completo {full * 1000:8.1f} ms  "
+                  f"x{full / hashed:.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Suite de benchmarks reproducible con árboles sintéticos y umbrales de regresión.
+
+Genera en un directorio temporal local cuatro árboles de prueba:
+  - ancho:     100k archivos en un solo directorio
+  - profundo:  miles de niveles anidados (la ruta supera PATH_MAX)
+  - realista:  un proyecto con node_modules anidados como los de npm
+  - ignorado:  un proyecto en el que casi todo cae en las reglas de exclusión
+
+Para cada uno mide scan_directory, cada renderizador sobre el árbol ya
+escaneado y la latencia completa de /tree a través del cliente de pruebas de
+FastAPI (sin la caché de resultados). Los árboles salen de una semilla fija,
+así que dos ejecuciones con la misma escala miden exactamente lo mismo.
+
+El resultado es JSON. Con --compare se contrasta con una línea base guardada
+y el proceso termina con código 1 si alguna medida empeora más que el umbral.
+
+Uso:
+    python benchmarks/bench_suite.py [--scale 1.0] [--repeat 3] [--output base.json]
+    python benchmarks/bench_suite.py --compare base.json [--threshold 0.2]
+    python benchmarks/bench_suite.py --input actual.json --compare base.json
+    python benchmarks/bench_suite.py --fixtures ancho,ignorado --scale 0.1
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from _common import ROOT, build_deep_tree, make_config, remove_deep_tree
+
+os.chdir(ROOT)
+# Se mide el escaneo, no la caché de resultados de app.py
+os.environ['TREE_RESULT_CACHE_ENTRIES'] = '0'
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import app  # noqa: E402
+from genProyTree_v2 import FORMATS, ProjectTreeGenerator  # noqa: E402
+
+SEED = 20240607
+
+# Las mismas exclusiones por defecto que la CLI
+DEFAULT_IGNORE_DIRS = '.git,__pycache__,venv,.pytest_cache,node_modules,dist,build'
+DEFAULT_IGNORE_FILES = '*.pyc,*.tmp,*.log,*.DS_Store,Thumbs.db'
+
+# Una medida empeora si supera la base en este factor y en este mínimo absoluto
+DEFAULT_THRESHOLD = 0.2
+MIN_DELTA = 0.005
+
+
+def write_file(path: str, size: int):
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+
+
+def build_wide_tree(base: str, scale: float, rng: random.Random) -> str:
+    root = os.path.join(base, 'ancho')
+    os.mkdir(root)
+    for index in range(int(100000 * scale)):
+        write_file(os.path.join(root, f'archivo_{index:07d}.txt'), rng.randrange(0, 200))
+    return root
+
+
+def build_realistic_tree(base: str, scale: float, rng: random.Random) -> str:
+    """Código propio pequeño y un node_modules con dependencias anidadas"""
+    root = os.path.join(base, 'realista')
+    for folder, count in (('src/components', 40), ('src/utils', 15), ('tests', 25), ('docs', 10)):
+        os.makedirs(os.path.join(root, folder))
+        for index in range(count):
+            extension = '.md' if folder == 'docs' else '.ts'
+            write_file(os.path.join(root, folder, f'modulo_{index:03d}{extension}'), rng.randrange(200, 8000))
+    for name in ('package.json', 'tsconfig.json', 'README.md', '.gitignore'):
+        write_file(os.path.join(root, name), rng.randrange(100, 3000))
+
+    # Paquetes pendientes de crear: (directorio node_modules, nivel de anidamiento)
+    pending = [(os.path.join(root, 'node_modules'), 0)]
+    packages = int(300 * scale)
+    while pending:
+        modules, level = pending.pop()
+        count = packages if level == 0 else rng.randrange(1, 5)
+        for index in range(count):
+            package = os.path.join(modules, f'paquete-{level}-{index:04d}')
+            os.makedirs(os.path.join(package, 'lib'))
+            for name in ('package.json', 'README.md', 'LICENSE', 'index.js'):
+                write_file(os.path.join(package, name), rng.randrange(100, 4000))
+            for lib in range(rng.randrange(3, 11)):
+                write_file(os.path.join(package, 'lib', f'parte_{lib:02d}.js'), rng.randrange(500, 20000))
+            if rng.random() < 0.4:
+                os.mkdir(os.path.join(package, 'dist'))
+                write_file(os.path.join(package, 'dist', 'index.min.js'), rng.randrange(1000, 50000))
+                write_file(os.path.join(package, 'dist', 'index.min.js.map'), rng.randrange(1000, 80000))
+            if level < 3 and rng.random() < 0.3:
+                pending.append((os.path.join(package, 'node_modules'), level + 1))
+    return root
+
+
+def build_ignored_tree(base: str, scale: float, rng: random.Random) -> str:
+    """Poco contenido útil rodeado de .git, venv, cachés, logs y artefactos"""
+    root = os.path.join(base, 'ignorado')
+    os.makedirs(os.path.join(root, 'src'))
+    os.makedirs(os.path.join(root, 'logs'))
+    for index in range(int(100 * scale) + 1):
+        write_file(os.path.join(root, 'src', f'modulo_{index:04d}.py'), rng.randrange(200, 5000))
+        write_file(os.path.join(root, 'src', f'modulo_{index:04d}.pyc'), rng.randrange(200, 5000))
+        write_file(os.path.join(root, 'src', f'modulo_{index:04d}.py.bak'), rng.randrange(200, 5000))
+    for index in range(int(2000 * scale)):
+        write_file(os.path.join(root, 'logs', f'servidor_{index:05d}.log'), rng.randrange(100, 1000))
+    for folder, count in (('.git/objects', 5000), ('venv/lib/python3/site-packages', 5000),
+                          ('src/__pycache__', 500), ('build/lib', 1000)):
+        for index in range(int(count * scale)):
+            directory = os.path.join(root, folder, f'{index % 64:02x}')
+            os.makedirs(directory, exist_ok=True)
+            write_file(os.path.join(directory, f'objeto_{index:05d}'), rng.randrange(50, 2000))
+    with open(os.path.join(root, '.gitignore'), 'w') as f:
+        f.write('logs/\n*.bak\n')
+    return root
+
+
+# nombre -> (constructor, opciones de /tree: exclusiones y .gitignore)
+FIXTURES = {
+    'ancho': (build_wide_tree, {'ignore_dirs': '', 'ignore_files': ''}),
+    'profundo': (None, {'ignore_dirs': '', 'ignore_files': ''}),
+    'realista': (build_realistic_tree, {'ignore_dirs': '.git', 'ignore_files': ''}),
+    'ignorado': (build_ignored_tree, {'ignore_dirs': DEFAULT_IGNORE_DIRS,
+                                      'ignore_files': DEFAULT_IGNORE_FILES, 'gitignore': True}),
+}
+
+
+def fixture_config(options: dict, output_format: str) -> dict:
+    return make_config(
+        format=output_format,
+        ignore_dirs=[p.strip() for p in options['ignore_dirs'].split(',')],
+        ignore_files=[p.strip() for p in options['ignore_files'].split(',')],
+        gitignore=options.get('gitignore', False), jobs=1,
+    )
+
+
+def timed(func, repeat: int) -> dict:
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+
+
+def bench_fixture(name: str, path: str, options: dict, client: TestClient, repeat: int) -> dict:
+    results = {}
+    structure = None
+    entries = 0
+
+    def scan():
+        nonlocal structure, entries
+        generator = ProjectTreeGenerator(fixture_config(options, 'json'))
+        structure = generator.scan_directory(path)
+        if structure is None:
+            raise RuntimeError(f"No se pudo escanear {path}")
+        entries = generator.stats['total_files'] + generator.stats['total_directories']
+
+    results[f'{name}/scan'] = timed(scan, repeat)
+
+    for output_format in FORMATS:
+        generator = ProjectTreeGenerator(fixture_config(options, output_format))
+        results[f'{name}/render.{output_format}'] = timed(
+            lambda: ''.join(generator.iter_format(structure, generator.walk(structure))), repeat)
+
+    for output_format in ('ascii', 'json'):
+        payload = {'path': path, 'format': output_format, 'show_hidden': True, **options}
+
+        def request():
+            response = client.post('/tree', json=payload)
+            if response.status_code != 200:
+                raise RuntimeError(response.text)
+
+        results[f'{name}/tree.{output_format}'] = timed(request, repeat)
+
+    print(f"  {name}: {entries} entradas", file=sys.stderr)
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def run_suite(fixtures: list, scale: float, repeat: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as base, TestClient(app) as client:
+        for name in fixtures:
+            builder, options = FIXTURES[name]
+            # Una semilla por árbol: medir un subconjunto no cambia los demás
+            rng = random.Random(f'{SEED}-{name}')
+            start = time.perf_counter()
+            if name == 'profundo':
+                depth = max(1, int(2000 * scale))
+                path = build_deep_tree(base, depth)
+            else:
+                path = builder(base, scale, rng)
+            print(f"Árbol {name} generado en {time.perf_counter() - start:.1f}s", file=sys.stderr)
+            try:
+                results.update(bench_fixture(name, path, options, client, repeat))
+            finally:
+                if name == 'profundo':
+                    remove_deep_tree(path, depth)
+
+    return {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'scale': scale,
+            'repeat': repeat,
+            'seed': SEED,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float, metric: str) -> bool:
+    """Imprime la comparación y devuelve True si hay alguna regresión"""
+    if baseline['meta'].get('scale') != current['meta'].get('scale'):
+        print(f"⚠️  Escalas distintas: base {baseline['meta'].get('scale')}, "
+              f"actual {current['meta'].get('scale')}")
+
+    regressions = []
+    print(f"{'medida':<26} {'base':>9} {'actual':>9} {'ratio':>7}")
+    for key, result in current['results'].items():
+        base = baseline['results'].get(key)
+        if base is None:
+            print(f"{key:<26} {'-':>9} {result[metric]:>8.3f}s {'nueva':>7}")
+            continue
+        old, new = base[metric], result[metric]
+        ratio = new / old if old else float('inf')
+        mark = ''
+        if new > old * (1 + threshold) and new - old > MIN_DELTA:
+            mark = '⚠️  regresión'
+            regressions.append(key)
+        elif new < old * (1 - threshold) and old - new > MIN_DELTA:
+            mark = '✅ mejora'
+        print(f"{key:<26} {old:>8.3f}s {new:>8.3f}s {ratio:>6.2f}x {mark}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regresiones por encima del {threshold:.0%}: {', '.join(regressions)}")
+    else:
+        print(f"\n✅ Sin regresiones por encima del {threshold:.0%}")
+    return bool(regressions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', default=','.join(FIXTURES),
+                        help=f"Árboles a medir, separados por comas ({', '.join(FIXTURES)})")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Factor de tamaño de los árboles (1.0 = 100k archivos en el ancho)')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones de cada medida')
+    parser.add_argument('--output', '-o', help='Guardar los resultados en este JSON')
+    parser.add_argument('--input', help='Usar unos resultados guardados en lugar de medir')
+    parser.add_argument('--compare', help='JSON de una ejecución anterior que sirve de línea base')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Empeoramiento relativo que cuenta como regresión (por defecto: 0.2)')
+    parser.add_argument('--metric', choices=('min', 'median'), default='min',
+                        help='Estadístico que se compara (por defecto: min, el menos ruidoso)')
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        fixtures = [name.strip() for name in args.fixtures.split(',') if name.strip()]
+        unknown = [name for name in fixtures if name not in FIXTURES]
+        if unknown:
+            parser.error(f"Árboles desconocidos: {', '.join(unknown)}")
+        current = run_suite(fixtures, args.scale, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, indent=2)
+    elif not args.compare:
+        json.dump(current, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(baseline, current, args.threshold, args.metric):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark del recorrido con bucles de enlaces simbólicos y enlaces duros.
+
+Construye un proyecto en el que cada directorio hoja tiene dos enlaces hacia
+arriba ('arriba' -> '..' y 'raiz' -> la raíz) y una carpeta de copias hecha
+con enlaces duros. Sin detectar bucles, el escaneo baja por rutas cada vez
+más largas hasta que el kernel las corta con ELOOP (40 enlaces por ruta) y
+la CLI aborta con un error. Con la poda por (st_dev, st_ino)
+debe tardar lo mismo que el árbol sin enlaces (que total_size cuenta cada
+enlace duro una sola vez lo comprueba tests/test_symlink_loops.py).
+
+Con --baseline se lanza además otra versión de genProyTree_v2.py (por ejemplo
+una anterior, sacada con git show) con un tiempo máximo.
+
+Uso:
+    python benchmarks/bench_symlink_loops.py [--dirs 200] [--files 20]
+    python benchmarks/bench_symlink_loops.py --baseline /tmp/antiguo.py --timeout 30
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import build_looped_tree, make_config
+
+from genProyTree_v2 import ProjectTreeGenerator
+
+
+def scan(path: str, jobs: int) -> tuple:
+    generator = ProjectTreeGenerator(make_config(jobs=jobs))
+    start = time.perf_counter()
+    generator.scan_directory(path)
+    return time.perf_counter() - start, generator.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dirs', type=int, default=200)
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--baseline', help='Otra versión de genProyTree_v2.py para comparar')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base:
+        plain = build_looped_tree(base, args.dirs, args.files, loops=False)
+        looped = build_looped_tree(base, args.dirs, args.files, loops=True)
+
+        for label, path in (('sin enlaces', plain), ('con bucles', looped)):
+            for jobs in (1, 4):
+                elapsed, stats = scan(path, jobs)
+                print(f"{label:<12} -j {jobs}: {elapsed:6.3f}s  {stats['total_directories']} directorios  "
+                      f"{stats['ignored_by_reason']['loop']} bucles podados  "
+                      f"tamaño {stats['total_size']} ({stats['hardlinks']} enlaces duros repetidos)")
+
+        if args.baseline:
+            start = time.perf_counter()
+            try:
+                result = subprocess.run([sys.executable, args.baseline, looped, '--no-sizes'],
+                                        capture_output=True, text=True, timeout=args.timeout)
+            except subprocess.TimeoutExpired:
+                print(f"{args.baseline}: no termina en {args.timeout:g}s")
+                return
+            # La CLI imprime los errores en stdout
+            errors = [line for line in result.stdout.splitlines() if 'Error' in line]
+            outcome = errors[-1][:120] if errors else f"código {result.returncode}"
+            print(f"{args.baseline}: {time.perf_counter() - start:.1f}s, "
+                  f"{result.stdout.count(chr(10))} líneas, {outcome}")
+
+
+if __name__ == '__main__':
+    main()
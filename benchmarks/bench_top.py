@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark de --top: memoria y tiempo frente a generar el árbol completo.
+
+Genera un árbol con muchos archivos y mide, cada modo en su propio proceso,
+el pico de memoria residente (ru_maxrss) y el tiempo de:
+  - json: el árbol completo en memoria (lo que hacía falta antes para
+    responder "qué ocupa más")
+  - ascii: el recorrido perezoso, que escanea mientras dibuja
+  - top: el resumen de los N mayores, sin árbol
+Se resta el pico de un proceso que solo importa el módulo, así que las
+cifras son la memoria propia de cada modo.
+
+Uso:
+    python benchmarks/bench_top.py [--files 300000] [--per-dir 1000] [--top 20]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from _common import build_tree
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+CHILD = r'''
+import json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+from _common import make_config
+from genProyTree_v2 import ProjectTreeGenerator
+mode, path, top = sys.argv[2], sys.argv[3], int(sys.argv[4])
+config = make_config(format='ascii' if mode == 'top' else mode, compact=True,
+                     top=top if mode == 'top' else 0)
+start = time.perf_counter()
+written = 0
+if mode != 'import':
+    for chunk in ProjectTreeGenerator(config).iter_generate(path):
+        written += len(chunk)
+print(json.dumps({'seconds': time.perf_counter() - start, 'bytes': written,
+                  'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+'''
+
+
+def run(mode: str, path: str, top: int) -> dict:
+    result = subprocess.run([sys.executable, '-c', CHILD, BENCHMARKS, mode, path, str(top)],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=300000)
+    parser.add_argument('--per-dir', type=int, default=1000)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base:
+        root = build_tree(base, args.files, args.per_dir, dirs_per_group=20, size_mod=997,
+                          name='build', extension='.o')
+        baseline = run('import', root, args.top)['rss_kb']
+        print(f"{args.files} archivos, {args.per_dir} por directorio, --top {args.top}")
+        for mode in ('json', 'ascii', 'top'):
+            result = run(mode, root, args.top)
+            print(f"{mode:<6} {result['seconds']:6.2f}s  memoria {(result['rss_kb'] - baseline) / 1024:7.1f} MB  "
+                  f"salida {result['bytes'] / 1e6:7.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
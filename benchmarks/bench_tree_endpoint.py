@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark del endpoint /tree: subproceso por petición vs generación en proceso.
+
+Mide peticiones por segundo de ambas estrategias sobre un árbol sintético
+pequeño, que es el caso en el que el arranque del intérprete domina.
+
+Uso:
+    python benchmarks/bench_tree_endpoint.py [--requests 50] [--concurrency 8]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import ROOT, build_tree
+
+os.chdir(ROOT)
+# Se mide el escaneo en proceso, no la caché de resultados de app.py
+os.environ.setdefault('TREE_RESULT_CACHE_ENTRIES', '0')
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import app  # noqa: E402
+
+
+def subprocess_request(path: str) -> str:
+    """Estrategia anterior: un intérprete nuevo por petición"""
+    cmd = [sys.executable, 'genProyTree_v2.py', path, '--format', 'ascii',
+           '--ignore-dirs', '', '--ignore-files', '', '--max-depth', '0', '--show-sizes']
+    return subprocess.run(cmd, capture_output=True, text=True).stdout
+
+
+def run(label: str, func, total: int, concurrency: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: func(), range(total)))
+    elapsed = time.perf_counter() - start
+    rps = total / elapsed
+    print(f"{label:<14} {total} peticiones en {elapsed:.2f}s -> {rps:.1f} req/s")
+    return rps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base:
+        path = build_tree(base, 200, per_dir=10, name='proyecto')
+        client = TestClient(app)
+        body = {'path': path, 'format': 'ascii'}
+
+        before = run('subprocess', lambda: subprocess_request(path),
+                     args.requests, args.concurrency)
+        after = run('en proceso', lambda: client.post('/tree', json=body),
+                    args.requests, args.concurrency)
+        print(f"Mejora: x{after / before:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark de refrescos de /tree: bytes en la red por refresco de un árbol sin cambios.
+
+Simula una pestaña que vuelve a pedir el mismo árbol una y otra vez, como
+haría cualquier cliente antes (sin Accept-Encoding ni If-None-Match), con
+compresión, y con compresión más el ETag de la respuesta anterior. Mide los
+bytes del cuerpo tal como viajan y el tiempo por refresco, y lo que cuesta
+la respuesta nueva tras un cambio en disco.
+
+Uso:
+    python benchmarks/bench_tree_refresh.py [--files 20000] [--refreshes 20] [--format markdown]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from _common import ROOT, build_tree, tree_file
+
+os.chdir(ROOT)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import COMPRESSORS, app  # noqa: E402
+
+
+def refresh(client: TestClient, body: dict, headers: dict) -> tuple:
+    """(estado, bytes del cuerpo en la red, ETag) de una petición"""
+    with client.stream('POST', '/tree', json=body, headers=headers) as response:
+        wire = sum(len(chunk) for chunk in response.iter_raw())
+        return response.status_code, wire, response.headers.get('etag')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=20000)
+    parser.add_argument('--refreshes', type=int, default=20)
+    parser.add_argument('--format', default='markdown')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base:
+        root = build_tree(base, args.files, per_dir=40, dirs_per_group=20, size_mod=300)
+        client = TestClient(app)
+        body = {'path': root, 'format': args.format}
+        encodings = ', '.join(COMPRESSORS)
+        print(f"{args.files} archivos, formato {args.format}, compresión disponible: {encodings}")
+
+        clients = (
+            ('sin cabeceras', {'Accept-Encoding': 'identity'}, False),
+            ('comprimido', {'Accept-Encoding': encodings}, False),
+            ('comprimido + ETag', {'Accept-Encoding': encodings}, True),
+        )
+        etag = None
+        for label, headers, conditional in clients:
+            # La primera petición llena la caché de resultados; se miden los refrescos
+            status, first, etag = refresh(client, body, headers)
+            wire = 0
+            start = time.perf_counter()
+            for _ in range(args.refreshes):
+                request_headers = dict(headers, **({'If-None-Match': etag} if conditional else {}))
+                status, size, etag = refresh(client, body, request_headers)
+                wire += size
+            elapsed = (time.perf_counter() - start) / args.refreshes
+            print(f"{label:<18} primera {first / 1e3:8.1f} KB  por refresco {wire / args.refreshes / 1e3:8.1f} KB  "
+                  f"{elapsed * 1000:6.1f} ms  (último estado {status})")
+
+        # Un cambio en disco invalida el ETag
+        module = os.path.dirname(tree_file(root, 0, per_dir=40, dirs_per_group=20))
+        with open(os.path.join(module, 'nuevo.py'), 'w') as f:
+            f.write('cambio')
+        status, size, _ = refresh(client, body, {'Accept-Encoding': encodings, 'If-None-Match': etag})
+        print(f"tras un cambio: {status}, {size / 1e3:.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
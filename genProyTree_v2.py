@@ -35,11 +35,29 @@ Ejemplos:
 import os
 import sys
 import argparse
+import bisect
+import bz2
 import fnmatch
+import functools
+import gzip
+import hashlib
+import heapq
+import lzma
+import re
+import select
+import struct
+import ctypes
+import ctypes.util
+import sqlite3
+import tarfile
 import time
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from stat import S_ISLNK
+from typing import List, Dict, Optional, Set, Tuple, Iterable, Iterator
 import json
 
 
@@ -56,20 +74,994 @@ class Colors:
     UNDERLINE = '\033[4m'
 
 
+def translate_glob(pattern: str) -> str:
+    """Traduce un patrón estilo gitignore a una expresión regular sobre rutas con '/'"""
+    result = []
+    i, n = 0, len(pattern)
+    while i < n:
+        char = pattern[i]
+        if char == '*':
+            if pattern.startswith('**', i):
+                # '**/' equivale a cero o más directorios; '**' al final, a todo lo de dentro
+                if pattern.startswith('**/', i):
+                    result.append('(?:.*/)?')
+                    i += 3
+                else:
+                    result.append('.*')
+                    i += 2
+                continue
+            result.append('[^/]*')
+        elif char == '?':
+            result.append('[^/]')
+        elif char == '[':
+            start = i + 1
+            if pattern[start:start + 1] == '!':
+                start += 1
+            if pattern[start:start + 1] == ']':
+                start += 1
+            end = pattern.find(']', start)
+            if end == -1:
+                result.append('\\[')
+            else:
+                body = pattern[i + 1:end].replace('\\', '\\\\')
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                result.append(f'[{body}]')
+                i = end + 1
+                continue
+        elif char == '\\' and i + 1 < n:
+            result.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        else:
+            result.append(re.escape(char))
+        i += 1
+    return ''.join(result)
+
+
+def parse_gitignore(lines: Iterable[str]) -> List[Tuple[str, bool, bool]]:
+    """Convierte las líneas de un .gitignore en reglas (regex, negada, solo_directorios)"""
+    rules = []
+    for line in lines:
+        line = line.rstrip('\n').rstrip()
+        if not line or line.startswith('#'):
+            continue
+        negate = line.startswith('!')
+        if negate:
+            line = line[1:]
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if not line:
+            continue
+        # Con una barra en medio o al principio el patrón se ancla a su directorio
+        anchored = '/' in line
+        regex = translate_glob(line.lstrip('/'))
+        if not anchored:
+            regex = '(?:.*/)?' + regex
+        rules.append((regex, negate, dir_only))
+    return rules
+
+
+class IgnoreRuleSet:
+    """Conjunto de reglas compilado en una sola expresión regular por tipo de entrada.
+    
+    Las alternativas se ordenan al revés para que la primera que casa sea la
+    última regla del fichero, que es la que manda en gitignore.
+    """
+    
+    def __init__(self, rules: List[Tuple[str, bool, bool]]):
+        self.dir_regex, self.dir_negations = self._compile(rules)
+        self.file_regex, self.file_negations = self._compile([r for r in rules if not r[2]])
+    
+    @staticmethod
+    def _compile(rules: List[Tuple[str, bool, bool]]) -> Tuple[Optional['re.Pattern'], List[bool]]:
+        if not rules:
+            return None, []
+        ordered = rules[::-1]
+        regex = re.compile('|'.join(f'({rule[0]})' for rule in ordered), re.DOTALL)
+        return regex, [rule[1] for rule in ordered]
+    
+    def match(self, rel_path: str, is_dir: bool) -> Optional[bool]:
+        """True si la ruta se ignora, False si una negación la incluye, None si no aplica"""
+        regex = self.dir_regex if is_dir else self.file_regex
+        if regex is None:
+            return None
+        found = regex.fullmatch(rel_path)
+        if not found:
+            return None
+        negations = self.dir_negations if is_dir else self.file_negations
+        return not negations[found.lastindex - 1]
+
+
+class IgnoreRules:
+    """Motor de exclusión compilado una vez por configuración.
+    
+    Los patrones de --ignore-dirs/--ignore-files sin '/' se comparan con el
+    nombre (semántica de fnmatch); los que llevan '/' se anclan a la raíz del
+    escaneo con semántica gitignore (p. ej. 'src/generated/**').
+    """
+    
+    CONFIG = 'config'
+    GITIGNORE = 'gitignore'
+    
+    def __init__(self, ignore_dirs: List[str], ignore_files: List[str]):
+        # Ignorar 'dir/**' como directorio es ignorar 'dir': se poda sin listarlo. Al
+        # quitar el '/**' el patrón sigue anclado a la raíz ('generated/**' es '/generated')
+        ignore_dirs = ['/' + p[:-3].lstrip('/') if p.endswith('/**') else p for p in ignore_dirs]
+        self.dir_names, self.dir_paths = self._compile(ignore_dirs)
+        self.file_names, self.file_paths = self._compile(ignore_files)
+        self.needs_paths = bool(self.dir_paths or self.file_paths)
+    
+    @staticmethod
+    def _compile(patterns: List[str]) -> Tuple[Optional['re.Pattern'], Optional[IgnoreRuleSet]]:
+        names = [p for p in patterns if p and '/' not in p]
+        paths = [p for p in patterns if p and '/' in p]
+        name_regex = re.compile('|'.join(fnmatch.translate(p) for p in names)) if names else None
+        path_rules = IgnoreRuleSet(parse_gitignore('/' + p.lstrip('/') for p in paths)) if paths else None
+        return name_regex, path_rules
+    
+    def match(self, name: str, rel_path: str, is_dir: bool,
+              gitignores: List[Tuple[str, IgnoreRuleSet]] = ()) -> Optional[str]:
+        """Devuelve el motivo por el que se ignora la entrada o None.
+        
+        gitignores es la cadena de .gitignore aplicable, del más profundo al
+        más cercano a la raíz, como (directorio relativo, reglas).
+        """
+        names = self.dir_names if is_dir else self.file_names
+        if names is not None and names.match(name):
+            return self.CONFIG
+        paths = self.dir_paths if is_dir else self.file_paths
+        if paths is not None and paths.match(rel_path, is_dir):
+            return self.CONFIG
+        for base, rules in gitignores:
+            ignored = rules.match(rel_path[len(base) + 1:] if base else rel_path, is_dir)
+            if ignored is not None:
+                return self.GITIGNORE if ignored else None
+        return None
+
+
+
+@functools.lru_cache(maxsize=32)
+def compile_ignore_rules(ignore_dirs: Tuple[str, ...], ignore_files: Tuple[str, ...]) -> IgnoreRules:
+    """IgnoreRules compartido por todos los generadores de un proceso con los mismos patrones.
+    
+    Las reglas no cambian tras construirse, así que un lote o un servidor que
+    crea muchos generadores solo compila las expresiones regulares una vez.
+    """
+    return IgnoreRules(list(ignore_dirs), list(ignore_files))
+
+# A partir de esta longitud una ruta se abre por tramos relativos (PATH_MAX es 4096 en Linux)
+LONG_PATH_LENGTH = 3072
+# Cuando la ruta relativa de un directorio pasa de aquí, sus hijos se abren relativos
+# a él: así cabe el nombre de cualquier hijo (NAME_MAX es 255) sin pasar de LONG_PATH_LENGTH
+ANCHOR_PATH_LENGTH = LONG_PATH_LENGTH - 256
+
+
+def open_long_path(path: str) -> int:
+    """Abre un directorio de ruta arbitrariamente larga encadenando openat() por tramos"""
+    prefix = os.sep if path.startswith(os.sep) else ''
+    segment = []
+    length = len(prefix)
+    fd = None
+    for component in path.split(os.sep):
+        if not component:
+            continue
+        if segment and length + len(component) > LONG_PATH_LENGTH:
+            fd = _open_directory(prefix + os.sep.join(segment), fd)
+            prefix, segment, length = '', [], 0
+        segment.append(component)
+        length += len(component) + 1
+    return _open_directory(prefix + os.sep.join(segment) or os.curdir, fd)
+
+
+def _open_directory(path: str, dir_fd: Optional[int]) -> int:
+    """Abre un directorio relativo a dir_fd y cierra este último"""
+    try:
+        return os.open(path, os.O_RDONLY | os.O_DIRECTORY, dir_fd=dir_fd)
+    finally:
+        if dir_fd is not None:
+            os.close(dir_fd)
+
+
+def child_location(location: Tuple[Optional[int], str], name: str) -> Tuple[Optional[int], str]:
+    """Ubicación de un hijo: el mismo descriptor ancla y la ruta relativa con su nombre"""
+    anchor, rel_path = location
+    return anchor, os.path.join(rel_path, name)
+
+
+def close_locations(frames: Iterable, index: int):
+    """Cierra los descriptores ancla que quedan en una pila de escaneo (posición index de cada marco)"""
+    for frame in frames:
+        if frame[index] is not None:
+            os.close(frame[index])
+
+
+class CachedEntry:
+    """Entrada de directorio ya resuelta (de la caché o de un listado por descriptor).
+    
+    Ofrece la parte de la interfaz de os.DirEntry que usa el escaneo.
+    """
+    
+    __slots__ = ('name', 'path', '_is_dir', '_is_symlink', '_size', '_link', '_mtime_ns')
+    
+    def __init__(self, directory: str, name: str, is_dir: bool, is_symlink: bool, size: Optional[int],
+                 link: Optional[List[int]] = None, mtime_ns: int = 0):
+        self.name = name
+        self.path = os.path.join(directory, name)
+        self._is_dir = is_dir
+        self._is_symlink = is_symlink
+        self._size = size
+        # (st_dev, st_ino) de los archivos con más de un enlace duro
+        self._link = link
+        self._mtime_ns = mtime_ns
+    
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return self._is_dir and (follow_symlinks or not self._is_symlink)
+    
+    def is_symlink(self) -> bool:
+        return self._is_symlink
+    
+    def stat(self) -> os.stat_result:
+        # Tamaño no guardado (entrada ignorada en la pasada anterior): stat real
+        if self._size is None:
+            return os.stat(self.path)
+        if self._size < 0:
+            raise FileNotFoundError(f"No existe el destino (caché): {self.path}")
+        dev, ino = self._link if self._link is not None else (0, 0)
+        mtime_ns = self._mtime_ns
+        # Con 16 campos stat_result también expone st_mtime_ns (índice 14)
+        return os.stat_result((0, ino, dev, 1 if self._link is None else 2, 0, 0, self._size, 0,
+                               mtime_ns // 10**9, 0, None, None, None, 0, mtime_ns, 0))
+
+
+TAR_BLOCK = 512
+TAR_ZERO_BLOCK = bytes(TAR_BLOCK)
+
+# Compresiones que se aceptan alrededor de un tar, por sus primeros bytes
+TAR_COMPRESSIONS = (
+    (b'\x1f\x8b', lambda f: gzip.GzipFile(fileobj=f, mode='rb')),
+    (b'BZh', bz2.BZ2File),
+    (b'\xfd7zXZ\x00', lzma.LZMAFile),
+)
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def decompress_stream(fileobj, magic: bytes):
+    """Envuelve fileobj con el descompresor que indican sus primeros bytes (magic)"""
+    for prefix, opener in TAR_COMPRESSIONS:
+        if magic.startswith(prefix):
+            return opener(fileobj)
+    if magic.startswith(ZSTD_MAGIC):
+        raise ValueError("Los tar comprimidos con zstd no están soportados")
+    return fileobj
+
+
+def parse_pax(data: bytes) -> Dict[str, str]:
+    """Registros 'longitud clave=valor\\n' de una cabecera pax extendida"""
+    records = {}
+    pos = 0
+    try:
+        while pos < len(data) and data[pos:pos + 1] != b'\0':
+            space = data.index(b' ', pos)
+            length = int(data[pos:space])
+            key, _, value = data[space + 1:pos + length - 1].partition(b'=')
+            records[key.decode('utf-8', 'replace')] = value.decode('utf-8', 'surrogateescape')
+            pos += length
+    except ValueError:
+        pass
+    return records
+
+
+def parse_tar_number(field: bytes) -> int:
+    """Campo numérico de una cabecera tar: octal o, con el bit alto, base-256 de GNU"""
+    if field[0] & 0x80:
+        return int.from_bytes(field[1:], 'big')
+    return int(field.strip(b' \0') or b'0', 8)
+
+
+def iter_tar_headers(fileobj) -> Iterator[Tuple[str, bytes, int, float]]:
+    """Recorre las cabeceras de un tar (ustar, GNU o pax) saltando el contenido.
+    
+    Produce (nombre, tipo, tamaño, mtime). Solo decodifica esos campos, sin
+    validar sumas de control, así que es varias veces más rápido que TarInfo.
+    En un archivo con seek el contenido no se llega a leer.
+    """
+    seekable = getattr(fileobj, 'seekable', lambda: False)()
+    long_name = None
+    pax = {}
+    while True:
+        header = fileobj.read(TAR_BLOCK)
+        if len(header) < TAR_BLOCK or header == TAR_ZERO_BLOCK:
+            return
+        # GNU codifica en base-256 los tamaños de 8 GB o más
+        size = parse_tar_number(header[124:136])
+        type_flag = header[156:157]
+        padded = -(-size // TAR_BLOCK) * TAR_BLOCK
+        
+        if type_flag in (b'L', b'x'):
+            data = fileobj.read(padded)[:size]
+            if type_flag == b'L':
+                long_name = data.rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            else:
+                pax = parse_pax(data)
+            continue
+        
+        if type_flag not in (b'g', b'K'):
+            if 'path' in pax:
+                name = pax['path']
+            elif long_name is not None:
+                name = long_name
+            else:
+                raw_name = header[:100].split(b'\0', 1)[0]
+                if header[257:263] == b'ustar\0':
+                    prefix = header[345:500].split(b'\0', 1)[0]
+                    if prefix:
+                        raw_name = prefix + b'/' + raw_name
+                name = raw_name.decode('utf-8', 'surrogateescape')
+            if 'size' in pax:
+                size = int(pax['size'])
+                padded = -(-size // TAR_BLOCK) * TAR_BLOCK
+            mtime = float(pax['mtime']) if 'mtime' in pax else parse_tar_number(header[136:148])
+            long_name = None
+            pax = {}
+            yield name, type_flag, size, mtime
+        
+        if padded:
+            if seekable:
+                fileobj.seek(padded, 1)
+                continue
+            while padded:
+                chunk = fileobj.read(min(padded, 1 << 20))
+                if not chunk:
+                    return
+                padded -= len(chunk)
+
+
+class BoundedReader:
+    """Vista de solo lectura de los siguientes size bytes de un archivo (un miembro de un ar)"""
+    
+    def __init__(self, fileobj, size: int):
+        self.fileobj = fileobj
+        self.remaining = size
+    
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.fileobj.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+class ArchiveIndex:
+    """Árbol de un archivo tar, zip o .ipk construido solo con su índice.
+    
+    Del zip se lee el directorio central; del tar, las cabeceras en orden (sin
+    comprimir el contenido se salta con seek; comprimido hay que pasarlo por
+    el descompresor, pero nunca se guarda ni se escribe en disco). Un .ipk es
+    un ar (o, en versiones antiguas de opkg-build, un tar.gz) con
+    control.tar.* y data.tar.*: data queda en la raíz y control bajo
+    CONTROL/, la disposición que espera opkg-build.
+    
+    read_directory recibe listados de CachedEntry con el tamaño ya resuelto,
+    así que recorrer el archivo no vuelve a tocar el sistema de ficheros.
+    """
+    
+    AR_MAGIC = b'!<arch>\n'
+    AR_HEADER_SIZE = 60
+    CONTROL_DIR = 'CONTROL'
+    MAGIC_SIZE = 6
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.kind = self.detect(path)
+        if self.kind is None:
+            raise ValueError(f"{path} no es un archivo tar, zip o ipk")
+        # Directorio relativo ('' es la raíz) -> {nombre: (es_dir, es_enlace, tamaño, mtime_ns)}
+        self.directories: Dict[str, Dict[str, Tuple[bool, bool, int, int]]] = {'': {}}
+        self.members = 0
+        if self.kind == 'zip':
+            self.load_zip()
+        elif self.kind == 'ipk':
+            self.load_ipk()
+        elif path.endswith('.ipk'):
+            with tarfile.open(path, 'r:*') as tar:
+                self.load_packed_ipk(tar)
+        else:
+            with open(path, 'rb') as f:
+                magic = f.read(self.MAGIC_SIZE)
+                f.seek(0)
+                self.load_tar(decompress_stream(f, magic))
+    
+    @classmethod
+    def detect(cls, path: str) -> Optional[str]:
+        """Tipo de archivo por su contenido ('ipk', 'zip' o 'tar'), o None"""
+        try:
+            with open(path, 'rb') as f:
+                if f.read(len(cls.AR_MAGIC)) == cls.AR_MAGIC:
+                    return 'ipk'
+            if zipfile.is_zipfile(path):
+                return 'zip'
+            if tarfile.is_tarfile(path):
+                return 'tar'
+        except OSError:
+            pass
+        return None
+    
+    def add(self, name: str, is_dir: bool, is_symlink: bool = False, size: int = 0, prefix: str = '',
+            mtime_ns: int = 0):
+        """Añade un miembro creando los directorios intermedios que el índice no declara"""
+        parts = [part for part in name.split('/') if part not in ('', '.', '..')]
+        if prefix:
+            parts.insert(0, prefix)
+        if not parts:
+            return
+        self.members += 1
+        parent = ''
+        for part in parts[:-1]:
+            child = f'{parent}/{part}' if parent else part
+            if child not in self.directories:
+                self.directories[child] = {}
+                self.directories[parent][part] = (True, False, 0, 0)
+            parent = child
+        
+        name = parts[-1]
+        if is_dir:
+            child = f'{parent}/{name}' if parent else name
+            self.directories.setdefault(child, {})
+            self.directories[parent][name] = (True, False, 0, mtime_ns)
+        elif self.directories[parent].get(name, (False,))[0] is False:
+            # Un miembro repetido sustituye al anterior, como al extraer
+            self.directories[parent][name] = (False, is_symlink, size, mtime_ns)
+    
+    def load_zip(self):
+        with zipfile.ZipFile(self.path) as archive:
+            for info in archive.infolist():
+                # Los enlaces de un zip de Unix van en el modo de los atributos externos
+                is_symlink = S_ISLNK(info.external_attr >> 16)
+                # La fecha del zip es hora local sin zona, con resolución de 2 segundos
+                mtime_ns = int(time.mktime(info.date_time + (0, 0, -1))) * 10**9
+                self.add(info.filename, info.is_dir(), is_symlink, 0 if is_symlink else info.file_size,
+                         mtime_ns=mtime_ns)
+    
+    def load_tar(self, fileobj, prefix: str = ''):
+        for name, type_flag, size, mtime in iter_tar_headers(fileobj):
+            is_dir = type_flag == b'5' or name.endswith('/')
+            # Solo los archivos normales ocupan: enlaces, dispositivos y FIFOs cuentan 0
+            regular = type_flag in (b'0', b'\0', b'7')
+            self.add(name, is_dir, type_flag == b'2', size if regular else 0, prefix, int(mtime * 10**9))
+    
+    def load_ipk(self):
+        with open(self.path, 'rb') as f:
+            f.seek(len(self.AR_MAGIC))
+            while True:
+                header = f.read(self.AR_HEADER_SIZE)
+                if len(header) < self.AR_HEADER_SIZE:
+                    break
+                name = header[:16].decode('ascii', 'replace').strip().rstrip('/')
+                size = int(header[48:58])
+                start = f.tell()
+                magic = f.read(self.MAGIC_SIZE)
+                f.seek(start)
+                self.load_package_member(name, BoundedReader(f, size), magic)
+                # Los miembros de un ar se alinean a 2 bytes
+                f.seek(start + size + size % 2)
+    
+    def load_packed_ipk(self, tar: tarfile.TarFile):
+        for member in tar.getmembers():
+            if member.isreg():
+                fileobj = tar.extractfile(member)
+                magic = fileobj.read(self.MAGIC_SIZE)
+                fileobj.seek(0)
+                self.load_package_member(os.path.basename(member.name), fileobj, magic)
+    
+    def load_package_member(self, name: str, fileobj, magic: bytes):
+        """Indexa control.tar.* o data.tar.* de un paquete; el resto de miembros se salta"""
+        if name.startswith(('data.tar', 'control.tar')):
+            prefix = '' if name.startswith('data') else self.CONTROL_DIR
+            self.load_tar(decompress_stream(fileobj, magic), prefix)
+    
+    def listing(self, path: str) -> Optional[List[CachedEntry]]:
+        """Entradas de un directorio del archivo, ordenadas por nombre, o None si no existe"""
+        rel_dir = path[len(self.path) + 1:] if path != self.path else ''
+        if os.sep != '/':
+            rel_dir = rel_dir.replace(os.sep, '/')
+        children = self.directories.get(rel_dir)
+        if children is None:
+            return None
+        return [
+            CachedEntry(path, name, is_dir, is_symlink, None if is_dir else size, mtime_ns=mtime_ns)
+            for name, (is_dir, is_symlink, size, mtime_ns) in sorted(children.items())
+        ]
+
+
+class ScanCache:
+    """Caché persistente (SQLite) de listados de directorio.
+    
+    Cada directorio se guarda con su st_mtime_ns/st_ino/st_dev; si no han
+    cambiado, sus entradas se reutilizan sin volver a listarlo. Un cambio de
+    contenido de un archivo que no toque el directorio no se detecta, salvo
+    con lookup(restat=True).
+    """
+    
+    FILENAME = 'scan_cache.sqlite3'
+    # Directorios modificados hace menos de esto no se guardan: otro cambio en el
+    # mismo tick de mtime pasaría desapercibido
+    RACY_WINDOW_NS = 2 * 10**9
+    # Filas por transacción: el bloqueo de escritura se suelta cada pocos
+    # directorios en lugar de mantenerse durante todo el escaneo
+    COMMIT_EVERY = 64
+    
+    def __init__(self, cache_dir: str):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.db = sqlite3.connect(os.path.join(cache_dir, self.FILENAME),
+                                  timeout=30, check_same_thread=False)
+        # Con WAL los lectores de otros escaneos no esperan al que escribe
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS listings ('
+            'path TEXT PRIMARY KEY, mtime_ns INTEGER, ino INTEGER, dev INTEGER, entries TEXT)'
+        )
+        self.db.commit()
+    
+    def lookup(self, path: str, stat: os.stat_result, restat: bool = False) -> Optional[List[CachedEntry]]:
+        """Devuelve las entradas guardadas si el directorio no ha cambiado.
+        
+        Con restat se reutiliza solo el listado: los tamaños guardados se
+        descartan y cada archivo vuelve a pasar por stat(), que da su mtime.
+        """
+        with self.lock:
+            row = self.db.execute(
+                'SELECT mtime_ns, ino, dev, entries FROM listings WHERE path = ?',
+                (os.path.abspath(path),)
+            ).fetchone()
+        if row is None or tuple(row[:3]) != (stat.st_mtime_ns, stat.st_ino, stat.st_dev):
+            return None
+        if restat:
+            return [CachedEntry(path, name, is_dir, is_symlink, None)
+                    for name, is_dir, is_symlink, *_ in json.loads(row[3])]
+        return [CachedEntry(path, *entry) for entry in json.loads(row[3])]
+    
+    def store(self, path: str, stat: os.stat_result, entries: List[Tuple]):
+        """Guarda el listado (nombre, es_dir, es_enlace, tamaño[, enlace duro]) de un directorio"""
+        if time.time_ns() - stat.st_mtime_ns < self.RACY_WINDOW_NS:
+            return
+        with self.lock:
+            self.db.execute(
+                'INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?)',
+                (os.path.abspath(path), stat.st_mtime_ns, stat.st_ino, stat.st_dev,
+                 json.dumps(entries, ensure_ascii=False, separators=(',', ':')))
+            )
+            self.pending += 1
+            if self.pending >= self.COMMIT_EVERY:
+                self.db.commit()
+                self.pending = 0
+    
+    def flush(self):
+        with self.lock:
+            self.db.commit()
+            self.pending = 0
+    
+    def close(self):
+        with self.lock:
+            if self.db is None:
+                return
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+
+# Lecturas de contenido por bloques de 1 MB sobre un buffer reutilizado
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def hash_file(path: str, limit: Optional[int] = None) -> Optional[Tuple[Tuple[int, int], bytes]]:
+    """(st_dev, st_ino) y digest BLAKE2b de un archivo, o None si no se puede leer.
+    
+    Con limit solo se leen los primeros limit bytes. Se lee con readinto sobre
+    un buffer de HASH_BLOCK_SIZE, sin crear un bytes por bloque; hashlib suelta
+    el GIL con bloques grandes, así que varios hilos hashean en paralelo. No se
+    usa mmap: un archivo truncado mientras está mapeado mata el proceso con
+    SIGBUS.
+    """
+    digest = hashlib.blake2b(digest_size=TreeSnapshot.HASH_SIZE)
+    remaining = limit
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            stat = os.fstat(f.fileno())
+            buffer = bytearray(HASH_BLOCK_SIZE if limit is None else min(limit, HASH_BLOCK_SIZE))
+            view = memoryview(buffer)
+            while remaining is None or remaining > 0:
+                read = f.readinto(view if remaining is None or remaining >= len(buffer) else view[:remaining])
+                if not read:
+                    break
+                digest.update(view[:read])
+                if remaining is not None:
+                    remaining -= read
+    except OSError:
+        return None
+    return (stat.st_dev, stat.st_ino), digest.digest()
+
+
+def content_digest(path: str) -> Optional[bytes]:
+    """Digest BLAKE2b del contenido de un archivo, o None si no se puede leer"""
+    result = hash_file(path)
+    return result[1] if result is not None else None
+
+
+class TreeSnapshot:
+    """Instantánea de un árbol en SQLite con un hash Merkle por directorio.
+    
+    Cada archivo guarda tamaño y mtime (y, si se pide, un digest de su
+    contenido); cada directorio, el hash de la lista ordenada de sus hijos.
+    Dos subárboles con el mismo hash son iguales, así que diff_snapshots los
+    salta sin leerlos. Los ids siguen el preorden del recorrido y el índice
+    por padre permite leer un directorio sin cargar el resto.
+    """
+    
+    VERSION = 1
+    HASH_SIZE = 16
+    BATCH_SIZE = 10000
+    
+    def __init__(self, path: str, create: bool = False):
+        self.path = path
+        if create:
+            if os.path.exists(path):
+                os.remove(path)
+        elif not os.path.isfile(path):
+            raise FileNotFoundError(f"La instantánea {path} no existe")
+        self.db = sqlite3.connect(path)
+        self.pending = []
+        if create:
+            self.db.executescript(
+                'CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);'
+                'CREATE TABLE nodes (id INTEGER PRIMARY KEY, parent INTEGER, name TEXT, is_dir INTEGER, '
+                'size INTEGER, files INTEGER, mtime_ns INTEGER, digest BLOB, hash BLOB);'
+            )
+            self.meta = {}
+            return
+        try:
+            self.meta = {key: json.loads(value) for key, value in self.db.execute('SELECT key, value FROM meta')}
+        except sqlite3.DatabaseError:
+            self.db.close()
+            raise ValueError(f"{path} no es una instantánea")
+        if self.meta.get('version') != self.VERSION:
+            self.db.close()
+            raise ValueError(f"{path}: versión de instantánea no soportada ({self.meta.get('version')})")
+    
+    @staticmethod
+    def file_record(name: str, size: int, mtime_ns: int, digest: Optional[bytes]) -> bytes:
+        """Aportación de un archivo al hash de su directorio.
+        
+        Con digest cuenta el contenido en lugar del mtime: tocar un archivo
+        sin cambiarlo no lo marca como modificado.
+        """
+        encoded = name.encode('utf-8', 'surrogateescape') + b'\0'
+        if digest is not None:
+            return encoded + b'f' + struct.pack('<q', size) + digest
+        return encoded + b'F' + struct.pack('<qq', size, mtime_ns)
+    
+    @staticmethod
+    def directory_record(name: str, tree_hash: bytes) -> bytes:
+        """Aportación de un subdirectorio al hash de su padre"""
+        return name.encode('utf-8', 'surrogateescape') + b'\0d' + tree_hash
+    
+    def add(self, node_id: int, parent_id: Optional[int], name: str, is_dir: bool, size: int, files: int,
+            mtime_ns: Optional[int] = None, digest: Optional[bytes] = None, tree_hash: Optional[bytes] = None):
+        self.pending.append((node_id, parent_id, name, is_dir, size, files, mtime_ns, digest, tree_hash))
+        if len(self.pending) >= self.BATCH_SIZE:
+            self.flush()
+    
+    def flush(self):
+        self.db.executemany('INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', self.pending)
+        self.pending = []
+    
+    def finish(self, meta: Dict):
+        """Escribe lo pendiente, crea el índice por padre y guarda los metadatos"""
+        self.flush()
+        # El índice se crea al final: insertar con él ya creado es más lento
+        self.db.execute('CREATE INDEX nodes_parent ON nodes(parent)')
+        self.meta = dict(meta, version=self.VERSION)
+        self.db.executemany('INSERT INTO meta VALUES (?, ?)',
+                            [(key, json.dumps(value)) for key, value in self.meta.items()])
+        self.db.commit()
+    
+    def root(self) -> Tuple:
+        """Fila de la raíz: (id, is_dir, size, files, mtime_ns, digest, hash)"""
+        return self.db.execute(
+            'SELECT id, is_dir, size, files, mtime_ns, digest, hash FROM nodes WHERE parent IS NULL'
+        ).fetchone()
+    
+    def children(self, node_id: int) -> Dict[str, Tuple]:
+        """Hijos de un directorio por nombre, con las columnas de root()"""
+        return {
+            row[0]: row[1:] for row in self.db.execute(
+                'SELECT name, id, is_dir, size, files, mtime_ns, digest, hash FROM nodes WHERE parent = ?',
+                (node_id,)
+            )
+        }
+    
+    def close(self):
+        self.db.close()
+
+
+# Cambio -> (marca en ASCII, etiqueta) en la salida de --diff
+DIFF_CHANGES = {
+    'added': ('+', 'añadido'),
+    'removed': ('-', 'eliminado'),
+    'modified': ('~', 'modificado'),
+}
+
+# Formatos de los modos de resumen (--diff y --top)
+SUMMARY_FORMATS = ('ascii', 'markdown', 'json')
+
+
+def diff_snapshots(old: TreeSnapshot, new: TreeSnapshot) -> Iterator[Dict]:
+    """Produce los cambios entre dos instantáneas, en preorden y por nombre.
+    
+    Solo se baja por los directorios cuyo hash difiere, así que el coste
+    depende de los directorios con cambios y no del tamaño del árbol. Un
+    directorio añadido o eliminado se informa una sola vez, con su tamaño y
+    número de archivos; de uno modificado solo salen sus entradas cambiadas.
+    """
+    # Se comprueba al llamar, no al pedir el primer cambio
+    if bool(old.meta.get('digest')) != bool(new.meta.get('digest')):
+        raise ValueError("Las instantáneas no son comparables: solo una tiene digest de contenido")
+    return _iter_snapshot_changes(old, new)
+
+
+def _iter_snapshot_changes(old: TreeSnapshot, new: TreeSnapshot) -> Iterator[Dict]:
+    old_root = old.root()
+    new_root = new.root()
+    if old_root is None or new_root is None or old_root[6] == new_root[6]:
+        return
+    
+    def changed_entry(change: str, path: str, row: Tuple) -> Dict:
+        record = {'change': change, 'path': path, 'type': 'directory' if row[1] else 'file', 'size': row[2]}
+        if row[1]:
+            record['files'] = row[3]
+        return record
+    
+    def compare(old_id: int, new_id: int, rel_dir: str) -> Iterator[Tuple[str, Optional[Tuple], Optional[Tuple]]]:
+        old_children = old.children(old_id)
+        new_children = new.children(new_id)
+        for name in sorted(old_children.keys() | new_children.keys()):
+            yield rel_dir + name, old_children.get(name), new_children.get(name)
+    
+    # Pila de directorios abiertos en lugar de recursión: la profundidad no está limitada
+    stack = [compare(old_root[0], new_root[0], '')]
+    while stack:
+        item = next(stack[-1], None)
+        if item is None:
+            stack.pop()
+            continue
+        path, old_row, new_row = item
+        if old_row is not None and new_row is not None and old_row[1] == new_row[1]:
+            if old_row[1]:
+                if old_row[6] != new_row[6]:
+                    stack.append(compare(old_row[0], new_row[0], path + '/'))
+                continue
+            # Con digest manda el contenido; sin él, el mtime
+            if old_row[5] is not None:
+                modified = old_row[5] != new_row[5]
+            else:
+                modified = old_row[4] != new_row[4]
+            if modified or old_row[2] != new_row[2]:
+                record = changed_entry('modified', path, new_row)
+                record['old_size'] = old_row[2]
+                yield record
+            continue
+        # Un cambio de tipo (archivo <-> directorio) es una baja más un alta
+        if old_row is not None:
+            yield changed_entry('removed', path, old_row)
+        if new_row is not None:
+            yield changed_entry('added', path, new_row)
+
+
+class TreeNode:
+    """Nodo compacto del árbol.
+    
+    La ruta no se guarda: se reconstruye subiendo por los padres. El icono es
+    una referencia a las cadenas compartidas de ProjectTreeGenerator.icons.
+    En los directorios children es None hasta que se escanean; identity es su
+    (st_dev, st_ino), que se fija al listarlos para detectar bucles.
+    """
+    
+    __slots__ = ('name', 'parent', 'is_dir', 'size', 'icon', 'children', 'identity')
+    
+    def __init__(self, name: str, parent: Optional['TreeNode'], is_dir: bool,
+                 size: int = 0, icon: str = '', children: Optional[List['TreeNode']] = None):
+        self.name = name
+        self.parent = parent
+        self.is_dir = is_dir
+        self.size = size
+        self.icon = icon
+        self.children = children
+        self.identity: Optional[Tuple[int, int]] = None
+    
+    @property
+    def type(self) -> str:
+        return 'directory' if self.is_dir else 'file'
+    
+    @property
+    def path(self) -> str:
+        names = []
+        node = self
+        while node.parent is not None:
+            names.append(node.name)
+            node = node.parent
+        if not names:
+            return node.root_path
+        # Los nombres nunca contienen el separador: unir directamente evita el coste
+        # por componente de os.path.join en árboles muy profundos
+        names.reverse()
+        return os.path.join(node.root_path, os.sep.join(names))
+    
+    def to_dict(self) -> Dict:
+        """Convierte el subárbol al formato anidado de diccionarios (el de generate_json)"""
+        root = self._as_dict(self.path)
+        stack = [(self, root)]
+        while stack:
+            node, data = stack.pop()
+            if not node.is_dir or not node.children:
+                continue
+            for child in node.children:
+                child_data = child._as_dict(os.path.join(data['path'], child.name))
+                data['children'].append(child_data)
+                stack.append((child, child_data))
+        return root
+    
+    def _as_dict(self, path: str) -> Dict:
+        data = {'name': self.name, 'path': path, 'type': self.type, 'size': self.size, 'icon': self.icon}
+        if self.is_dir:
+            data['children'] = []
+        return data
+
+
+class TreeRoot(TreeNode):
+    """Raíz del árbol: guarda la ruta tal como se pidió, de la que cuelgan las demás"""
+    
+    __slots__ = ('root_path',)
+    
+    def __init__(self, root_path: str, icon: str = ''):
+        super().__init__(os.path.basename(root_path), None, True, icon=icon)
+        self.root_path = root_path
+
+
+# Formatos de salida soportados
+FORMATS = ('ascii', 'markdown', 'mermaid', 'json', 'ndjson')
+
+# Motivos de exclusión y su etiqueta en las estadísticas
+IGNORE_REASONS = {
+    'hidden': 'ocultos',
+    'directory': 'directorios',
+    'file': 'archivos',
+    'gitignore': '.gitignore',
+    'loop': 'bucles',
+    'filesystem': 'otros sistemas de archivos',
+}
+
+# Fases medidas con --debug/--profile (y en el servidor) y su etiqueta
+PHASES = {
+    'list': 'Listado (scandir o caché)',
+    'stat': 'Tamaños (stat)',
+    'ignore': 'Reglas de exclusión',
+    'scan': 'Escaneo completo',
+    'duplicates': 'Búsqueda de duplicados',
+    'render': 'Renderizado',
+}
+
+# Directorios más lentos que se conservan en el perfil
+SLOWEST_DIRS_SIZE = 10
+
+# Espera tras el primer evento de inotify para agrupar ráfagas de cambios
+WATCH_DEBOUNCE = 0.2
+
+# Elementos ignorados que se conservan como muestra (sin límite con --debug-full)
+IGNORED_SAMPLE_SIZE = 100
+
+# Bytes del principio de cada archivo que se hashean antes del hash completo:
+# una sola lectura que suele bastar para separar archivos del mismo tamaño
+DUPLICATE_PREFIX_SIZE = 16 * 1024
+
+# Hilos mínimos para leer y hashear duplicados (la lectura espera a disco)
+DUPLICATE_WORKERS = 8
+
+# Categorías de get_file_icon (claves de ProjectTreeGenerator.icons) en el resumen de --top
+CATEGORY_LABELS = {
+    'code': 'código',
+    'document': 'documentos',
+    'image': 'imágenes',
+    'config': 'configuración',
+    'data': 'datos',
+    'executable': 'ejecutables',
+    'hidden': 'ocultos',
+    'file': 'otros',
+}
+
+
+class ScanCancelled(Exception):
+    """El escaneo se detuvo porque se canceló desde otro hilo"""
+
+
+class ScanTimeout(ScanCancelled):
+    """El escaneo se detuvo porque superó su plazo"""
+
+
 class ProjectTreeGenerator:
     """Generador de árbol de proyectos con funcionalidades avanzadas"""
     
     def __init__(self, config: Dict):
         self.config = config
+        # Destino de los mensajes de debug (stdout en la CLI, un buffer en el servidor)
+        self.log_stream = config.get('log_stream') or sys.stdout
         self.stats = {
             'total_files': 0,
             'total_directories': 0,
-            'ignored_items': [],
-            'processed_items': [],
+            # Contadores O(1) en memoria; de los ignorados solo se guarda una muestra
+            'ignored_items': 0,
+            'ignored_by_reason': {reason: 0 for reason in IGNORE_REASONS},
+            'ignored_sample': [],
+            'processed_items': 0,
             'start_time': time.time(),
             'max_depth_reached': False,
-            'total_size': 0
+            'total_size': 0,
+            'syscalls': {'scandir': 0, 'stat': 0},
+            'cache': {'hits': 0, 'misses': 0},
+            # Segundos por fase; los directorios más lentos como montículo (segundos, ruta)
+            'phases': {phase: 0.0 for phase in PHASES},
+            'rendered_bytes': 0,
+            'slowest_dirs': [],
+            # Enlaces duros repetidos que no suman en total_size
+            'hardlinks': 0,
+            # --find-duplicates: grupos, archivos repetidos, bytes desperdiciados y leídos
+            'duplicates': {'groups': 0, 'files': 0, 'wasted_bytes': 0, 'bytes_read': 0}
         }
+        self.stats_lock = threading.Lock()
+        # Cancelación cooperativa: se comprueba al empezar cada directorio
+        self.cancel_event = threading.Event()
+        self.deadline: Optional[float] = None
+        # Directorio que se está listando, para informar del progreso
+        self.current_path = ''
+        # Medición por fases: un par de lecturas de reloj por entrada, solo si se pide
+        self.profiling = bool(config.get('profile')) or config['debug']
+        # Política de recorrido: seguir enlaces a directorios y cruzar puntos de montaje
+        self.follow_symlinks = config.get('follow_symlinks', True)
+        self.one_file_system = bool(config.get('one_file_system'))
+        self.root_dev: Optional[int] = None
+        # (st_dev, st_ino) de los directorios listados y de los archivos con varios
+        # enlaces duros ya sumados; se consultan bajo stats_lock. scan_top no guarda
+        # los directorios (visited_dirs = None): le basta con su cadena abierta
+        self.visited_dirs: Optional[Set[Tuple[int, int]]] = set()
+        self.open_identities: Set[Tuple[int, int]] = set()
+        self.hardlinks: Set[Tuple[int, int]] = set()
+        # Índice del tar/zip/ipk cuando la raíz es un archivo en lugar de un directorio
+        self.archive: Optional[ArchiveIndex] = None
+        self.ignore_rules = compile_ignore_rules(tuple(config['ignore_dirs']), tuple(config['ignore_files']))
+        # Reglas de cada .gitignore encontrado, por directorio relativo a la raíz
+        self.gitignores: Dict[str, IgnoreRuleSet] = {}
+        self.root_prefix = ''
+        # Las instantáneas necesitan el mtime de cada archivo, que la caché no guarda
+        self.scan_cache = (
+            ScanCache(config['cache_dir']) if config.get('cache_dir') and not config.get('snapshot') else None
+        )
+        # mtime de cada directorio escaneado, para validar resultados cacheados
+        self.dir_mtimes: Dict[str, int] = {}
+        # Con --find-duplicates, número de grupo de cada archivo repetido
+        self.duplicates: Dict[TreeNode, int] = {}
+        # Con --snapshot, mtime_ns de cada archivo leído y todavía no escrito
+        self.mtimes: Optional[Dict[TreeNode, int]] = {} if config.get('snapshot') else None
+        # stat() por entrada solo cuando se necesitan tamaños
+        self.needs_stat = (
+            config['show_sizes'] or config['debug'] or config.get('stats', False)
+            or config['format'] in ('markdown', 'json', 'ndjson') or self.mtimes is not None
+            or bool(config.get('top')) or bool(config.get('find_duplicates'))
+        )
+        # Con track_mtimes, XOR de un hash por directorio de (nombre, mtime_ns, tamaño) de
+        # sus archivos: detecta cambios de contenido que no tocan el mtime del directorio.
+        # Sale del stat que ya está cacheado en cada entrada, así que solo se lleva si hay stat
+        self.files_digest: Optional[int] = 0 if config.get('track_mtimes') and self.needs_stat else None
         self.icons = {
             'directory': '📁',
             'file': '📄',
@@ -82,6 +1074,31 @@ class ProjectTreeGenerator:
             'data': '📊'
         }
         
+    def cancel(self):
+        """Pide que el escaneo se detenga en el próximo directorio (desde cualquier hilo)"""
+        self.cancel_event.set()
+    
+    def check_cancelled(self):
+        """Lanza ScanCancelled o ScanTimeout si hay que abandonar el escaneo"""
+        if self.cancel_event.is_set():
+            raise ScanCancelled("Escaneo cancelado")
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise ScanTimeout("El escaneo superó su tiempo máximo")
+    
+    def progress(self) -> Dict:
+        """Avance del escaneo en curso; se puede leer desde otro hilo"""
+        return {
+            'entries': self.stats['processed_items'],
+            'directories': self.stats['total_directories'],
+            'files': self.stats['total_files'],
+            'ignored': self.stats['ignored_items'],
+            'current_path': self.current_path,
+        }
+    
+    def log(self, message: str = ''):
+        """Escribe un mensaje de debug en el stream configurado"""
+        print(message, file=self.log_stream)
+    
     def get_file_icon(self, filename: str, is_dir: bool = False) -> str:
         """Obtiene el icono apropiado para un archivo basado en su extensión"""
         if is_dir:
@@ -119,7 +1136,8 @@ class ProjectTreeGenerator:
         
         return self.icons['file']
     
-    def format_size(self, size: int) -> str:
+    @staticmethod
+    def format_size(size: int) -> str:
         """Formatea el tamaño de archivo en formato legible"""
         units = ['B', 'KB', 'MB', 'GB', 'TB']
         unit_index = 0
@@ -130,28 +1148,91 @@ class ProjectTreeGenerator:
         
         return f"{size:.1f} {units[unit_index]}"
     
-    def should_ignore(self, name: str, path: str, is_dir: bool) -> bool:
+    def should_ignore(self, name: str, path: str, is_dir: bool,
+                      gitignores: List[Tuple[str, IgnoreRuleSet]] = ()) -> bool:
         """Determina si un archivo o directorio debe ser ignorado"""
         # Archivos ocultos
         if name.startswith('.') and not self.config['show_hidden']:
-            self.stats['ignored_items'].append(f"🔒 {name} (archivo oculto)")
+            self.record_ignored('hidden', f"🔒 {name} (archivo oculto)")
             return True
         
-        # Directorios a ignorar
-        if is_dir:
-            for pattern in self.config['ignore_dirs']:
-                if fnmatch.fnmatch(name, pattern):
-                    self.stats['ignored_items'].append(f"📁 {name} (directorio ignorado)")
-                    return True
+        rel_path = self.relative_path(path) if self.ignore_rules.needs_paths or gitignores else name
+        reason = self.ignore_rules.match(name, rel_path, is_dir, gitignores)
+        if reason is None:
+            return False
         
-        # Archivos a ignorar
+        if reason == IgnoreRules.GITIGNORE:
+            self.record_ignored('gitignore', f"{'📁' if is_dir else '📄'} {name} (ignorado por .gitignore)")
+        elif is_dir:
+            self.record_ignored('directory', f"📁 {name} (directorio ignorado)")
         else:
-            for pattern in self.config['ignore_files']:
-                if fnmatch.fnmatch(name, pattern):
-                    self.stats['ignored_items'].append(f"📄 {name} (archivo ignorado)")
-                    return True
+            self.record_ignored('file', f"📄 {name} (archivo ignorado)")
+        return True
+    
+    def record_ignored(self, reason: str, description: str):
+        """Cuenta un elemento ignorado y lo guarda en la muestra si queda sitio"""
+        with self.stats_lock:
+            self.stats['ignored_items'] += 1
+            self.stats['ignored_by_reason'][reason] += 1
+            if self.config.get('debug_full') or len(self.stats['ignored_sample']) < IGNORED_SAMPLE_SIZE:
+                self.stats['ignored_sample'].append(description)
+    
+    def ignored_summary(self) -> str:
+        """Desglose de los elementos ignorados por motivo"""
+        counts = self.stats['ignored_by_reason']
+        details = ', '.join(f"{label}: {counts[reason]}" for reason, label in IGNORE_REASONS.items() if counts[reason])
+        return f"{self.stats['ignored_items']} ({details})" if details else str(self.stats['ignored_items'])
+    
+    def start_scan(self, root_path: str):
+        """Fija la raíz respecto a la que se evalúan las reglas con rutas"""
+        self.root_prefix = root_path if root_path.endswith(os.sep) else root_path + os.sep
+        # Un archivo comprimido se recorre desde su índice, sin extraerlo
+        is_archive = os.path.isfile(root_path) and ArchiveIndex.detect(root_path) is not None
+        self.archive = ArchiveIndex(root_path) if is_archive else None
+
+    def flush_cache(self):
+        """Confirma lo pendiente en la caché de escaneos, si la hay"""
+        if self.scan_cache is not None:
+            self.scan_cache.flush()
+
+    def close(self):
+        """Libera la conexión de la caché de escaneos; el generador no se reutiliza después"""
+        if self.scan_cache is not None:
+            self.scan_cache.close()
+
+    def relative_path(self, path: str) -> str:
+        """Ruta relativa a la raíz del escaneo, con '/' como separador"""
+        rel_path = path[len(self.root_prefix):] if path.startswith(self.root_prefix) else ''
+        return rel_path.replace(os.sep, '/') if os.sep != '/' else rel_path
+    
+    def gitignore_chain(self, path: str, entries: List[os.DirEntry]) -> List[Tuple[str, IgnoreRuleSet]]:
+        """Carga el .gitignore del directorio (si lo hay) y devuelve los aplicables"""
+        # Dentro de un archivo comprimido no se leen contenidos, tampoco los .gitignore
+        if not self.config.get('gitignore') or self.archive is not None:
+            return []
+        
+        rel_dir = self.relative_path(path)
+        if any(entry.name == '.gitignore' for entry in entries):
+            try:
+                with open(os.path.join(path, '.gitignore'), encoding='utf-8', errors='replace') as f:
+                    rules = parse_gitignore(f)
+            except OSError as e:
+                rules = []
+                if self.config['debug']:
+                    self.log(f"{Colors.WARNING}Warning: No se pudo leer {path}/.gitignore: {e}{Colors.ENDC}")
+            if rules:
+                self.gitignores[rel_dir] = IgnoreRuleSet(rules)
         
-        return False
+        # Del directorio actual hacia la raíz: el .gitignore más profundo manda
+        chain = []
+        base = rel_dir
+        while True:
+            if base in self.gitignores:
+                chain.append((base, self.gitignores[base]))
+            if not base:
+                break
+            base = base.rpartition('/')[0]
+        return chain
     
     def get_file_info(self, path: str) -> Dict:
         """Obtiene información detallada de un archivo o directorio"""
@@ -169,137 +1250,677 @@ class ProjectTreeGenerator:
             }
         except (OSError, PermissionError) as e:
             if self.config['debug']:
-                print(f"{Colors.WARNING}Warning: No se pudo acceder a {path}: {e}{Colors.ENDC}")
+                self.log(f"{Colors.WARNING}Warning: No se pudo acceder a {path}: {e}{Colors.ENDC}")
             return None
     
-    def scan_directory(self, path: str, current_depth: int = 0) -> Optional[Dict]:
-        """Escanea un directorio y construye su estructura"""
-        if self.config['max_depth'] > 0 and current_depth >= self.config['max_depth']:
-            self.stats['max_depth_reached'] = True
+    def list_directory(self, path: str, dir_fd: Optional[int] = None) -> Optional[List[os.DirEntry]]:
+        """Lista un directorio con una sola llamada a scandir, ordenado por nombre"""
+        if self.archive is not None:
+            return self.archive.listing(path)
+        try:
+            if dir_fd is not None or (len(path) > LONG_PATH_LENGTH and os.open in os.supports_dir_fd):
+                entries = self.list_long_directory(path, dir_fd)
+            else:
+                with os.scandir(path) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            if self.config['debug']:
+                self.log(f"{Colors.WARNING}Warning: No se pudo listar {path}: {e}{Colors.ENDC}")
             return None
+        return entries
+    
+    def list_long_directory(self, path: str, dir_fd: Optional[int] = None) -> List[CachedEntry]:
+        """Lista un directorio cuya ruta supera PATH_MAX.
         
+        Se abre encadenando openat() por tramos (o se usa dir_fd, ya abierto
+        por quien recorre el árbol) y las entradas se resuelven mientras el
+        descriptor sigue abierto, porque su ruta completa ya no sirve para stat().
+        """
+        fd = open_long_path(path) if dir_fd is None else dir_fd
         try:
-            items = sorted(os.listdir(path))
-        except (OSError, PermissionError) as e:
+            with os.scandir(fd) as it:
+                dir_entries = sorted(it, key=lambda entry: entry.name)
+            entries = []
+            for entry in dir_entries:
+                is_symlink = entry.is_symlink()
+                is_dir = entry.is_dir()
+                size = None
+                link = None
+                mtime_ns = 0
+                if not is_dir and (self.needs_stat or is_symlink):
+                    try:
+                        stat = entry.stat()
+                        size = stat.st_size
+                        mtime_ns = stat.st_mtime_ns
+                        if stat.st_nlink > 1:
+                            link = [stat.st_dev, stat.st_ino]
+                    except OSError:
+                        size = -1
+                entries.append(CachedEntry(path, entry.name, is_dir, is_symlink, size, link, mtime_ns))
+            return entries
+        finally:
+            if dir_fd is None:
+                os.close(fd)
+    
+    def entry_size(self, entry: os.DirEntry) -> Optional[int]:
+        """Obtiene el tamaño de un archivo reutilizando el stat cacheado de la entrada"""
+        if not self.needs_stat and not entry.is_symlink():
+            return 0
+        try:
+            stat = entry.stat()
+        except OSError as e:
             if self.config['debug']:
-                print(f"{Colors.WARNING}Warning: No se pudo listar {path}: {e}{Colors.ENDC}")
+                self.log(f"{Colors.WARNING}Warning: No se pudo acceder a {entry.path}: {e}{Colors.ENDC}")
+            return None
+        return stat.st_size if self.needs_stat else 0
+    
+    def stat_directory(self, path: str, dir_fd: Optional[int] = None) -> Optional[os.stat_result]:
+        """stat() de un directorio a escanear, también si su ruta supera PATH_MAX"""
+        try:
+            if dir_fd is not None:
+                return os.fstat(dir_fd)
+            if len(path) > LONG_PATH_LENGTH and os.open in os.supports_dir_fd:
+                fd = open_long_path(path)
+                try:
+                    return os.fstat(fd)
+                finally:
+                    os.close(fd)
+            return os.stat(path)
+        except OSError:
             return None
+    
+    def enter_directory(self, node: TreeNode, dir_stat: os.stat_result) -> bool:
+        """Registra la identidad de un directorio; False si hay que podarlo sin listarlo.
         
-        file_info = self.get_file_info(path)
-        if not file_info:
+        Se poda al cruzar a otro sistema de archivos con --one-file-system y
+        cuando el directorio es uno de sus propios ancestros (un enlace o un
+        montaje bind que apunta hacia arriba). Un directorio alcanzado por dos
+        caminos sin ciclo se recorre en ambos, como hace find -L.
+        """
+        identity = (dir_stat.st_dev, dir_stat.st_ino)
+        if node.parent is None:
+            self.root_dev = dir_stat.st_dev
+        elif self.one_file_system and dir_stat.st_dev != self.root_dev:
+            self.record_ignored('filesystem', f"📁 {node.name} (otro sistema de archivos)")
+            return False
+        
+        if self.visited_dirs is None:
+            # scan_top: las identidades de los directorios abiertos en su pila
+            if identity in self.open_identities:
+                self.record_ignored('loop', f"🔁 {node.name} (bucle: ya es un directorio superior)")
+                return False
+            node.identity = identity
+            return True
+        # Solo una identidad repetida obliga a subir por los ancestros
+        with self.stats_lock:
+            repeated = identity in self.visited_dirs
+            self.visited_dirs.add(identity)
+        if repeated:
+            ancestor = node.parent
+            while ancestor is not None:
+                if ancestor.identity == identity:
+                    self.record_ignored('loop', f"🔁 {node.name} (bucle: ya es un directorio superior)")
+                    return False
+                ancestor = ancestor.parent
+        node.identity = identity
+        return True
+    
+    def open_location(self, location: Tuple[Optional[int], str]) -> Optional[int]:
+        """Abre un directorio profundo con un solo openat() relativo a su ancla.
+        
+        Sin ancla devuelve None y el directorio se lee por su ruta como siempre.
+        """
+        anchor, rel_path = location
+        if anchor is None:
+            return None
+        try:
+            return os.open(rel_path, os.O_RDONLY | os.O_DIRECTORY, dir_fd=anchor)
+        except OSError as e:
+            if self.config['debug']:
+                self.log(f"{Colors.WARNING}Warning: No se pudo abrir {rel_path}: {e}{Colors.ENDC}")
             return None
+    
+    def enter_location(self, location: Tuple[Optional[int], str],
+                       dir_fd: Optional[int] = None) -> Tuple[Tuple[Optional[int], str], Optional[int]]:
+        """Ubicación desde la que se abrirán los hijos de un directorio que se va a recorrer.
         
-        structure = {
-            'name': file_info['name'],
-            'path': path,
-            'type': 'directory',
-            'size': 0,
-            'icon': file_info['icon'],
-            'children': []
-        }
+        Mientras la ruta relativa es corta se sigue usando el ancla del padre;
+        al pasar de ANCHOR_PATH_LENGTH el propio directorio se convierte en el
+        ancla (reutilizando dir_fd si ya está abierto). Así cada directorio se
+        abre con un openat() de longitud acotada en lugar de recorrer otra vez
+        toda la ruta desde la raíz, y solo queda abierto un descriptor cada
+        ANCHOR_PATH_LENGTH caracteres de profundidad. Devuelve la ubicación y
+        el descriptor que hay que cerrar al salir del directorio (o None).
+        """
+        anchor, rel_path = location
+        if (len(rel_path) <= ANCHOR_PATH_LENGTH or self.archive is not None
+                or os.open not in os.supports_dir_fd):
+            if dir_fd is not None:
+                os.close(dir_fd)
+            return location, None
+        if dir_fd is None:
+            try:
+                dir_fd = (open_long_path(rel_path) if anchor is None else
+                          os.open(rel_path, os.O_RDONLY | os.O_DIRECTORY, dir_fd=anchor))
+            except OSError:
+                return location, None
+        return (dir_fd, os.curdir), dir_fd
+    
+    def make_root_node(self, path: str) -> TreeRoot:
+        """Crea el nodo raíz todavía sin escanear (children = None)"""
+        return TreeRoot(path, self.icons['directory'])
+    
+    def read_directory(self, node: TreeNode, dir_fd: Optional[int] = None) -> Optional[List[TreeNode]]:
+        """Lista un directorio y devuelve sus hijos filtrados y ordenados.
+        
+        Los archivos vuelven completos; los subdirectorios como nodos sin escanear.
+        Es seguro llamarlo desde varios hilos: las estadísticas se acumulan en
+        local y se fusionan una sola vez por directorio. Con dir_fd (el
+        directorio ya abierto, ver open_location) no se resuelve su ruta.
+        """
+        self.check_cancelled()
+        profiling = self.profiling
+        if profiling:
+            started = time.perf_counter()
+            ignore_time = 0.0
+            stat_time = 0.0
+        path = node.path
+        self.current_path = path
+        # Un stat() por directorio: identidad para los bucles, dispositivo para
+        # --one-file-system y validación de la caché
+        dir_stat = self.stat_directory(path, dir_fd) if self.archive is None else None
+        if dir_stat is not None and not self.enter_directory(node, dir_stat):
+            return []
+        entries = None
+        # files_digest necesita el mtime real de cada archivo: reescribir uno en su
+        # sitio no cambia el del directorio, así que de la caché solo vale el listado
+        restat = self.files_digest is not None
+        if self.scan_cache is not None and dir_stat is not None:
+            entries = self.scan_cache.lookup(path, dir_stat, restat)
+        from_cache = entries is not None
+        if not from_cache:
+            entries = self.list_directory(path, dir_fd)
+            if entries is None:
+                return None
+        caching = self.scan_cache is not None and dir_stat is not None and not from_cache
         
-        self.stats['total_directories'] += 1
-        self.stats['processed_items'].append(file_info['name'])
+        children = []
+        files = 0
+        size_total = 0
+        stat_calls = 0
+        processed = 1
+        records = []
+        # (identidad, tamaño) de los archivos con varios enlaces duros
+        links = []
+        # (nodo, mtime_ns) de los archivos, solo para las instantáneas
+        file_mtimes = [] if self.mtimes is not None else None
+        files_digest = (hashlib.blake2b(path.encode('utf-8', 'surrogateescape'), digest_size=16)
+                        if self.files_digest is not None else None)
+        follow = self.follow_symlinks
+        if profiling:
+            listed = time.perf_counter()
+        gitignores = self.gitignore_chain(path, entries)
         
-        # Procesar elementos del directorio
-        for item in items:
-            item_path = os.path.join(path, item)
-            is_dir = os.path.isdir(item_path)
+        for entry in entries:
+            is_symlink = entry.is_symlink()
+            unresolved = is_symlink and not follow
+            if unresolved:
+                # Sin seguir enlaces se listan como una entrada más, sin tocar su destino;
+                # la caché guarda aun así el tipo del destino para las pasadas que sí siguen
+                is_dir = False
+                record = [entry.name, caching and entry.is_dir(), True, None]
+            else:
+                # Los enlaces necesitan stat() para resolver el destino (queda cacheado)
+                if is_symlink and (restat or not from_cache):
+                    stat_calls += 1
+                is_dir = entry.is_dir()
+                record = [entry.name, is_dir, is_symlink, None]
+            records.append(record)
             
-            if self.should_ignore(item, item_path, is_dir):
+            if profiling:
+                mark = time.perf_counter()
+            ignored = self.should_ignore(entry.name, entry.path, is_dir, gitignores)
+            if profiling:
+                ignore_time += time.perf_counter() - mark
+            if ignored:
                 continue
             
             if is_dir:
-                child_structure = self.scan_directory(item_path, current_depth + 1)
-                if child_structure:
-                    structure['children'].append(child_structure)
-                    structure['size'] += child_structure['size']
+                children.append(TreeNode(entry.name, node, True, icon=self.icons['directory']))
+                continue
+            
+            if unresolved:
+                size = 0
             else:
-                file_info = self.get_file_info(item_path)
-                if file_info:
-                    child_structure = {
-                        'name': file_info['name'],
-                        'path': item_path,
-                        'type': 'file',
-                        'size': file_info['size'],
-                        'icon': file_info['icon']
-                    }
-                    structure['children'].append(child_structure)
-                    structure['size'] += file_info['size']
-                    self.stats['total_files'] += 1
-                    self.stats['total_size'] += file_info['size']
-                    self.stats['processed_items'].append(file_info['name'])
-        
-        return structure
-    
-    def generate_ascii_tree(self, structure: Dict, prefix: str = '', is_last: bool = True) -> str:
-        """Genera el árbol en formato ASCII"""
-        if not structure:
-            return ""
+                if profiling:
+                    mark = time.perf_counter()
+                size = self.entry_size(entry)
+                if profiling:
+                    stat_time += time.perf_counter() - mark
+                if self.needs_stat and not is_symlink and (restat or not from_cache):
+                    stat_calls += 1
+            if size is None:
+                record[3] = -1
+                continue
+            if self.needs_stat and not unresolved:
+                record[3] = size
+                if size:
+                    # El stat ya está cacheado en la entrada: no cuesta otra llamada
+                    stat = entry.stat()
+                    if stat.st_nlink > 1:
+                        links.append(((stat.st_dev, stat.st_ino), size))
+                        record.append([stat.st_dev, stat.st_ino])
+            child = TreeNode(entry.name, node, False, size, self.get_file_icon(entry.name))
+            children.append(child)
+            if file_mtimes is not None or files_digest is not None:
+                mtime_ns = 0 if unresolved else entry.stat().st_mtime_ns
+                if file_mtimes is not None:
+                    file_mtimes.append((child, mtime_ns))
+                if files_digest is not None:
+                    files_digest.update(f'{entry.name}\0{mtime_ns}\0{size}\0'.encode('utf-8', 'surrogateescape'))
+            files += 1
+            size_total += size
+            processed += 1
+        
+        if caching:
+            self.scan_cache.store(path, dir_stat, records)
+        # De un archivo comprimido basta con el mtime del propio archivo (la raíz); con
+        # --top, también, para que la memoria no crezca con el número de directorios
+        if self.config.get('track_mtimes') and (node.parent is None or self.archive is None
+                                                 and self.visited_dirs is not None):
+            self.record_mtime(path, dir_stat)
+        
+        with self.stats_lock:
+            # Cada enlace duro suma una sola vez en el total
+            for identity, size in links:
+                if identity in self.hardlinks:
+                    size_total -= size
+                    self.stats['hardlinks'] += 1
+                else:
+                    self.hardlinks.add(identity)
+            if file_mtimes:
+                self.mtimes.update(file_mtimes)
+            if files_digest is not None:
+                self.files_digest ^= int.from_bytes(files_digest.digest(), 'big')
+            self.stats['total_directories'] += 1
+            self.stats['total_files'] += files
+            self.stats['total_size'] += size_total
+            self.stats['processed_items'] += processed
+            self.stats['syscalls']['scandir'] += 0 if from_cache or self.archive is not None else 1
+            self.stats['syscalls']['stat'] += stat_calls + (dir_stat is not None)
+            if self.scan_cache is not None:
+                self.stats['cache']['hits' if from_cache else 'misses'] += 1
+            if profiling:
+                elapsed = time.perf_counter() - started
+                phases = self.stats['phases']
+                phases['list'] += listed - started
+                phases['ignore'] += ignore_time
+                phases['stat'] += stat_time
+                phases['scan'] += elapsed
+                slowest = self.stats['slowest_dirs']
+                if len(slowest) < SLOWEST_DIRS_SIZE:
+                    heapq.heappush(slowest, (elapsed, path))
+                elif elapsed > slowest[0][0]:
+                    heapq.heapreplace(slowest, (elapsed, path))
+        return children
+    
+    def record_mtime(self, path: str, dir_stat: Optional[os.stat_result] = None):
+        """Guarda el mtime de un directorio escaneado (un stat si no se tenía ya)"""
+        try:
+            self.dir_mtimes[path] = (dir_stat or os.stat(path)).st_mtime_ns
+        except OSError:
+            self.dir_mtimes[path] = -1
+    
+    def load_parent_gitignores(self, path: str):
+        """Carga los .gitignore de los directorios entre la raíz y path (sin incluirlo)"""
+        rel_dir = self.relative_path(path)
+        parts = rel_dir.split('/') if rel_dir else []
+        for depth in range(len(parts)):
+            base = '/'.join(parts[:depth])
+            try:
+                with open(os.path.join(self.root_prefix, *parts[:depth], '.gitignore'),
+                          encoding='utf-8', errors='replace') as f:
+                    rules = parse_gitignore(f)
+            except OSError:
+                continue
+            if rules:
+                self.gitignores[base] = IgnoreRuleSet(rules)
+    
+    def read_children(self, root_path: str, path: str) -> List[Tuple[str, bool]]:
+        """Lista y filtra un solo nivel de un directorio con una llamada a scandir.
+        
+        Devuelve (nombre, es_directorio) ordenado por nombre, sin tamaños: es
+        la base que pagina page_children. root_path fija la raíz de las reglas
+        ancladas y de los .gitignore; path debe estar dentro de ella.
+        """
+        root_path = os.path.normpath(root_path)
+        path = os.path.normpath(os.path.join(root_path, path))
+        if not os.path.isdir(root_path):
+            raise NotADirectoryError(f"La ruta {root_path} no es un directorio")
+        self.start_scan(root_path)
+        if path != root_path and not path.startswith(self.root_prefix):
+            raise ValueError(f"La ruta {path} no está dentro de {root_path}")
+        
+        if self.one_file_system and os.stat(path).st_dev != os.stat(root_path).st_dev:
+            return []
+        with os.scandir(path) as it:
+            entries = list(it)
+        if self.config.get('gitignore'):
+            self.load_parent_gitignores(path)
+        gitignores = self.gitignore_chain(path, entries)
+        with self.stats_lock:
+            self.stats['syscalls']['scandir'] += 1
+        
+        listing = []
+        for entry in entries:
+            is_dir = entry.is_dir(follow_symlinks=self.follow_symlinks)
+            if not self.should_ignore(entry.name, entry.path, is_dir, gitignores):
+                listing.append((entry.name, is_dir))
+        listing.sort()
+        return listing
+    
+    def page_children(self, path: str, listing: List[Tuple[str, bool]], cursor: Optional[str] = None,
+                      limit: int = 500) -> Tuple[List[TreeNode], Optional[str]]:
+        """Construye una página de un listado de read_children.
+        
+        El cursor es el nombre de la última entrada servida, así que las altas
+        y bajas entre páginas no desplazan las siguientes. Solo se hace stat()
+        de los archivos de la página. Devuelve los nodos (los directorios sin
+        escanear) y el cursor de la página siguiente, o None si no hay más.
+        """
+        # (cursor, True) queda justo detrás de cualquier entrada con ese nombre
+        start = bisect.bisect_right(listing, (cursor, True)) if cursor is not None else 0
+        page = listing[start:start + limit]
+        next_cursor = page[-1][0] if start + limit < len(listing) else None
+        
+        parent = TreeRoot(path, self.icons['directory'])
+        nodes = []
+        stat_calls = 0
+        for name, is_dir in page:
+            if is_dir:
+                nodes.append(TreeNode(name, parent, True, icon=self.icons['directory']))
+                continue
+            size = 0
+            if self.needs_stat:
+                stat_calls += 1
+                try:
+                    entry_stat = os.stat(os.path.join(path, name), follow_symlinks=self.follow_symlinks)
+                except OSError:
+                    continue
+                # Un enlace sin seguir se muestra sin tamaño, como en el árbol completo
+                size = 0 if S_ISLNK(entry_stat.st_mode) else entry_stat.st_size
+            nodes.append(TreeNode(name, parent, False, size, self.get_file_icon(name)))
+        with self.stats_lock:
+            self.stats['syscalls']['stat'] += stat_calls
+        return nodes, next_cursor
+    
+    def list_children(self, root_path: str, path: str, cursor: Optional[str] = None,
+                      limit: int = 500) -> Tuple[List[TreeNode], Optional[str]]:
+        """Lista una página de un solo nivel de un directorio (expansión bajo demanda)"""
+        listing = self.read_children(root_path, path)
+        return self.page_children(os.path.normpath(os.path.join(root_path, path)), listing, cursor, limit)
+    
+    def populate_directory(self, node: TreeNode, current_depth: int, dir_fd: Optional[int] = None) -> bool:
+        """Rellena los hijos directos de un nodo; False si queda fuera del árbol"""
+        if self.config['max_depth'] > 0 and current_depth >= self.config['max_depth']:
+            self.stats['max_depth_reached'] = True
+            return False
         
-        # Construir línea actual
-        connector = '└── ' if is_last else '├── '
-        icon = structure['icon']
-        name = structure['name']
+        children = self.read_directory(node, dir_fd)
+        if children is None:
+            return False
+        node.children = children
+        return True
+    
+    def finalize_directory(self, node: TreeNode):
+        """Descarta los subdirectorios que no se pudieron escanear y suma tamaños"""
+        node.children = [
+            child for child in node.children
+            if not child.is_dir or child.children is not None
+        ]
+        node.size = sum(child.size for child in node.children)
+    
+    def scan_directory(self, path: str, current_depth: int = 0) -> Optional[TreeRoot]:
+        """Escanea un directorio y construye su estructura"""
+        if current_depth == 0:
+            self.start_scan(path)
+        structure = self.make_root_node(path)
+        try:
+            if self.config.get('jobs', 1) > 1:
+                scanned = self.scan_parallel(structure, current_depth)
+            else:
+                scanned = self.scan_node(structure, current_depth)
+        finally:
+            # También al cancelar o agotar el tiempo: no dejar la transacción abierta
+            self.flush_cache()
+        return structure if scanned else None
+    
+    def scan_node(self, node: TreeNode, current_depth: int) -> bool:
+        """Escanea un nodo de directorio y todo su subárbol en el hilo actual.
+        
+        Usa una pila explícita en lugar de recursión, así que la profundidad
+        del árbol no está limitada por el límite de recursión de Python. Cada
+        marco guarda además la ubicación del directorio (ver enter_location):
+        en árboles muy profundos los hijos se abren relativos a un ancestro
+        ya abierto, no desde la raíz.
+        """
+        if not self.populate_directory(node, current_depth):
+            return False
         
-        # Información adicional
-        size_info = ""
-        if self.config['show_sizes'] and structure['type'] == 'file':
-            size_info = f" ({self.format_size(structure['size'])})"
+        location, anchor = self.enter_location((None, node.path))
+        stack = [(node, current_depth, iter(node.children), location, anchor)]
+        try:
+            while stack:
+                current, depth, children, location, _ = stack[-1]
+                for child in children:
+                    if not child.is_dir:
+                        continue
+                    child_loc = child_location(location, child.name)
+                    dir_fd = self.open_location(child_loc)
+                    if self.populate_directory(child, depth + 1, dir_fd):
+                        child_loc, anchor = self.enter_location(child_loc, dir_fd)
+                        stack.append((child, depth + 1, iter(child.children), child_loc, anchor))
+                        break
+                    if dir_fd is not None:
+                        os.close(dir_fd)
+                else:
+                    # Todos los hijos escaneados: se cierra el directorio
+                    self.finalize_directory(current)
+                    _, _, _, _, anchor = stack.pop()
+                    if anchor is not None:
+                        os.close(anchor)
+        finally:
+            close_locations(stack, 4)
+        return True
+    
+    def scan_parallel(self, root: TreeNode, current_depth: int) -> bool:
+        """Escanea los subdirectorios hermanos en paralelo con un pool de hilos.
+        
+        Cada tarea lista un único directorio; el orden de los hijos lo fija el
+        listado ordenado, así que el resultado no depende del orden de llegada.
+        """
+        populated = []
+        with ThreadPoolExecutor(max_workers=self.config['jobs']) as pool:
+            pending = {pool.submit(self.populate_directory, root, current_depth): (root, current_depth)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    node, depth = pending.pop(future)
+                    if not future.result():
+                        continue
+                    populated.append(node)
+                    for child in node.children:
+                        if child.is_dir:
+                            pending[pool.submit(self.populate_directory, child, depth + 1)] = (child, depth + 1)
         
-        line = f"{prefix}{connector}{icon} {name}{size_info}\n"
+        if root.children is None:
+            return False
         
-        # Procesar hijos
-        result = line
-        if structure.get('children'):
-            new_prefix = prefix + ('    ' if is_last else '│   ')
-            children = structure['children']
+        # Los hijos siempre terminan después que su padre: en orden inverso se
+        # cierran los subdirectorios antes que sus ancestros
+        for node in reversed(populated):
+            self.finalize_directory(node)
+        return True
+    
+    def resolve_subdirectories(self, node: TreeNode, current_depth: int,
+                               location: Optional[Tuple[Optional[int], str]] = None):
+        """Lista los subdirectorios de un nodo ya poblado y descarta los inaccesibles.
+        
+        Es la anticipación de un nivel que necesita el renderizado en streaming:
+        saber si un hermano posterior sobrevive decide el conector del anterior.
+        Con location (la del nodo, ver enter_location) los hijos se abren
+        relativos a su ancla.
+        """
+        for child in node.children:
+            if child.is_dir:
+                dir_fd = self.open_location(child_location(location, child.name)) if location else None
+                try:
+                    self.populate_directory(child, current_depth + 1, dir_fd)
+                finally:
+                    if dir_fd is not None:
+                        os.close(dir_fd)
+        node.children = [
+            child for child in node.children
+            if not child.is_dir or child.children is not None
+        ]
+    
+    def walk(self, root: TreeNode, scan_depth: Optional[int] = None) -> Iterator[Tuple[TreeNode, int, bool]]:
+        """Recorre el árbol en preorden produciendo (nodo, profundidad, es_último).
+        
+        Con scan_depth el árbol se escanea a medida que se recorre (el nodo raíz
+        debe venir ya poblado) y los subárboles terminados se liberan, de modo que
+        la memoria solo depende de la rama actual.
+        """
+        lazy = scan_depth is not None
+        # [nodo, profundidad, siguiente hijo, ubicación, descriptor ancla propio]
+        stack = []
+        try:
+            location = anchor = None
+            if lazy:
+                location, anchor = self.enter_location((None, root.path))
+                self.resolve_subdirectories(root, scan_depth, location)
+            if root.children:
+                stack.append([root, 0, 0, location, anchor])
+            elif anchor is not None:
+                os.close(anchor)
+            yield root, 0, True
+            
+            while stack:
+                frame = stack[-1]
+                node, depth, index, location, _ = frame
+                children = node.children
+                if index >= len(children):
+                    if lazy:
+                        node.children = []
+                    stack.pop()
+                    if frame[4] is not None:
+                        os.close(frame[4])
+                    continue
+                frame[2] += 1
+                child = children[index]
+                is_dir = child.is_dir
+                child_loc = anchor = None
+                if lazy and is_dir:
+                    child_loc, anchor = self.enter_location(child_location(location, child.name))
+                    self.resolve_subdirectories(child, scan_depth + depth + 1, child_loc)
+                if is_dir and child.children:
+                    stack.append([child, depth + 1, 0, child_loc, anchor])
+                elif anchor is not None:
+                    os.close(anchor)
+                yield child, depth + 1, index == len(children) - 1
+        finally:
+            # Se ejecuta también si el consumidor abandona el recorrido a medias
+            close_locations(stack, 4)
+            if lazy:
+                self.flush_cache()
+    
+    def iter_ascii_tree(self, nodes: Iterable[Tuple[TreeNode, int, bool]], prefix: str = '') -> Iterator[str]:
+        """Genera el árbol ASCII línea a línea a partir de un recorrido en preorden"""
+        # child_prefixes[d] es el prefijo de los hijos del último nodo visto en profundidad d
+        child_prefixes = []
+        duplicates = self.duplicates
+        for node, depth, is_last in nodes:
+            del child_prefixes[depth:]
+            node_prefix = child_prefixes[-1] if depth else prefix
+            child_prefixes.append(node_prefix + ('    ' if is_last else '│   '))
+            
+            # Construir línea actual
+            connector = '└── ' if is_last else '├── '
+            
+            # Información adicional
+            size_info = ""
+            if self.config['show_sizes'] and not node.is_dir:
+                size_info = f" ({self.format_size(node.size)})"
+            if duplicates and node in duplicates:
+                size_info += f" [duplicado #{duplicates[node]}]"
             
-            for i, child in enumerate(children):
-                child_is_last = i == len(children) - 1
-                result += self.generate_ascii_tree(child, new_prefix, child_is_last)
+            yield f"{node_prefix}{connector}{node.icon} {node.name}{size_info}\n"
+    
+    def generate_ascii_tree(self, structure: TreeNode, prefix: str = '', is_last: bool = True) -> str:
+        """Genera el árbol en formato ASCII"""
+        if not structure:
+            return ""
         
-        return result
+        nodes = ((node, depth, is_last if depth == 0 else last)
+                 for node, depth, last in self.walk(structure))
+        return ''.join(self.iter_ascii_tree(nodes, prefix))
     
-    def generate_markdown(self, structure: Dict, project_name: str = "") -> str:
-        """Genera el árbol en formato Markdown"""
+    def iter_markdown(self, structure: TreeNode, nodes: Iterable[Tuple[TreeNode, int, bool]],
+                      project_name: str = "") -> Iterator[str]:
+        """Genera el Markdown por trozos; las estadísticas se calculan al final del recorrido"""
         if not project_name:
-            project_name = structure['name'] if structure else "Proyecto"
-        
-        processing_time = time.time() - self.stats['start_time']
+            project_name = structure.name if structure else "Proyecto"
         
-        markdown = f"""# 📁 {project_name}
+        yield f"""# 📁 {project_name}
 
-**Ruta:** `{structure['path'] if structure else 'N/A'}`
+**Ruta:** `{structure.path if structure else 'N/A'}`
 **Generado:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
 ## 🌳 Estructura del Proyecto
 
 ```
-{self.generate_ascii_tree(structure)}```
+"""
+        yield from self.iter_ascii_tree(nodes)
+        
+        processing_time = time.time() - self.stats['start_time']
+        
+        yield f"""```
 
 ## 📊 Estadísticas del Proyecto
 
 - **Total de archivos:** {self.stats['total_files']}
 - **Total de directorios:** {self.stats['total_directories']}
 - **Tamaño total:** {self.format_size(self.stats['total_size'])}
-- **Elementos procesados:** {len(self.stats['processed_items'])}
-- **Elementos ignorados:** {len(self.stats['ignored_items'])}
+- **Elementos procesados:** {self.stats['processed_items']}
+- **Elementos ignorados:** {self.ignored_summary()}
 - **Tiempo de procesamiento:** {processing_time:.2f}s
 - **Profundidad máxima alcanzada:** {'Sí' if self.stats['max_depth_reached'] else 'No'}
 
+"""
+        
+        if self.config.get('find_duplicates'):
+            duplicates = self.stats['duplicates']
+            yield f"""## 🧬 Archivos Duplicados
+
+- **Grupos:** {duplicates['groups']}
+- **Copias de más:** {duplicates['files']}
+- **Espacio desperdiciado:** {self.format_size(duplicates['wasted_bytes'])}
+
 """
         
         if self.config['debug'] and self.stats['ignored_items']:
-            markdown += """## 🚫 Elementos Ignorados
+            yield """## 🚫 Elementos Ignorados
 
 """
-            for item in self.stats['ignored_items']:
-                markdown += f"- {item}\n"
-            markdown += "\n"
+            for item in self.stats['ignored_sample']:
+                yield f"- {item}\n"
+            remaining = self.stats['ignored_items'] - len(self.stats['ignored_sample'])
+            if remaining:
+                yield f"- ... y {remaining} más\n"
+            yield "\n"
         
         if self.config['show_config']:
-            markdown += f"""## ⚙️ Configuración Utilizada
+            yield f"""## ⚙️ Configuración Utilizada
 
 - **Profundidad máxima:** {self.config['max_depth'] if self.config['max_depth'] > 0 else 'Sin límite'}
 - **Mostrar archivos ocultos:** {'Sí' if self.config['show_hidden'] else 'No'}
@@ -309,56 +1930,177 @@ class ProjectTreeGenerator:
 
 """
         
-        markdown += f"""---
+        yield f"""---
 *Generado automáticamente con ProjectTreeGenerator v2.0*
 """
-        
-        return markdown
     
-    def generate_mermaid(self, structure: Dict) -> str:
-        """Genera el árbol en formato Mermaid"""
-        if not structure:
-            return ""
-        
-        mermaid = "graph TD\n"
-        node_id = 0
-        
-        def add_node(node: Dict, parent_id: Optional[int] = None) -> int:
-            nonlocal node_id
-            current_id = node_id
-            node_id += 1
+    def generate_markdown(self, structure: TreeNode, project_name: str = "") -> str:
+        """Genera el árbol en formato Markdown"""
+        nodes = self.walk(structure) if structure else ()
+        return ''.join(self.iter_markdown(structure, nodes, project_name))
+    
+    def iter_mermaid(self, nodes: Iterable[Tuple[TreeNode, int, bool]]) -> Iterator[str]:
+        """Genera el diagrama Mermaid línea a línea a partir de un recorrido en preorden"""
+        yield "graph TD\n"
+        # ids[d] es el id del último nodo visto en profundidad d
+        ids = []
+        duplicates = self.duplicates
+        for node_id, (node, depth, _) in enumerate(nodes):
+            del ids[depth:]
             
             # Preparar etiqueta del nodo
-            icon = node['icon']
-            name = node['name'].replace('"', '\\"')  # Escapar comillas
+            icon = node.icon
+            name = node.name.replace('"', '\\"')  # Escapar comillas
             size_info = ""
             
-            if self.config['show_sizes'] and node['type'] == 'file':
-                size_info = f"<br/>{self.format_size(node['size'])}"
+            if self.config['show_sizes'] and not node.is_dir:
+                size_info = f"<br/>{self.format_size(node.size)}"
+            if duplicates and node in duplicates:
+                size_info += f"<br/>duplicado #{duplicates[node]}"
             
             label = f'{icon} {name}{size_info}'
             
             # Agregar nodo
-            mermaid_line = f'    {current_id}["{label}"]\n'
-            mermaid += mermaid_line
+            yield f'    {node_id}["{label}"]\n'
             
             # Conectar con padre
-            if parent_id is not None:
-                mermaid += f'    {parent_id} --> {current_id}\n'
+            if ids:
+                yield f'    {ids[-1]} --> {node_id}\n'
+            ids.append(node_id)
+    
+    def generate_mermaid(self, structure: TreeNode) -> str:
+        """Genera el árbol en formato Mermaid"""
+        if not structure:
+            return ""
+        
+        return ''.join(self.iter_mermaid(self.walk(structure)))
+    
+    def iter_json(self, nodes: Iterable[Tuple[TreeNode, int, bool]]) -> Iterator[str]:
+        """Genera el JSON indentado por trozos, sin recursión.
+        
+        La salida es idéntica a json.dumps(structure.to_dict(), indent=2,
+        ensure_ascii=False), cuyo codificador recursivo no soporta árboles de
+        miles de niveles. Necesita el árbol completo: el tamaño de cada
+        directorio se escribe antes que sus hijos.
+        """
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+        # Directorios con hijos abiertos: [indentación, ya tiene algún hijo escrito]
+        open_dirs = []
+        paths = []
+        duplicates = self.duplicates
+        for node, depth, _ in nodes:
+            while len(open_dirs) > depth:
+                indent = open_dirs.pop()[0]
+                yield f"\n{indent}  ]\n{indent}}}"
+            del paths[depth:]
+            paths.append(os.path.join(paths[-1], node.name) if depth else node.path)
             
-            # Procesar hijos
-            if node.get('children'):
-                for child in node['children']:
-                    add_node(child, current_id)
+            separator = ''
+            if open_dirs:
+                separator = ',\n' if open_dirs[-1][1] else '\n'
+                open_dirs[-1][1] = True
+            indent = ' ' * (4 * depth)
+            text = (f'{separator}{indent}{{\n'
+                    f'{indent}  "name": {encode(node.name)},\n'
+                    f'{indent}  "path": {encode(paths[-1])},\n'
+                    f'{indent}  "type": "{node.type}",\n'
+                    f'{indent}  "size": {node.size},\n'
+                    f'{indent}  "icon": {encode(node.icon)}')
+            if duplicates and node in duplicates:
+                text += f',\n{indent}  "duplicate_group": {duplicates[node]}'
+            if node.is_dir and node.children:
+                open_dirs.append([indent, False])
+                yield f'{text},\n{indent}  "children": ['
+            elif node.is_dir:
+                yield f'{text},\n{indent}  "children": []\n{indent}}}'
+            else:
+                yield f'{text}\n{indent}}}'
+        
+        while open_dirs:
+            indent = open_dirs.pop()[0]
+            yield f"\n{indent}  ]\n{indent}}}"
+    
+    def iter_compact_json(self, nodes: Iterable[Tuple[TreeNode, int, bool]]) -> Iterator[str]:
+        """Genera el JSON sin indentación por trozos.
+        
+        Es la misma estructura que iter_json, idéntica a json.dumps con
+        separators=(',', ':'); como aquel, necesita el árbol completo.
+        """
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+        # Directorios con hijos abiertos: ya tienen algún hijo escrito
+        open_dirs = []
+        paths = []
+        duplicates = self.duplicates
+        for node, depth, _ in nodes:
+            while len(open_dirs) > depth:
+                open_dirs.pop()
+                yield ']}'
+            del paths[depth:]
+            paths.append(os.path.join(paths[-1], node.name) if depth else node.path)
             
-            return current_id
+            separator = ''
+            if open_dirs:
+                separator = ',' if open_dirs[-1] else ''
+                open_dirs[-1] = True
+            text = (f'{separator}{{"name":{encode(node.name)},"path":{encode(paths[-1])},'
+                    f'"type":"{node.type}","size":{node.size},"icon":{encode(node.icon)}')
+            if duplicates and node in duplicates:
+                text += f',"duplicate_group":{duplicates[node]}'
+            if node.is_dir and node.children:
+                open_dirs.append(False)
+                yield f'{text},"children":['
+            elif node.is_dir:
+                yield f'{text},"children":[]}}'
+            else:
+                yield f'{text}}}'
         
-        add_node(structure)
-        return mermaid
+        yield ']}' * len(open_dirs)
     
-    def generate_json(self, structure: Dict) -> str:
+    def generate_json(self, structure: TreeNode) -> str:
         """Genera el árbol en formato JSON"""
-        return json.dumps(structure, indent=2, ensure_ascii=False)
+        if self.config.get('compact'):
+            return ''.join(self.iter_compact_json(self.walk(structure)))
+        return ''.join(self.iter_json(self.walk(structure)))
+    
+    def iter_ndjson(self, nodes: Iterable[Tuple[TreeNode, int, bool]]) -> Iterator[str]:
+        """Genera un registro JSON por nodo y por línea a medida que avanza el recorrido.
+        
+        Cada nodo se escribe al visitarse, en preorden (el padre siempre antes
+        que sus hijos), con id (orden en preorden), parent (id del padre, null
+        en la raíz), name, type, size e icon; la raíz añade su path. El tamaño
+        de un directorio solo se conoce al cerrarlo: su registro lleva size null
+        y al terminar su subárbol se escribe {"id": ..., "type": "size", "size": ...}.
+        Un lector puede así construir el árbol sobre la marcha, sin esperar al
+        final. load_ndjson reconstruye la estructura anidada de generate_json.
+        """
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        # Directorios abiertos: [id, tamaño acumulado]
+        open_dirs = []
+        
+        def close_directory():
+            node_id, size = open_dirs.pop()
+            if open_dirs:
+                open_dirs[-1][1] += size
+            return encode({'id': node_id, 'type': 'size', 'size': size}) + '\n'
+        
+        for node_id, (node, depth, _) in enumerate(nodes):
+            while len(open_dirs) > depth:
+                yield close_directory()
+            parent_id = open_dirs[-1][0] if open_dirs else None
+            record = {'id': node_id, 'parent': parent_id, 'name': node.name, 'type': node.type,
+                      'size': None if node.is_dir else node.size, 'icon': node.icon}
+            if parent_id is None:
+                record['path'] = node.path
+            if node.is_dir:
+                open_dirs.append([node_id, 0])
+            else:
+                open_dirs[-1][1] += node.size
+                if node in self.duplicates:
+                    record['duplicate_group'] = self.duplicates[node]
+            yield encode(record) + '\n'
+        
+        while open_dirs:
+            yield close_directory()
     
     def print_debug_info(self):
         """Imprime información de debug"""
@@ -367,63 +2109,515 @@ class ProjectTreeGenerator:
         
         processing_time = time.time() - self.stats['start_time']
         
-        print(f"\n{Colors.HEADER}{'='*50}")
-        print(f"  INFORMACIÓN DE DEBUG")
-        print(f"{'='*50}{Colors.ENDC}")
+        self.log(f"\n{Colors.HEADER}{'='*50}")
+        self.log(f"  INFORMACIÓN DE DEBUG")
+        self.log(f"{'='*50}{Colors.ENDC}")
+        
+        self.log(f"{Colors.OKBLUE}📊 Estadísticas:{Colors.ENDC}")
+        self.log(f"  • Archivos procesados: {self.stats['total_files']}")
+        self.log(f"  • Directorios procesados: {self.stats['total_directories']}")
+        self.log(f"  • Tamaño total: {self.format_size(self.stats['total_size'])}")
+        if self.stats['hardlinks']:
+            self.log(f"  • Enlaces duros repetidos (sumados una vez): {self.stats['hardlinks']}")
+        if self.config.get('find_duplicates'):
+            duplicates = self.stats['duplicates']
+            self.log(f"  • Duplicados: {duplicates['files']} copias de más en {duplicates['groups']} grupos, "
+                     f"{self.format_size(duplicates['wasted_bytes'])} desperdiciados "
+                     f"({self.format_size(duplicates['bytes_read'])} leídos para compararlos)")
+        self.log(f"  • Elementos ignorados: {self.ignored_summary()}")
+        self.log(f"  • Llamadas al sistema: scandir={self.stats['syscalls']['scandir']}, "
+                 f"stat={self.stats['syscalls']['stat']}")
+        if self.scan_cache is not None:
+            self.log(f"  • Caché de escaneo: {self.stats['cache']['hits']} aciertos, "
+                     f"{self.stats['cache']['misses']} fallos")
+        self.log(f"  • Tiempo de procesamiento: {processing_time:.2f}s")
+        self.log(f"  • Profundidad máxima alcanzada: {'Sí' if self.stats['max_depth_reached'] else 'No'}")
         
-        print(f"{Colors.OKBLUE}📊 Estadísticas:{Colors.ENDC}")
-        print(f"  • Archivos procesados: {self.stats['total_files']}")
-        print(f"  • Directorios procesados: {self.stats['total_directories']}")
-        print(f"  • Tamaño total: {self.format_size(self.stats['total_size'])}")
-        print(f"  • Elementos ignorados: {len(self.stats['ignored_items'])}")
-        print(f"  • Tiempo de procesamiento: {processing_time:.2f}s")
-        print(f"  • Profundidad máxima alcanzada: {'Sí' if self.stats['max_depth_reached'] else 'No'}")
+        report = self.profile_report()
+        self.log(f"\n{Colors.OKBLUE}⏱️ Tiempo por fase:{Colors.ENDC}")
+        for phase, label in PHASES.items():
+            self.log(f"  • {label}: {report['phases'][phase] * 1000:.1f} ms")
+        if self.config.get('jobs', 1) > 1:
+            self.log(f"  • (tiempos sumados entre los {self.config['jobs']} hilos)")
+        if report['entries_per_second']:
+            self.log(f"  • Entradas por segundo: {report['entries_per_second']:,}")
+        rate = f" ({self.format_size(report['bytes_per_second'])}/s)" if report['bytes_per_second'] else ""
+        self.log(f"  • Salida renderizada: {self.format_size(report['rendered_bytes'])}{rate}")
+        if report['slowest_directories']:
+            self.log(f"  • Directorios más lentos:")
+            for item in report['slowest_directories'][:5]:
+                self.log(f"      {item['seconds'] * 1000:8.1f} ms  {item['path']}")
         
         if self.stats['ignored_items']:
-            print(f"\n{Colors.WARNING}🚫 Elementos ignorados:{Colors.ENDC}")
-            for item in self.stats['ignored_items'][:10]:  # Mostrar solo los primeros 10
-                print(f"  • {item}")
-            if len(self.stats['ignored_items']) > 10:
-                print(f"  ... y {len(self.stats['ignored_items']) - 10} más")
+            self.log(f"\n{Colors.WARNING}🚫 Elementos ignorados:{Colors.ENDC}")
+            # Mostrar solo los primeros 10 (todos con --debug-full)
+            shown = self.stats['ignored_sample'] if self.config.get('debug_full') else self.stats['ignored_sample'][:10]
+            for item in shown:
+                self.log(f"  • {item}")
+            if self.stats['ignored_items'] > len(shown):
+                self.log(f"  ... y {self.stats['ignored_items'] - len(shown)} más")
         
-        print(f"\n{Colors.OKCYAN}⚙️ Configuración:{Colors.ENDC}")
-        print(f"  • Formato: {self.config['format']}")
-        print(f"  • Profundidad máxima: {self.config['max_depth'] if self.config['max_depth'] > 0 else 'Sin límite'}")
-        print(f"  • Mostrar archivos ocultos: {'Sí' if self.config['show_hidden'] else 'No'}")
-        print(f"  • Mostrar tamaños: {'Sí' if self.config['show_sizes'] else 'No'}")
+        self.log(f"\n{Colors.OKCYAN}⚙️ Configuración:{Colors.ENDC}")
+        self.log(f"  • Formato: {self.config['format']}")
+        self.log(f"  • Hilos de escaneo: {self.config.get('jobs', 1)}")
+        self.log(f"  • Profundidad máxima: {self.config['max_depth'] if self.config['max_depth'] > 0 else 'Sin límite'}")
+        self.log(f"  • Mostrar archivos ocultos: {'Sí' if self.config['show_hidden'] else 'No'}")
+        self.log(f"  • Seguir enlaces simbólicos: {'Sí' if self.follow_symlinks else 'No'}")
+        self.log(f"  • Un solo sistema de archivos: {'Sí' if self.one_file_system else 'No'}")
+        self.log(f"  • Mostrar tamaños: {'Sí' if self.config['show_sizes'] else 'No'}")
         
-        print(f"{Colors.HEADER}{'='*50}{Colors.ENDC}")
+        self.log(f"{Colors.HEADER}{'='*50}{Colors.ENDC}")
     
-    def generate(self, root_path: str) -> str:
-        """Genera el árbol del proyecto"""
+    def iter_generate(self, root_path: str) -> Iterator[str]:
+        """Genera el árbol del proyecto por trozos, a medida que se escanea.
+        
+        Con un solo hilo ASCII, Markdown, Mermaid y NDJSON se renderizan durante
+        el escaneo; JSON y el escaneo en paralelo necesitan el árbol completo.
+        """
+        self.check_root(root_path)
+        
+        output_format = self.config['format']
+        top = self.config.get('top')
+        if output_format not in (SUMMARY_FORMATS if top else FORMATS):
+            raise ValueError(f"Formato no soportado{' con --top' if top else ''}: {output_format}")
+        
+        if self.config['debug']:
+            self.log(f"{Colors.OKGREEN}🌳 Generando árbol del proyecto...{Colors.ENDC}")
+            self.log(f"📁 Ruta: {root_path}")
+            if os.path.isfile(root_path):
+                self.log(f"📦 Archivo {ArchiveIndex.detect(root_path)}: se lee solo su índice")
+            self.log(f"📝 Formato: {output_format}")
+        
+        find_duplicates = self.config.get('find_duplicates')
+        if find_duplicates and not os.path.isdir(root_path):
+            raise ValueError("--find-duplicates necesita leer el contenido: no está disponible dentro de un tar/zip/ipk")
+        
+        if top:
+            chunks = self.iter_top(self.scan_top(root_path))
+        else:
+            # Los duplicados se marcan en cualquier rama: hace falta el árbol completo
+            structure, nodes = self.scan_tree(root_path, lazy=output_format != 'json' and not find_duplicates)
+            if find_duplicates:
+                self.find_duplicates(structure)
+            chunks = self.iter_format(structure, nodes)
+        yield from self.iter_timed(chunks) if self.profiling else chunks
+    
+    def check_root(self, root_path: str):
+        """Comprueba que la raíz existe y es un directorio o un archivo tar, zip o ipk"""
         if not os.path.exists(root_path):
             raise FileNotFoundError(f"La ruta {root_path} no existe")
         
-        if not os.path.isdir(root_path):
-            raise NotADirectoryError(f"La ruta {root_path} no es un directorio")
+        if not os.path.isdir(root_path) and ArchiveIndex.detect(root_path) is None:
+            raise NotADirectoryError(f"La ruta {root_path} no es un directorio ni un archivo tar, zip o ipk")
+    
+    def scan_tree(self, root_path: str, lazy: bool = True) -> Tuple[TreeRoot, Iterator[Tuple[TreeNode, int, bool]]]:
+        """Escanea la raíz y devuelve el nodo raíz y su recorrido en preorden.
         
-        if self.config['debug']:
-            print(f"{Colors.OKGREEN}🌳 Generando árbol del proyecto...{Colors.ENDC}")
-            print(f"📁 Ruta: {root_path}")
-            print(f"📝 Formato: {self.config['format']}")
+        Con un solo hilo y lazy el recorrido escanea a medida que avanza; si no,
+        el árbol se escanea completo antes de recorrerlo.
+        """
+        if not lazy or self.config.get('jobs', 1) > 1:
+            structure = self.scan_directory(root_path)
+            if not structure:
+                raise RuntimeError("No se pudo generar la estructura del proyecto")
+            return structure, self.walk(structure)
         
-        # Escanear estructura
-        structure = self.scan_directory(root_path)
+        self.start_scan(root_path)
+        structure = self.make_root_node(root_path)
+        if not self.populate_directory(structure, 0):
+            raise RuntimeError("No se pudo generar la estructura del proyecto")
+        return structure, self.walk(structure, scan_depth=0)
+    
+    def find_duplicates(self, root: TreeNode) -> List[List[TreeNode]]:
+        """Agrupa los archivos del árbol con contenido idéntico y los anota en self.duplicates.
         
-        if not structure:
+        Se filtra por etapas, cada una solo sobre lo que sigue coincidiendo:
+        tamaño (ya está en los nodos, sin leer nada), hash de los primeros
+        DUPLICATE_PREFIX_SIZE bytes y hash completo, este último solo para los
+        archivos más grandes que el prefijo. Las lecturas se reparten en un pool
+        de hilos. Los enlaces duros (y los simbólicos) a un mismo archivo son
+        un solo archivo: no ocupan de más. Los grupos se numeran por espacio
+        desperdiciado, de mayor a menor.
+        """
+        if self.profiling:
+            started = time.perf_counter()
+        by_size: Dict[int, List[TreeNode]] = {}
+        for node, _, _ in self.walk(root):
+            if not node.is_dir and node.size > 0:
+                by_size.setdefault(node.size, []).append(node)
+        candidates = [group for group in by_size.values() if len(group) > 1]
+        
+        def split(groups: List[List[TreeNode]], limit: Optional[int]) -> List[List[TreeNode]]:
+            """Parte cada grupo por el hash (del prefijo con limit) y descarta los que quedan solos"""
+            nodes = [node for group in groups for node in group]
+            paths = [node.path for node in nodes]
+            results = pool.map(functools.partial(hash_file, limit=limit), paths)
+            buckets: Dict[Tuple[int, bytes], Dict[Tuple[int, int], TreeNode]] = {}
+            for node, result in zip(nodes, results):
+                if result is None:
+                    continue
+                self.stats['duplicates']['bytes_read'] += node.size if limit is None else min(node.size, limit)
+                identity, digest = result
+                # Varios caminos al mismo inodo cuentan como un solo archivo
+                buckets.setdefault((node.size, digest), {}).setdefault(identity, node)
+            return [list(bucket.values()) for bucket in buckets.values() if len(bucket) > 1]
+        
+        workers = max(self.config.get('jobs', 1), DUPLICATE_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='duplicados') as pool:
+            groups = split(candidates, DUPLICATE_PREFIX_SIZE)
+            # Si el archivo cabe en el prefijo, su hash ya es el del contenido completo
+            confirmed = [group for group in groups if group[0].size <= DUPLICATE_PREFIX_SIZE]
+            confirmed += split([group for group in groups if group[0].size > DUPLICATE_PREFIX_SIZE], None)
+        
+        confirmed.sort(key=lambda group: -group[0].size * (len(group) - 1))
+        stats = self.stats['duplicates']
+        for number, group in enumerate(confirmed, 1):
+            stats['groups'] += 1
+            stats['files'] += len(group) - 1
+            stats['wasted_bytes'] += group[0].size * (len(group) - 1)
+            for node in group:
+                self.duplicates[node] = number
+        if self.profiling:
+            self.stats['phases']['duplicates'] += time.perf_counter() - started
+        return confirmed
+    
+    def scan_top(self, root_path: str) -> Dict:
+        """Escanea sumando los tamaños de abajo arriba sin construir el árbol.
+        
+        Cada directorio se lista, sus archivos pasan por los montículos de los
+        config['top'] mayores y por los totales de su categoría, y se descartan
+        en el acto; de los directorios abiertos solo quedan en la pila su tamaño
+        acumulado y los subdirectorios pendientes. La memoria es O(N +
+        profundidad) por muchos archivos y directorios que haya: los bucles se
+        detectan con las identidades de la pila (open_identities) y de los
+        mtimes solo se guarda el de la raíz. Devuelve el resumen para iter_top.
+        """
+        limit = self.config['top']
+        self.visited_dirs = None
+        self.start_scan(root_path)
+        root = self.make_root_node(root_path)
+        if not self.populate_directory(root, 0):
             raise RuntimeError("No se pudo generar la estructura del proyecto")
         
-        # Generar salida según el formato
-        if self.config['format'] == 'ascii':
-            result = self.generate_ascii_tree(structure)
-        elif self.config['format'] == 'markdown':
-            result = self.generate_markdown(structure, self.config.get('project_name', ''))
-        elif self.config['format'] == 'mermaid':
-            result = self.generate_mermaid(structure)
-        elif self.config['format'] == 'json':
-            result = self.generate_json(structure)
+        # Montículos de mínimos (tamaño, ruta relativa): la cima es la que sale primero
+        largest_files = []
+        largest_dirs = []
+        categories = {icon: [0, 0] for icon in self.icons.values()}
+        
+        def keep(heap: List[Tuple[int, str]], size: int, node: TreeNode):
+            # La ruta solo se reconstruye si el elemento entra en el montículo
+            if len(heap) < limit:
+                heapq.heappush(heap, (size, self.relative_path(node.path)))
+            elif size > heap[0][0]:
+                heapq.heapreplace(heap, (size, self.relative_path(node.path)))
+        
+        def open_directory(node: TreeNode, depth: int, location: Tuple[Optional[int], str],
+                           dir_fd: Optional[int] = None) -> List:
+            subdirectories = []
+            size = 0
+            for child in node.children:
+                if child.is_dir:
+                    subdirectories.append(child)
+                    continue
+                size += child.size
+                keep(largest_files, child.size, child)
+                totals = categories[child.icon]
+                totals[0] += 1
+                totals[1] += child.size
+            node.children = []
+            if node.identity is not None:
+                self.open_identities.add(node.identity)
+            location, anchor = self.enter_location(location, dir_fd)
+            # [nodo, profundidad, subdirectorios pendientes, tamaño acumulado,
+            #  ubicación, descriptor ancla propio]
+            return [node, depth, iter(subdirectories), size, location, anchor]
+        
+        stack = []
+        total_size = 0
+        try:
+            stack.append(open_directory(root, 0, (None, root.path)))
+            while stack:
+                frame = stack[-1]
+                child = next(frame[2], None)
+                if child is None:
+                    stack.pop()
+                    node, _, _, size, _, anchor = frame
+                    self.open_identities.discard(node.identity)
+                    if anchor is not None:
+                        os.close(anchor)
+                    if stack:
+                        stack[-1][3] += size
+                        keep(largest_dirs, size, node)
+                    else:
+                        total_size = size
+                    continue
+                child_loc = child_location(frame[4], child.name)
+                dir_fd = self.open_location(child_loc)
+                if self.populate_directory(child, frame[1] + 1, dir_fd):
+                    stack.append(open_directory(child, frame[1] + 1, child_loc, dir_fd))
+                elif dir_fd is not None:
+                    os.close(dir_fd)
+        finally:
+            close_locations(stack, 5)
+            self.open_identities.clear()
+            self.flush_cache()
+        
+        names = {icon: name for name, icon in self.icons.items()}
+        return {
+            'root': root_path,
+            'top': limit,
+            'size': total_size,
+            'files': self.stats['total_files'],
+            'directories': self.stats['total_directories'],
+            'largest_directories': [{'path': path, 'size': size} for size, path in sorted(largest_dirs, reverse=True)],
+            'largest_files': [{'path': path, 'size': size} for size, path in sorted(largest_files, reverse=True)],
+            'categories': [
+                {'category': names[icon], 'icon': icon, 'files': files, 'size': size}
+                for icon, (files, size) in sorted(categories.items(), key=lambda item: -item[1][1])
+                if files
+            ],
+        }
+    
+    def iter_top(self, summary: Dict) -> Iterator[str]:
+        """Renderiza el resumen de scan_top en ASCII, Markdown o JSON"""
+        output_format = self.config['format']
+        if output_format == 'json':
+            indent = None if self.config.get('compact') else 2
+            yield json.dumps(summary, indent=indent, ensure_ascii=False) + '\n'
+            return
+        
+        total = summary['size'] or 1
+        sections = (
+            (f"{self.icons['directory']} Directorios más grandes", summary['largest_directories'], True),
+            (f"{self.icons['file']} Archivos más grandes", summary['largest_files'], False),
+        )
+        heading = (f"Lo que más ocupa en {summary['root']}: {self.format_size(summary['size'])} en "
+                   f"{summary['files']} archivos y {summary['directories']} directorios")
+        markdown = output_format == 'markdown'
+        yield f"# 📊 {heading}\n" if markdown else f"📊 {heading}\n"
+        
+        for title, items, is_dir in sections:
+            if markdown:
+                yield f"\n## {title}\n\n| # | Tamaño | % | Ruta |\n|---|---|---|---|\n"
+            else:
+                yield f"\n{title}\n"
+            for rank, item in enumerate(items, 1):
+                name = item['path'] + ('/' if is_dir else '')
+                icon = self.icons['directory'] if is_dir else self.get_file_icon(item['path'].rpartition('/')[2])
+                share = f"{item['size'] * 100 / total:.1f}%"
+                if markdown:
+                    yield f"| {rank} | {self.format_size(item['size'])} | {share} | {icon} `{name}` |\n"
+                else:
+                    yield f"  {rank:>3}. {self.format_size(item['size']):>10} {share:>6}  {icon} {name}\n"
+        
+        title = "🗂️ Por tipo de archivo"
+        yield f"\n## {title}\n\n| Tipo | Archivos | Tamaño | % |\n|---|---|---|---|\n" if markdown else f"\n{title}\n"
+        for category in summary['categories']:
+            label = f"{category['icon']} {CATEGORY_LABELS[category['category']]}"
+            share = f"{category['size'] * 100 / total:.1f}%"
+            if markdown:
+                yield f"| {label} | {category['files']} | {self.format_size(category['size'])} | {share} |\n"
+            else:
+                yield (f"  {label:<18} {category['files']:>9} archivos "
+                       f"{self.format_size(category['size']):>10} {share:>6}\n")
+    
+    def write_snapshot(self, root_path: str) -> Dict:
+        """Escanea root_path y guarda su instantánea en config['snapshot'].
+        
+        Los archivos se escriben al visitarse y los directorios al cerrarse,
+        con su hash y su tamaño ya completos, así que
+        con un solo hilo la memoria solo depende de la rama actual. Con
+        config['digest'] se lee además el contenido de cada archivo.
+        Devuelve los metadatos guardados.
+        """
+        self.check_root(root_path)
+        use_digest = bool(self.config.get('digest'))
+        if use_digest and not os.path.isdir(root_path):
+            raise ValueError("--digest necesita leer el contenido: no está disponible dentro de un tar/zip/ipk")
+        
+        snapshot = TreeSnapshot(self.config['snapshot'], create=True)
+        try:
+            structure, nodes = self.scan_tree(root_path)
+            # Directorios abiertos: [nodo, id, id del padre, tamaño, archivos, hash de los hijos]
+            open_dirs = []
+            
+            def close_directory():
+                node, node_id, parent_id, size, files, hasher = open_dirs.pop()
+                tree_hash = hasher.digest()
+                if open_dirs:
+                    parent = open_dirs[-1]
+                    parent[3] += size
+                    parent[4] += files
+                    parent[5].update(TreeSnapshot.directory_record(node.name, tree_hash))
+                snapshot.add(node_id, parent_id, node.name, True, size, files, tree_hash=tree_hash)
+                return tree_hash
+            
+            for node_id, (node, depth, _) in enumerate(nodes):
+                while len(open_dirs) > depth:
+                    close_directory()
+                parent_id = open_dirs[-1][1] if open_dirs else None
+                if node.is_dir:
+                    open_dirs.append([node, node_id, parent_id, 0, 0,
+                                      hashlib.blake2b(digest_size=TreeSnapshot.HASH_SIZE)])
+                    continue
+                mtime_ns = self.mtimes.pop(node, 0)
+                digest = content_digest(node.path) if use_digest else None
+                parent = open_dirs[-1]
+                parent[3] += node.size
+                parent[4] += 1
+                parent[5].update(TreeSnapshot.file_record(node.name, node.size, mtime_ns, digest))
+                snapshot.add(node_id, parent_id, node.name, False, node.size, 1, mtime_ns, digest)
+            
+            root_hash = b''
+            while open_dirs:
+                root_hash = close_directory()
+            snapshot.finish({
+                'root': os.path.abspath(root_path),
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'digest': use_digest,
+                'files': self.stats['total_files'],
+                'directories': self.stats['total_directories'],
+                'size': self.stats['total_size'],
+                'hash': root_hash.hex(),
+            })
+            return snapshot.meta
+        finally:
+            snapshot.close()
+    
+    def iter_diff(self, old_path: str, new_path: str) -> Iterator[str]:
+        """Genera las diferencias entre dos instantáneas en ASCII, Markdown o JSON"""
+        output_format = self.config['format']
+        if output_format not in SUMMARY_FORMATS:
+            raise ValueError(f"--diff solo admite los formatos {', '.join(SUMMARY_FORMATS)}")
+        old = TreeSnapshot(old_path)
+        try:
+            new = TreeSnapshot(new_path)
+        except Exception:
+            old.close()
+            raise
+        try:
+            changes = diff_snapshots(old, new)
+            if output_format == 'json':
+                yield from self.iter_diff_json(old, new, changes)
+            elif output_format == 'markdown':
+                yield from self.iter_diff_markdown(old, new, changes)
+            else:
+                yield from self.iter_diff_ascii(old, new, changes)
+        finally:
+            old.close()
+            new.close()
+    
+    def describe_change(self, change: Dict) -> str:
+        """Icono, ruta y tamaño de un cambio ('~' entre el tamaño anterior y el nuevo)"""
+        is_dir = change['type'] == 'directory'
+        icon = self.icons['directory'] if is_dir else self.get_file_icon(change['path'].rpartition('/')[2])
+        size = self.format_size(change['size'])
+        if is_dir:
+            return f"{icon} {change['path']}/ ({change['files']} archivos, {size})"
+        if 'old_size' in change:
+            size = f"{self.format_size(change['old_size'])} → {size}"
+        return f"{icon} {change['path']} ({size})"
+    
+    @staticmethod
+    def diff_summary(counts: Dict[str, int]) -> str:
+        return ', '.join(f"{counts[change]} {label}s" for change, (_, label) in DIFF_CHANGES.items())
+    
+    def iter_diff_ascii(self, old: TreeSnapshot, new: TreeSnapshot, changes: Iterable[Dict]) -> Iterator[str]:
+        counts = dict.fromkeys(DIFF_CHANGES, 0)
+        yield f"--- {old.path} ({old.meta['created']})\n"
+        yield f"+++ {new.path} ({new.meta['created']})\n"
+        for change in changes:
+            counts[change['change']] += 1
+            yield f"{DIFF_CHANGES[change['change']][0]} {self.describe_change(change)}\n"
+        yield f"\n📊 {self.diff_summary(counts)}\n"
+    
+    def iter_diff_markdown(self, old: TreeSnapshot, new: TreeSnapshot, changes: Iterable[Dict]) -> Iterator[str]:
+        counts = dict.fromkeys(DIFF_CHANGES, 0)
+        yield "# 🔍 Diferencias entre instantáneas\n\n"
+        yield f"- **Antes:** `{old.path}` ({old.meta['created']}, {self.format_size(old.meta['size'])})\n"
+        yield f"- **Después:** `{new.path}` ({new.meta['created']}, {self.format_size(new.meta['size'])})\n\n"
+        yield "| Cambio | Entrada |\n|---|---|\n"
+        for change in changes:
+            counts[change['change']] += 1
+            mark, label = DIFF_CHANGES[change['change']]
+            entry = self.describe_change(change).replace('|', r'\|')
+            yield f"| {mark} {label} | {entry} |\n"
+        yield f"\n**Resumen:** {self.diff_summary(counts)}\n"
+    
+    def iter_diff_json(self, old: TreeSnapshot, new: TreeSnapshot, changes: Iterable[Dict]) -> Iterator[str]:
+        counts = dict.fromkeys(DIFF_CHANGES, 0)
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        yield f'{{\n  "old": {encode(dict(old.meta, path=old.path))},\n'
+        yield f'  "new": {encode(dict(new.meta, path=new.path))},\n  "changes": ['
+        separator = '\n    '
+        for change in changes:
+            counts[change['change']] += 1
+            yield separator + encode(change)
+            separator = ',\n    '
+        summary = dict(counts, size_delta=new.meta['size'] - old.meta['size'])
+        yield f'\n  ],\n  "summary": {encode(summary)}\n}}\n'
+    
+    def iter_timed(self, chunks: Iterator[str]) -> Iterator[str]:
+        """Mide el tiempo de renderizado y los bytes producidos.
+        
+        Solo cuenta el tiempo dentro del renderizador: se descuenta el escaneo
+        perezoso que ocurre entre trozos y no se incluye lo que tarde quien
+        consume la salida.
+        """
+        phases = self.stats['phases']
+        while True:
+            start = time.perf_counter()
+            scanned = phases['scan']
+            chunk = next(chunks, None)
+            phases['render'] += time.perf_counter() - start - (phases['scan'] - scanned)
+            if chunk is None:
+                return
+            self.stats['rendered_bytes'] += len(chunk.encode('utf-8'))
+            yield chunk
+    
+    def profile_report(self) -> Dict:
+        """Desglose por fases del último árbol generado (lo que vuelca --profile)"""
+        phases = self.stats['phases']
+        scan_time = phases['scan']
+        render_time = phases['render']
+        return {
+            'total_seconds': round(time.time() - self.stats['start_time'], 6),
+            'phases': {phase: round(seconds, 6) for phase, seconds in phases.items()},
+            'entries': self.stats['processed_items'],
+            'entries_per_second': round(self.stats['processed_items'] / scan_time) if scan_time else None,
+            'rendered_bytes': self.stats['rendered_bytes'],
+            'bytes_per_second': round(self.stats['rendered_bytes'] / render_time) if render_time else None,
+            'directories': self.stats['total_directories'],
+            'files': self.stats['total_files'],
+            'ignored': self.stats['ignored_items'],
+            'syscalls': dict(self.stats['syscalls']),
+            'cache': dict(self.stats['cache']) if self.scan_cache is not None else None,
+            'jobs': self.config.get('jobs', 1),
+            'slowest_directories': [
+                {'path': path, 'seconds': round(seconds, 6)}
+                for seconds, path in sorted(self.stats['slowest_dirs'], reverse=True)
+            ],
+        }
+    
+    def iter_format(self, structure: TreeNode, nodes: Iterable[Tuple[TreeNode, int, bool]]) -> Iterator[str]:
+        """Renderiza un recorrido en el formato configurado"""
+        output_format = self.config['format']
+        if output_format == 'ascii':
+            yield from self.iter_ascii_tree(nodes)
+        elif output_format == 'markdown':
+            yield from self.iter_markdown(structure, nodes, self.config.get('project_name', ''))
+        elif output_format == 'mermaid':
+            yield from self.iter_mermaid(nodes)
+        elif output_format == 'ndjson':
+            yield from self.iter_ndjson(nodes)
+        elif self.config.get('compact'):
+            yield from self.iter_compact_json(nodes)
         else:
-            raise ValueError(f"Formato no soportado: {self.config['format']}")
+            yield from self.iter_json(nodes)
+    
+    def generate(self, root_path: str) -> str:
+        """Genera el árbol del proyecto"""
+        result = ''.join(self.iter_generate(root_path))
         
         # Mostrar información de debug
         if self.config['debug']:
@@ -432,6 +2626,588 @@ class ProjectTreeGenerator:
         return result
 
 
+class PendingLog:
+    """Stream de log que retiene los mensajes hasta que se recogen con drain()"""
+    
+    def __init__(self):
+        self.parts = []
+    
+    def write(self, text: str):
+        self.parts.append(text)
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> str:
+        text = ''.join(self.parts)
+        self.parts.clear()
+        return text
+
+
+def load_ndjson(lines: Iterable[str]) -> Optional[Dict]:
+    """Reconstruye la estructura anidada de generate_json a partir de la salida NDJSON.
+    
+    Acepta cualquier iterable de líneas (por ejemplo un archivo abierto); las
+    líneas vacías se ignoran. Cada registro se cuelga de su padre en cuanto se
+    lee, y solo se recuerdan los directorios cuyo tamaño aún no ha llegado.
+    """
+    root = None
+    # Directorios abiertos por id: sus hijos y su registro de tamaño aún pueden llegar
+    open_dirs = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if record['type'] == 'size':
+            open_dirs.pop(record['id'])['size'] = record['size']
+            continue
+        parent = open_dirs.get(record['parent'])
+        path = record['path'] if parent is None else os.path.join(parent['path'], record['name'])
+        data = {'name': record['name'], 'path': path, 'type': record['type'],
+                'size': record['size'], 'icon': record['icon']}
+        if record['type'] == 'directory':
+            data['children'] = []
+            open_dirs[record['id']] = data
+        if parent is None:
+            root = data
+        else:
+            parent['children'].append(data)
+    return root
+
+
+def iter_output(generator: ProjectTreeGenerator, root_path: str) -> Iterator[str]:
+    """Produce por trozos lo que la CLI escribe en stdout, con el debug intercalado"""
+    log = PendingLog()
+    generator.log_stream = log
+    for chunk in generator.iter_generate(root_path):
+        yield log.drain() + chunk
+    yield log.drain() + "\n"
+    if generator.config['debug']:
+        generator.print_debug_info()
+        yield log.drain()
+
+
+
+# Extensión del archivo de salida de cada raíz en modo lote
+BATCH_EXTENSIONS = {'ascii': 'txt', 'markdown': 'md', 'mermaid': 'mmd', 'json': 'json', 'ndjson': 'ndjson'}
+
+# Resumen agregado que se escribe junto a los árboles de un lote
+BATCH_SUMMARY_FILE = 'resumen.json'
+
+
+def read_manifest(manifest_path: str) -> List[str]:
+    """Lee las raíces de un manifiesto: una ruta por línea, '#' para comentarios.
+    
+    Las rutas relativas se resuelven respecto al directorio del manifiesto.
+    """
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    roots = []
+    with open(manifest_path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                roots.append(os.path.join(base, os.path.expanduser(line)))
+    return roots
+
+
+def batch_output_paths(roots: List[str], output_dir: str, output_format: str) -> List[str]:
+    """Un archivo por raíz con el nombre de su directorio; los repetidos llevan sufijo"""
+    extension = BATCH_EXTENSIONS[output_format]
+    used: Set[str] = set()
+    paths = []
+    for root in roots:
+        stem = os.path.basename(os.path.normpath(os.path.abspath(root))) or 'raiz'
+        name = f"{stem}.{extension}"
+        suffix = 2
+        while name in used:
+            name = f"{stem}-{suffix}.{extension}"
+            suffix += 1
+        used.add(name)
+        paths.append(os.path.join(output_dir, name))
+    return paths
+
+
+def scan_batch_root(root: str, config: Dict, output_path: Optional[str] = None,
+                    timeout: Optional[float] = None) -> Dict:
+    """Genera el árbol de una raíz del lote; pensado para ejecutarse en un proceso del pool.
+    
+    Con output_path el árbol se escribe por trozos en ese archivo; sin él se
+    devuelve en 'output'. Los errores no se propagan: quedan en el resultado
+    para que una raíz rota no tumbe el resto del lote.
+    """
+    start = time.perf_counter()
+    generator = ProjectTreeGenerator({**config, 'log_stream': PendingLog()})
+    if timeout:
+        generator.deadline = time.monotonic() + timeout
+    result = {'root': root, 'output': output_path, 'status': 'ok', 'error': None}
+    try:
+        if output_path:
+            with open(output_path, 'w', encoding='utf-8') as f:
+                for chunk in generator.iter_generate(root):
+                    f.write(chunk)
+            # Bytes y no caracteres: los nombres y los iconos no son ASCII
+            result['bytes'] = os.path.getsize(output_path)
+        else:
+            result['output'] = generator.generate(root)
+            result['bytes'] = len(result['output'].encode('utf-8'))
+    except ScanTimeout as e:
+        result.update(status='timeout', error=str(e))
+    except Exception as e:
+        result.update(status='error', error=str(e))
+    finally:
+        generator.close()
+    if result['status'] != 'ok' and output_path:
+        # No dejar árboles a medias que parezcan completos
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        result['output'] = None
+    
+    stats = generator.stats
+    result.update(
+        files=stats['total_files'],
+        directories=stats['total_directories'],
+        size=stats['total_size'],
+        ignored=stats['ignored_items'],
+        entries=stats['processed_items'],
+        seconds=round(time.perf_counter() - start, 6),
+        pid=os.getpid(),
+    )
+    if generator.profiling:
+        result['profile'] = generator.profile_report()
+    return result
+
+
+def failed_batch_result(root: str, error: str) -> Dict:
+    """Resultado de una raíz que no llegó a escanearse (p. ej. murió su proceso del pool)"""
+    return {'root': root, 'output': None, 'status': 'error', 'error': error, 'files': 0,
+            'directories': 0, 'size': 0, 'ignored': 0, 'entries': 0, 'seconds': 0.0, 'pid': None}
+
+
+def summarize_batch(results: List[Dict], elapsed: float) -> Dict:
+    """Totales de un lote; el tiempo de reloj frente a la suma de tiempos mide el paralelismo"""
+    busy = sum(r['seconds'] for r in results)
+    entries = sum(r['entries'] for r in results)
+    return {
+        'roots': len(results),
+        'ok': sum(1 for r in results if r['status'] == 'ok'),
+        'failed': sum(1 for r in results if r['status'] != 'ok'),
+        'files': sum(r['files'] for r in results),
+        'directories': sum(r['directories'] for r in results),
+        'size': sum(r['size'] for r in results),
+        'ignored': sum(r['ignored'] for r in results),
+        'entries': entries,
+        'bytes': sum(r.get('bytes', 0) for r in results),
+        'wall_seconds': round(elapsed, 6),
+        'busy_seconds': round(busy, 6),
+        'speedup': round(busy / elapsed, 2) if elapsed else None,
+        'processes': len({r['pid'] for r in results if r['pid'] is not None}),
+        'entries_per_second': round(entries / elapsed) if elapsed else None,
+    }
+
+
+def run_batch(roots: List[str], config: Dict, output_dir: Optional[str] = None,
+              processes: int = 1, timeout: Optional[float] = None) -> Iterator[Dict]:
+    """Escanea varias raíces, repartidas en un pool de procesos si processes > 1.
+    
+    Produce los resultados en el orden en que terminan. Con output_dir cada
+    raíz se escribe en su propio archivo; sin él el árbol viaja en el resultado.
+    """
+    outputs = batch_output_paths(roots, output_dir, config['format']) if output_dir else [None] * len(roots)
+    if processes <= 1 or len(roots) == 1:
+        for root, output_path in zip(roots, outputs):
+            yield scan_batch_root(root, config, output_path, timeout)
+        return
+    
+    with ProcessPoolExecutor(max_workers=min(processes, len(roots))) as pool:
+        futures = [pool.submit(scan_batch_root, root, config, output_path, timeout)
+                   for root, output_path in zip(roots, outputs)]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def format_batch_line(result: Dict) -> str:
+    """Línea de resumen de una raíz del lote"""
+    if result['status'] != 'ok':
+        return f"{Colors.FAIL}❌ {result['root']}: {result['error']}{Colors.ENDC}"
+    return (f"{Colors.OKGREEN}✅ {result['root']}{Colors.ENDC} → {result['output']} "
+            f"({result['files']} archivos, {result['directories']} directorios, "
+            f"{ProjectTreeGenerator.format_size(result['size'])}, {result['seconds']:.2f}s)")
+
+
+def batch_tree(roots: List[str], config: Dict, output_dir: str, processes: int) -> bool:
+    """Modo lote de la CLI: un archivo por raíz y un resumen agregado en output_dir"""
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"{Colors.OKCYAN}📦 {len(roots)} raíces en {min(processes, len(roots))} procesos{Colors.ENDC}", flush=True)
+    start = time.perf_counter()
+    results = []
+    for result in run_batch(roots, config, output_dir, processes):
+        print(format_batch_line(result), flush=True)
+        results.append(result)
+    summary = summarize_batch(results, time.perf_counter() - start)
+    
+    # El resumen conserva el orden de las raíces, no el de terminación
+    order = {root: index for index, root in enumerate(roots)}
+    results.sort(key=lambda r: order[r['root']])
+    summary_path = os.path.join(output_dir, BATCH_SUMMARY_FILE)
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump({'summary': summary, 'results': results}, f, indent=2, ensure_ascii=False)
+    
+    print(f"\n{Colors.OKCYAN}📊 Lote:{Colors.ENDC}")
+    print(f"  • Raíces: {summary['ok']} correctas, {summary['failed']} con error")
+    print(f"  • Archivos: {summary['files']}")
+    print(f"  • Directorios: {summary['directories']}")
+    print(f"  • Tamaño total: {ProjectTreeGenerator.format_size(summary['size'])}")
+    print(f"  • Tiempo: {summary['wall_seconds']:.2f}s (x{summary['speedup']} sobre la suma por raíz)")
+    print(f"  • Resumen: {summary_path}")
+    return summary['failed'] == 0
+
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x01000000
+
+
+class InotifySource:
+    """Fuente de cambios basada en inotify (Linux), vía ctypes sobre la libc"""
+    
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+            | IN_CREATE | IN_DELETE | IN_ONLYDIR)
+    EVENT = struct.Struct('iIII')
+    
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify solo está disponible en Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.paths: Dict[int, str] = {}
+        self.watches: Dict[str, int] = {}
+    
+    def add(self, path: str):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_add_watch {path}: {os.strerror(errno)}")
+        self.paths[wd] = path
+        self.watches[path] = wd
+    
+    def remove(self, path: str):
+        wd = self.watches.pop(path, None)
+        if wd is not None:
+            self.paths.pop(wd, None)
+            self.libc.inotify_rm_watch(self.fd, wd)
+    
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        """Directorios con cambios; None si la cola se desbordó (hay que resincronizar)"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        # Agrupar la ráfaga de eventos de una misma escritura
+        time.sleep(WATCH_DEBOUNCE)
+        dirty = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+                offset += self.EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                path = self.paths.get(wd)
+                if path is None:
+                    continue
+                if mask & IN_IGNORED:
+                    self.paths.pop(wd, None)
+                    self.watches.pop(path, None)
+                    continue
+                dirty.add(path)
+        return dirty
+    
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    """Fuente de cambios por sondeo del mtime de los directorios.
+    
+    Detecta altas, bajas y renombrados; los cambios de tamaño de archivos que
+    no tocan su directorio solo los ve inotify.
+    """
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.mtimes: Dict[str, int] = {}
+    
+    def add(self, path: str):
+        try:
+            self.mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            self.mtimes[path] = -1
+    
+    def remove(self, path: str):
+        self.mtimes.pop(path, None)
+    
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        time.sleep(min(self.interval, timeout))
+        dirty = set()
+        for path, mtime in list(self.mtimes.items()):
+            try:
+                current = os.stat(path).st_mtime_ns
+            except OSError:
+                current = -1
+            if current != mtime:
+                self.mtimes[path] = current
+                dirty.add(path)
+        return dirty
+    
+    def close(self):
+        pass
+
+
+class TreeWatcher:
+    """Mantiene en memoria el árbol escaneado y lo actualiza con los cambios del disco.
+    
+    Ante un cambio solo se vuelve a listar el directorio afectado; los
+    tamaños se corrigen subiendo por la cadena de ancestros. Cada cambio se
+    emite como un delta:
+        {'op': 'add', 'parent': ruta, 'node': nodo}
+        {'op': 'remove', 'path': ruta}
+        {'op': 'update', 'path': ruta, 'size': tamaño}
+        {'op': 'size', 'path': ruta_directorio, 'size': tamaño}
+    Los totales de generator.stats siguen describiendo el árbol en memoria.
+    """
+    
+    # Contadores que read_directory acumula y que un refresco no debe volver a sumar
+    REFRESH_COUNTERS = ('total_files', 'total_directories', 'total_size',
+                        'processed_items', 'ignored_items', 'hardlinks')
+    
+    def __init__(self, generator: ProjectTreeGenerator, root_path: str):
+        self.generator = generator
+        self.root_path = root_path
+        self.structure = generator.scan_directory(root_path)
+        if not self.structure:
+            raise RuntimeError("No se pudo generar la estructura del proyecto")
+        if generator.archive is not None:
+            raise ValueError("No se puede vigilar un archivo comprimido: usa un directorio")
+        # La caché de escaneos se valida con el mtime del directorio, que no cambia
+        # al reescribir un archivo: los refrescos tienen que leer el disco
+        generator.close()
+        generator.scan_cache = None
+        
+        try:
+            self.source = InotifySource()
+        except OSError:
+            self.source = PollingSource(generator.config.get('watch_interval', 2.0))
+        
+        self.nodes: Dict[str, TreeNode] = {}
+        self.parents: Dict[str, str] = {}
+        self.depths: Dict[str, int] = {}
+        try:
+            self.index(self.structure, 0, None)
+        except OSError:
+            # Límite de watches de inotify agotado: sondeo
+            self.source.close()
+            self.source = PollingSource(generator.config.get('watch_interval', 2.0))
+            self.nodes.clear()
+            self.index(self.structure, 0, None)
+    
+    def index(self, node: TreeNode, depth: int, parent: Optional[str]):
+        """Registra un subárbol de directorios y empieza a vigilarlo"""
+        stack = [(node, depth, parent)]
+        while stack:
+            current, current_depth, current_parent = stack.pop()
+            path = current.path
+            self.nodes[path] = current
+            self.depths[path] = current_depth
+            if current_parent is not None:
+                self.parents[path] = current_parent
+            self.source.add(path)
+            for child in current.children:
+                if child.is_dir:
+                    stack.append((child, current_depth + 1, path))
+    
+    def unindex(self, node: TreeNode):
+        """Olvida un subárbol eliminado"""
+        if not node.is_dir:
+            return
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            path = current.path
+            self.nodes.pop(path, None)
+            self.parents.pop(path, None)
+            self.depths.pop(path, None)
+            self.source.remove(path)
+            stack.extend(child for child in current.children if child.is_dir)
+    
+    def refresh_directory(self, path: str) -> List[Dict]:
+        """Vuelve a listar un directorio y devuelve los deltas respecto al árbol en memoria"""
+        node = self.nodes.get(path)
+        if node is None:
+            return []
+        stats = self.generator.stats
+        saved = {key: stats[key] for key in self.REFRESH_COUNTERS}
+        saved_reasons = dict(stats['ignored_by_reason'])
+        # Archivos, directorios y bytes que entran (positivo) o salen (negativo) del árbol
+        change = [0, 0, 0]
+        try:
+            deltas = self.relist(node, change)
+        finally:
+            stats.update(saved)
+            stats['ignored_by_reason'].update(saved_reasons)
+        stats['total_files'] += change[0]
+        stats['total_directories'] += change[1]
+        stats['total_size'] += change[2]
+        return deltas
+    
+    def relist(self, node: TreeNode, change: List[int]) -> List[Dict]:
+        """Compara el listado actual de un directorio con sus hijos en memoria"""
+        children = self.generator.read_directory(node)
+        if children is None:
+            # El directorio ha desaparecido: lo notificará su padre
+            return []
+        
+        path = node.path
+        depth = self.depths[path]
+        previous = {child.name: child for child in node.children}
+        new_children = []
+        deltas = []
+        for child in children:
+            old = previous.pop(child.name, None)
+            if old is not None and old.is_dir == child.is_dir:
+                if not child.is_dir and old.size != child.size:
+                    change[2] += child.size - old.size
+                    old.size = child.size
+                    deltas.append({'op': 'update', 'path': old.path, 'size': old.size})
+                new_children.append(old)
+                continue
+            if old is not None:
+                self.count(old, change, -1)
+                self.unindex(old)
+                deltas.append({'op': 'remove', 'path': old.path})
+            if child.is_dir:
+                if not self.generator.scan_node(child, depth + 1):
+                    continue
+                self.index(child, depth + 1, path)
+            self.count(child, change, 1)
+            new_children.append(child)
+            deltas.append({'op': 'add', 'parent': path, 'node': child})
+        
+        for old in previous.values():
+            self.count(old, change, -1)
+            self.unindex(old)
+            deltas.append({'op': 'remove', 'path': old.path})
+        
+        node.children = new_children
+        deltas.extend(self.propagate_size(path))
+        return deltas
+    
+    @staticmethod
+    def count(node: TreeNode, change: List[int], sign: int):
+        """Suma (o resta) a change los archivos, directorios y bytes de un subárbol"""
+        change[2] += sign * node.size
+        if not node.is_dir:
+            change[0] += sign
+            return
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            change[1] += sign
+            for child in current.children:
+                if child.is_dir:
+                    stack.append(child)
+                else:
+                    change[0] += sign
+    
+    def propagate_size(self, path: str) -> List[Dict]:
+        """Recalcula el tamaño del directorio y aplica la diferencia a sus ancestros"""
+        node = self.nodes[path]
+        new_size = sum(child.size for child in node.children)
+        difference = new_size - node.size
+        if not difference:
+            return []
+        deltas = []
+        while path is not None:
+            node = self.nodes[path]
+            node.size += difference
+            deltas.append({'op': 'size', 'path': path, 'size': node.size})
+            path = self.parents.get(path)
+        return deltas
+    
+    def resync(self) -> List[Dict]:
+        """Reconcilia todos los directorios vigilados (tras desbordarse la cola de eventos)"""
+        deltas = []
+        for path in sorted(self.nodes, key=lambda p: self.depths.get(p, 0)):
+            deltas.extend(self.refresh_directory(path))
+        return deltas
+    
+    def watch(self, stop: Optional[threading.Event] = None,
+              timeout: float = 15.0) -> Iterator[List[Dict]]:
+        """Produce lotes de deltas según llegan los cambios.
+        
+        Tras `timeout` segundos sin cambios produce un lote vacío, que sirve
+        para comprobar si el consumidor sigue ahí.
+        """
+        try:
+            while stop is None or not stop.is_set():
+                dirty = self.source.wait(timeout)
+                if dirty is None:
+                    deltas = self.resync()
+                else:
+                    deltas = []
+                    # Primero los más superficiales: así no se refresca lo ya eliminado
+                    for path in sorted(dirty, key=lambda p: self.depths.get(p, 0)):
+                        deltas.extend(self.refresh_directory(path))
+                yield deltas
+        finally:
+            self.source.close()
+    
+    def format_delta(self, delta: Dict) -> Optional[str]:
+        """Línea legible para la CLI (los cambios de tamaño de directorio se omiten)"""
+        if delta['op'] == 'add':
+            node = delta['node']
+            size_info = ""
+            if self.generator.config['show_sizes'] and not node.is_dir:
+                size_info = f" ({self.generator.format_size(node.size)})"
+            return f"{Colors.OKGREEN}+ {node.icon} {node.path}{size_info}{Colors.ENDC}"
+        if delta['op'] == 'remove':
+            return f"{Colors.FAIL}- {delta['path']}{Colors.ENDC}"
+        if delta['op'] == 'update':
+            return f"{Colors.WARNING}~ {delta['path']} ({self.generator.format_size(delta['size'])}){Colors.ENDC}"
+        return None
+
+
+def watch_tree(generator: ProjectTreeGenerator, root_path: str, output: Optional[str] = None):
+    """Muestra el árbol inicial y después solo los cambios, hasta Ctrl+C"""
+    watcher = TreeWatcher(generator, root_path)
+    chunks = generator.iter_format(watcher.structure, generator.walk(watcher.structure))
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.writelines(chunks)
+        print(f"{Colors.OKGREEN}✅ Árbol generado exitosamente en: {output}{Colors.ENDC}")
+    else:
+        sys.stdout.writelines(chunks)
+    
+    source = 'inotify' if isinstance(watcher.source, InotifySource) else 'sondeo'
+    print(f"{Colors.OKCYAN}👀 Vigilando {root_path} ({source}). Ctrl+C para salir{Colors.ENDC}", flush=True)
+    for deltas in watcher.watch():
+        for delta in deltas:
+            line = watcher.format_delta(delta)
+            if line:
+                print(line, flush=True)
+
+
 def parse_arguments():
     """Parsea los argumentos de línea de comandos"""
     parser = argparse.ArgumentParser(
@@ -444,23 +3220,73 @@ Ejemplos:
   %(prog)s --debug --stats --max-depth 5      # Con debug y límite de profundidad
   %(prog)s --ignore-files "*.log,*.tmp"       # Ignorar archivos específicos
   %(prog)s --project-name "Mi Proyecto"       # Nombre personalizado
+  %(prog)s --format ndjson -o tree.ndjson     # Un registro JSON por nodo
+  %(prog)s --profile perfil.json              # Tiempo por fase en JSON
+  %(prog)s / -x --no-follow-symlinks          # Sin cruzar montajes ni seguir enlaces
+  %(prog)s rootfs.tar.gz --max-depth 3        # Árbol de un tar/zip/ipk sin extraerlo
+  %(prog)s repo1 repo2 --output-dir arboles   # Lote: un árbol por raíz y resumen.json
+  %(prog)s --manifest repos.txt -P 8          # Raíces de un manifiesto en 8 procesos
+  %(prog)s build --top 20                     # Los 20 archivos y directorios que más ocupan
+  %(prog)s rootfs --find-duplicates --stats   # Marcar duplicados y el espacio que desperdician
+  %(prog)s --snapshot hoy.snap                # Instantánea con hashes por directorio
+  %(prog)s --diff ayer.snap hoy.snap          # Solo lo añadido, eliminado o modificado
         """
     )
     
     # Argumentos básicos
-    parser.add_argument('path', nargs='?', default='.', 
-                       help='Ruta del proyecto (por defecto: directorio actual)')
-    parser.add_argument('--format', choices=['ascii', 'markdown', 'mermaid', 'json'], 
-                       default='ascii', help='Formato de salida')
+    parser.add_argument('path', nargs='*',
+                       help='Rutas de los proyectos o archivos tar/zip/ipk (por defecto: directorio actual; '
+                            'varias = modo lote)')
+    parser.add_argument('--manifest', metavar='ARCHIVO',
+                       help='Archivo con una raíz por línea para el modo lote ("#" para comentarios)')
+    parser.add_argument('--output-dir', default='arboles',
+                       help='Directorio de los árboles y de resumen.json en modo lote (por defecto: arboles)')
+    parser.add_argument('--processes', '-P', type=int, default=os.cpu_count() or 1,
+                       help='Procesos para escanear raíces en paralelo en modo lote (por defecto: núcleos)')
+    parser.add_argument('--format', choices=FORMATS, 
+                       default='ascii', help='Formato de salida (ndjson: un registro por nodo)')
+    parser.add_argument('--compact', action='store_true',
+                       help='Con --format json, escribir el JSON sin indentación')
     parser.add_argument('--output', '-o', help='Archivo de salida')
+    parser.add_argument('--watch', action='store_true',
+                       help='Seguir vigilando la ruta y mostrar los cambios (inotify o sondeo)')
+    parser.add_argument('--watch-interval', type=float, default=2.0,
+                       help='Segundos entre sondeos cuando no hay inotify (por defecto: 2)')
+    
+    parser.add_argument('--find-duplicates', action='store_true',
+                       help='Marcar los archivos con contenido idéntico (tamaño, prefijo y hash completo) '
+                            'y sumar el espacio desperdiciado')
+    parser.add_argument('--top', type=int, default=0, metavar='N',
+                       help='Resumir en vez de dibujar el árbol: los N archivos y directorios más grandes '
+                            'y el total por tipo (ascii, markdown o json)')
+    
+    # Instantáneas
+    parser.add_argument('--snapshot', metavar='ARCHIVO',
+                       help='Guardar una instantánea del árbol (tamaño, mtime y hash por directorio) en vez de mostrarlo')
+    parser.add_argument('--digest', action='store_true',
+                       help='Con --snapshot, guardar un digest del contenido de cada archivo (lee todos los archivos)')
+    parser.add_argument('--diff', nargs=2, metavar=('ANTES', 'DESPUES'),
+                       help='Mostrar lo añadido, eliminado o modificado entre dos instantáneas (ascii, markdown o json)')
     
     # Filtros
     parser.add_argument('--ignore-dirs', default='.git,__pycache__,venv,.pytest_cache,node_modules,dist,build',
-                       help='Directorios a ignorar (separados por comas)')
+                       help='Directorios a ignorar (separados por comas; con "/" se anclan a la raíz)')
     parser.add_argument('--ignore-files', default='*.pyc,*.tmp,*.log,*.DS_Store,Thumbs.db',
-                       help='Archivos a ignorar (separados por comas)')
+                       help='Archivos a ignorar (separados por comas; con "/" se anclan a la raíz)')
+    parser.add_argument('--gitignore', action='store_true',
+                       help='Respetar los archivos .gitignore del proyecto (incluidos los anidados)')
+    parser.add_argument('--cache-dir',
+                       help='Directorio para la caché persistente de listados (reutiliza los directorios sin cambios)')
     parser.add_argument('--max-depth', type=int, default=0,
                        help='Profundidad máxima (0 = sin límite)')
+    parser.add_argument('--follow-symlinks', action='store_true', default=True,
+                       help='Entrar en los enlaces simbólicos a directorios (por defecto; los bucles se podan)')
+    parser.add_argument('--no-follow-symlinks', dest='follow_symlinks', action='store_false',
+                       help='Listar los enlaces simbólicos sin resolver su destino')
+    parser.add_argument('--one-file-system', '-x', action='store_true',
+                       help='No entrar en directorios montados desde otro sistema de archivos')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                       help='Hilos para escanear subdirectorios en paralelo (por defecto: 1)')
     
     # Opciones de visualización
     parser.add_argument('--show-hidden', action='store_true',
@@ -473,6 +3299,10 @@ Ejemplos:
     # Opciones de debug y personalización
     parser.add_argument('--debug', action='store_true',
                        help='Mostrar información de debug')
+    parser.add_argument('--debug-full', action='store_true',
+                       help='Como --debug, pero conservando la lista completa de elementos ignorados')
+    parser.add_argument('--profile', metavar='ARCHIVO',
+                       help='Guardar en JSON el tiempo por fase, entradas/s y directorios más lentos')
     parser.add_argument('--stats', action='store_true',
                        help='Mostrar estadísticas del proyecto')
     parser.add_argument('--show-config', action='store_true',
@@ -483,38 +3313,101 @@ Ejemplos:
     return parser.parse_args()
 
 
+def split_patterns(value: str) -> List[str]:
+    """Convierte una lista de patrones separados por comas en una lista"""
+    return [p.strip() for p in value.split(',')]
+
+
+def build_config(args: argparse.Namespace) -> Dict:
+    """Construye la configuración del generador a partir de los argumentos"""
+    return {
+        'format': args.format,
+        'ignore_dirs': split_patterns(args.ignore_dirs),
+        'ignore_files': split_patterns(args.ignore_files),
+        'gitignore': args.gitignore,
+        'max_depth': args.max_depth,
+        'follow_symlinks': args.follow_symlinks,
+        'one_file_system': args.one_file_system,
+        'jobs': max(1, args.jobs),
+        'cache_dir': args.cache_dir,
+        'top': max(0, args.top),
+        'find_duplicates': args.find_duplicates,
+        'snapshot': args.snapshot,
+        'digest': args.digest,
+        'compact': args.compact,
+        'watch_interval': args.watch_interval,
+        'show_hidden': args.show_hidden,
+        'show_sizes': args.show_sizes,
+        'debug': args.debug or args.debug_full,
+        'debug_full': args.debug_full,
+        'stats': args.stats,
+        'profile': args.profile,
+        'show_config': args.show_config,
+        'project_name': args.project_name
+    }
+
+
 def main():
     """Función principal"""
     try:
         args = parse_arguments()
         
         # Configurar generador
-        config = {
-            'format': args.format,
-            'ignore_dirs': [d.strip() for d in args.ignore_dirs.split(',')],
-            'ignore_files': [f.strip() for f in args.ignore_files.split(',')],
-            'max_depth': args.max_depth,
-            'show_hidden': args.show_hidden,
-            'show_sizes': args.show_sizes,
-            'debug': args.debug,
-            'stats': args.stats,
-            'show_config': args.show_config,
-            'project_name': args.project_name
-        }
+        config = build_config(args)
+        
+        if args.diff:
+            generator = ProjectTreeGenerator(config)
+            chunks = generator.iter_diff(*args.diff)
+            if args.output:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    f.writelines(chunks)
+                print(f"{Colors.OKGREEN}✅ Diferencias generadas en: {args.output}{Colors.ENDC}")
+            else:
+                sys.stdout.writelines(chunks)
+            return
+        
+        roots = list(args.path)
+        if args.manifest:
+            roots.extend(read_manifest(args.manifest))
+        if len(roots) > 1 or args.manifest:
+            if args.watch or args.snapshot:
+                raise ValueError("--watch y --snapshot solo admiten una ruta")
+            if not roots:
+                raise ValueError(f"El manifiesto {args.manifest} no contiene rutas")
+            if not batch_tree(roots, config, args.output_dir, max(1, args.processes)):
+                sys.exit(1)
+            return
+        args.path = roots[0] if roots else '.'
         
         # Crear generador
         generator = ProjectTreeGenerator(config)
         
-        # Generar árbol
-        result = generator.generate(args.path)
+        if args.watch:
+            watch_tree(generator, args.path, args.output)
+            return
         
-        # Guardar o mostrar resultado
+        if args.snapshot:
+            meta = generator.write_snapshot(args.path)
+            print(f"{Colors.OKGREEN}✅ Instantánea guardada en: {args.snapshot} "
+                  f"({meta['files']} archivos, {meta['directories']} directorios, "
+                  f"{generator.format_size(meta['size'])}){Colors.ENDC}")
+            return
+        
+        # Generar árbol escribiendo cada trozo en cuanto está listo
         if args.output:
             with open(args.output, 'w', encoding='utf-8') as f:
-                f.write(result)
+                for chunk in generator.iter_generate(args.path):
+                    f.write(chunk)
+            if args.debug:
+                generator.print_debug_info()
             print(f"{Colors.OKGREEN}✅ Árbol generado exitosamente en: {args.output}{Colors.ENDC}")
         else:
-            print(result)
+            for chunk in iter_output(generator, args.path):
+                sys.stdout.write(chunk)
+        
+        if args.profile:
+            with open(args.profile, 'w', encoding='utf-8') as f:
+                json.dump(generator.profile_report(), f, indent=2, ensure_ascii=False)
         
         # Mostrar estadísticas si se solicitó
         if args.stats and not args.debug:
@@ -523,6 +3416,10 @@ def main():
             print(f"  • Archivos: {generator.stats['total_files']}")
             print(f"  • Directorios: {generator.stats['total_directories']}")
             print(f"  • Tamaño total: {generator.format_size(generator.stats['total_size'])}")
+            if args.find_duplicates:
+                duplicates = generator.stats['duplicates']
+                print(f"  • Duplicados: {duplicates['files']} copias de más en {duplicates['groups']} grupos "
+                      f"({generator.format_size(duplicates['wasted_bytes'])} desperdiciados)")
             print(f"  • Tiempo: {processing_time:.2f}s")
     
     except KeyboardInterrupt:
@@ -0,0 +1,24 @@
+"""Configuración común de las pruebas: la de los benchmarks (benchmarks/_common.py)"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from _common import make_config  # noqa: E402  (y la raíz del repositorio en sys.path)
+
+
+@pytest.fixture
+def config():
+    return make_config()
+
+
+def age_tree(root: str, seconds: int = 3600):
+    """Retrasa el mtime de todo el árbol para que quede fuera de la ventana de la caché"""
+    past = os.stat(root).st_mtime - seconds
+    for dir_path, dirs, files in os.walk(root):
+        for name in files:
+            os.utime(os.path.join(dir_path, name), (past, past))
+        os.utime(dir_path, (past, past))
@@ -0,0 +1,22 @@
+"""Árbol de un archivo comprimido leído de su índice: el mismo que el del árbol extraído"""
+
+import shutil
+
+import pytest
+
+from _common import build_tree
+from genProyTree_v2 import ProjectTreeGenerator
+
+
+def render(path: str, config: dict) -> list:
+    """Líneas del árbol sin la raíz, que lleva el nombre del archivo o del directorio"""
+    return ProjectTreeGenerator(config).generate(path).splitlines()[1:]
+
+
+@pytest.mark.parametrize('archive_format', ('tar', 'gztar', 'zip'))
+def test_index_tree_matches_extracted_tree(tmp_path, config, archive_format):
+    root = build_tree(str(tmp_path), 300, per_dir=10, dirs_per_group=5)
+    archive = shutil.make_archive(str(tmp_path / 'rootfs'), archive_format, root_dir=root)
+    extracted = tmp_path / 'extraido'
+    shutil.unpack_archive(archive, str(extracted))
+    assert render(archive, config) == render(str(extracted), config)
@@ -0,0 +1,97 @@
+"""POST /tree/batch: pool de procesos roto, plazo del lote y bytes de cada raíz"""
+
+import asyncio
+import os
+
+import pytest
+
+fastapi = pytest.importorskip('fastapi')
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app as server  # noqa: E402
+from genProyTree_v2 import run_batch, scan_batch_root, summarize_batch  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    with TestClient(server.app) as client:
+        yield client
+    if server.batch_pool is not None:
+        server.batch_pool.shutdown()
+        server.batch_pool = None
+
+
+def make_roots(base: str, count: int) -> list:
+    roots = []
+    for index in range(count):
+        root = os.path.join(base, f'raiz_{index}')
+        os.makedirs(os.path.join(root, 'src'))
+        with open(os.path.join(root, 'src', 'main.py'), 'w') as f:
+            f.write('print()')
+        roots.append(root)
+    return roots
+
+
+def test_broken_pool_is_reported_and_replaced(tmp_path, client):
+    roots = make_roots(str(tmp_path), 2)
+    pool = server.get_batch_pool()
+    # Un proceso que muere deja el pool roto para todo lo que se le envíe después
+    with pytest.raises(Exception):
+        pool.submit(os._exit, 1).result()
+
+    response = client.post('/tree/batch', json={'paths': roots})
+    assert response.status_code == 200
+    data = response.json()
+    assert [result['status'] for result in data['results']] == ['error', 'error']
+    assert data['summary']['failed'] == 2
+    assert server.batch_pool is None
+
+    response = client.post('/tree/batch', json={'paths': roots})
+    data = response.json()
+    assert [result['status'] for result in data['results']] == ['ok', 'ok']
+    assert all('main.py' in result['output'] for result in data['results'])
+
+
+def test_missing_root_does_not_fail_the_batch(tmp_path, client):
+    roots = make_roots(str(tmp_path), 1) + [str(tmp_path / 'no_existe')]
+    data = client.post('/tree/batch', json={'paths': roots}).json()
+    assert [result['status'] for result in data['results']] == ['ok', 'error']
+
+
+def test_pool_scans_every_root(tmp_path, config):
+    roots = make_roots(str(tmp_path), 4)
+    results = list(run_batch(roots, config, processes=2))
+    summary = summarize_batch(results, 1.0)
+    assert (summary['ok'], summary['failed'], summary['files']) == (4, 0, 4)
+    assert sorted(result['root'] for result in results) == sorted(roots)
+
+
+def test_result_bytes_are_utf8_bytes(tmp_path, config):
+    root = tmp_path / 'raíz'
+    (root / 'módulos').mkdir(parents=True)
+    (root / 'módulos' / 'canción_ñandú.py').write_text('x')
+    output_path = str(tmp_path / 'árbol.txt')
+    written = scan_batch_root(str(root), config, output_path)
+    with open(output_path, 'rb') as f:
+        assert written['bytes'] == len(f.read())
+    returned = scan_batch_root(str(root), config)
+    assert returned['bytes'] == len(returned['output'].encode('utf-8')) > len(returned['output'])
+    assert written['bytes'] == returned['bytes']
+
+
+def test_batch_has_an_overall_timeout(tmp_path, client, monkeypatch):
+    roots = make_roots(str(tmp_path), 2)
+    run_root = server.run_batch_root
+
+    async def stuck_second_root(pool, path, config):
+        # Como una raíz encolada tras otras o una llamada al sistema bloqueada
+        if path == roots[1]:
+            await asyncio.sleep(30)
+        return await run_root(pool, path, config)
+
+    monkeypatch.setattr(server, 'REQUEST_TIMEOUT', 0.5)
+    monkeypatch.setattr(server, 'run_batch_root', stuck_second_root)
+    data = client.post('/tree/batch', json={'paths': roots}).json()
+    assert [result['status'] for result in data['results']] == ['ok', 'timeout']
+    assert '0.5s' in data['results'][1]['error']
+    assert data['summary']['wall_seconds'] < 10
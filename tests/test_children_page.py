@@ -0,0 +1,56 @@
+"""/tree/children: las páginas encadenadas por cursor cubren el directorio entero"""
+
+import pytest
+
+from conftest import age_tree
+from genProyTree_v2 import ProjectTreeGenerator
+
+ENTRIES = 1000
+LIMIT = 64
+
+
+@pytest.fixture
+def wide_dir(tmp_path):
+    root = tmp_path / 'ancho'
+    root.mkdir()
+    for index in range(ENTRIES):
+        if index % 100 == 0:
+            (root / f'dir_{index:07d}').mkdir()
+        else:
+            (root / f'archivo_{index:07d}.txt').touch()
+    # Fuera de la ventana en la que la caché de listados no se fía del mtime
+    age_tree(str(root))
+    return str(root)
+
+
+def paginate(list_page) -> list:
+    names = []
+    cursor = None
+    while True:
+        nodes, cursor = list_page(cursor)
+        assert len(nodes) <= LIMIT
+        names.extend(node.name for node in nodes)
+        if cursor is None:
+            return names
+
+
+def full_listing(path: str, config: dict) -> list:
+    return [child.name for child in ProjectTreeGenerator(config).scan_directory(path).children]
+
+
+def test_pages_cover_the_directory(wide_dir, config):
+    generator = ProjectTreeGenerator(config)
+    names = paginate(lambda cursor: generator.list_children(wide_dir, wide_dir, cursor, LIMIT))
+    assert names == full_listing(wide_dir, config)
+    assert len(names) == ENTRIES
+
+
+def test_cached_pages_cover_the_directory(wide_dir, config):
+    pytest.importorskip('fastapi')
+    import app as server
+    page_config = {**server.build_request_config({'show_hidden': True}), 'ignore_dirs': [],
+                   'ignore_files': [], 'cache_dir': None, 'track_mtimes': False}
+    for _ in range(2):
+        # La segunda vuelta sirve las páginas del listado guardado
+        names = paginate(lambda cursor: server.list_children_page(wide_dir, wide_dir, page_config, cursor, LIMIT))
+        assert names == full_listing(wide_dir, config)
@@ -0,0 +1,66 @@
+"""Árboles más profundos que PATH_MAX: mismos recuentos y misma salida por cualquier camino"""
+
+import hashlib
+import re
+
+import pytest
+
+import genProyTree_v2
+from _common import build_deep_tree, remove_deep_tree
+from genProyTree_v2 import FORMATS, ProjectTreeGenerator, open_long_path
+
+DEPTH = 5000
+# Markdown incluye la hora de generación y el tiempo transcurrido
+TIMESTAMPS = re.compile(r'\*\*(Generado|Tiempo de procesamiento):\*\* [^\n]*')
+
+
+@pytest.fixture(scope='module')
+def deep_tree(tmp_path_factory):
+    """DEPTH directorios anidados con un archivo de 3 bytes en cada nivel"""
+    root = build_deep_tree(str(tmp_path_factory.mktemp('profundo')), DEPTH, file_size=3)
+    yield root
+    remove_deep_tree(root, DEPTH)
+
+
+def digest(chunks) -> str:
+    """Hash de la salida sin juntarla: en JSON pasa de 800 MB a esta profundidad"""
+    h = hashlib.blake2b()
+    for chunk in chunks:
+        h.update(TIMESTAMPS.sub('', chunk).encode())
+    return h.hexdigest()
+
+
+@pytest.mark.parametrize('output_format', FORMATS)
+def test_streamed_output_matches_full_scan(deep_tree, config, output_format):
+    # Un hilo escanea mientras renderiza (salvo JSON); aquí se compara con el árbol escaneado entero
+    config = {**config, 'format': output_format}
+    streamed = ProjectTreeGenerator(config)
+    streamed_digest = digest(streamed.iter_generate(deep_tree))
+    full = ProjectTreeGenerator(config)
+    structure, nodes = full.scan_tree(deep_tree, lazy=False)
+    assert digest(full.iter_format(structure, nodes)) == streamed_digest
+    for stats in (streamed.stats, full.stats):
+        assert (stats['total_directories'], stats['total_files'], stats['total_size']) == (DEPTH + 1, DEPTH, 3 * DEPTH)
+
+
+def test_top_counts_deep_tree(deep_tree, config):
+    summary = ProjectTreeGenerator({**config, 'top': 5}).scan_top(deep_tree)
+    assert (summary['directories'], summary['files'], summary['size']) == (DEPTH + 1, DEPTH, 3 * DEPTH)
+
+
+@pytest.mark.parametrize('lazy', (True, False))
+def test_deep_directories_open_relative_to_an_anchor(deep_tree, config, lazy, monkeypatch):
+    """Cada directorio se abre con un openat() relativo, sin resolver otra vez la ruta desde la raíz"""
+    calls = []
+
+    def counting_open_long_path(path):
+        calls.append(path)
+        return open_long_path(path)
+
+    monkeypatch.setattr(genProyTree_v2, 'open_long_path', counting_open_long_path)
+    generator = ProjectTreeGenerator(config)
+    _, nodes = generator.scan_tree(deep_tree, lazy=lazy)
+    assert sum(1 for _ in nodes) == 2 * DEPTH + 1
+    assert generator.stats['total_directories'] == DEPTH + 1
+    # Solo el primer ancla se abre por su ruta completa
+    assert len(calls) <= 1
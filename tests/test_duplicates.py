@@ -0,0 +1,23 @@
+"""--find-duplicates: el filtrado por etapas encuentra lo mismo que hashearlo todo"""
+
+import os
+
+from _common import build_duplicates_tree
+from genProyTree_v2 import ProjectTreeGenerator, hash_file
+
+
+def test_staged_groups_match_full_hash(tmp_path, config):
+    root = build_duplicates_tree(str(tmp_path), 200, 64 * 1024)
+    groups = {}
+    for dir_path, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(dir_path, name)
+            groups.setdefault(hash_file(path)[1], []).append(path)
+    expected = sorted(sorted(group) for group in groups.values() if len(group) > 1)
+
+    generator = ProjectTreeGenerator({**config, 'find_duplicates': True})
+    found = generator.find_duplicates(generator.scan_directory(root))
+    assert sorted(sorted(node.path for node in group) for group in found) == expected
+    # Las copias y los archivos de misma cabecera existen: la prueba no es trivial
+    assert expected
+    assert generator.stats['duplicates']['bytes_read'] < sum(os.path.getsize(p) for g in groups.values() for p in g)
@@ -0,0 +1,47 @@
+"""Reglas de --ignore-dirs/--ignore-files: patrones por nombre frente a patrones anclados"""
+
+import fnmatch
+import random
+
+import pytest
+
+from genProyTree_v2 import IgnoreRules
+
+
+@pytest.mark.parametrize('pattern, rel_path, ignored', [
+    # Sin '/' se compara el nombre a cualquier profundidad
+    ('generated', 'generated', True),
+    ('generated', 'src/generated', True),
+    # Con '/' se ancla a la raíz, también cuando el '/' solo está en el '/**' final
+    ('generated/**', 'generated', True),
+    ('generated/**', 'src/generated', False),
+    ('/generated', 'src/generated', False),
+    ('src/generated/**', 'src/generated', True),
+    ('src/generated/**', 'lib/src/generated', False),
+    ('**/generated/**', 'lib/src/generated', True),
+])
+def test_directory_patterns(pattern, rel_path, ignored):
+    rules = IgnoreRules([pattern], [])
+    name = rel_path.rsplit('/', 1)[-1]
+    assert (rules.match(name, rel_path, True) is not None) == ignored
+
+
+def test_file_patterns_do_not_apply_to_directories():
+    rules = IgnoreRules([], ['*.log', 'build/*.o'])
+    assert rules.match('a.log', 'src/a.log', False) == IgnoreRules.CONFIG
+    assert rules.match('a.o', 'build/a.o', False) == IgnoreRules.CONFIG
+    assert rules.match('a.o', 'src/build/a.o', False) is None
+    assert rules.match('a.log', 'a.log', True) is None
+
+
+def test_compiled_rules_match_fnmatch_loop():
+    # El bucle de fnmatch anterior de should_ignore es la referencia
+    rng = random.Random(0)
+    extensions = ['py', 'js', 'log', 'tmp', 'o', 'pyc', 'md', 'c']
+    patterns = ['*.pyc', '*.tmp', '*.log', 'Thumbs.db', '[ab]*.md', 'test_?.c']
+    patterns += [f'gen_{index}_*.{rng.choice(extensions)}' for index in range(40)]
+    names = [f"{rng.choice(['main', 'a', 'test', 'gen_7_x', 'gen_12_y'])}_{index % 10}.{rng.choice(extensions)}"
+             for index in range(2000)] + ['Thumbs.db', 'test_1.c', 'test_12.c']
+    rules = IgnoreRules([], patterns)
+    expected = [name for name in names if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+    assert [name for name in names if rules.match(name, name, False)] == expected
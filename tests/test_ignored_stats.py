@@ -0,0 +1,78 @@
+"""Elementos ignorados: recuento por motivo, muestra limitada y --debug-full"""
+
+import io
+
+import pytest
+
+from genProyTree_v2 import IGNORED_SAMPLE_SIZE, ProjectTreeGenerator
+
+HIDDEN = 5
+LOGS = 150
+PACKAGES = 4
+TEMPORARY = 3
+# Los ocultos incluyen el propio .gitignore; node_modules hay uno por paquete y otro en la raíz
+EXPECTED = {'hidden': HIDDEN + 1, 'directory': PACKAGES + 1, 'file': LOGS,
+            'gitignore': PACKAGES * TEMPORARY, 'loop': 0, 'filesystem': 0}
+TOTAL = sum(EXPECTED.values())
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = tmp_path / 'proyecto'
+    (root / 'logs').mkdir(parents=True)
+    (root / '.gitignore').write_text('*.tmp\n')
+    for index in range(HIDDEN):
+        (root / f'.oculto_{index}').write_text('x')
+    for index in range(LOGS):
+        (root / 'logs' / f'registro_{index:03d}.log').write_text('x')
+    (root / 'node_modules').mkdir()
+    for package in range(PACKAGES):
+        (root / f'paquete_{package}' / 'node_modules').mkdir(parents=True)
+        (root / f'paquete_{package}' / 'modulo.py').write_text('x' * package)
+        for index in range(TEMPORARY):
+            (root / f'paquete_{package}' / f'cache_{index}.tmp').write_text('x')
+    return str(root)
+
+
+def scan(config, project, **options):
+    generator = ProjectTreeGenerator({
+        **config, 'show_hidden': False, 'gitignore': True, 'ignore_dirs': ['node_modules'],
+        'ignore_files': ['*.log'], 'log_stream': io.StringIO(), **options,
+    })
+    return ''.join(generator.iter_generate(project)), generator
+
+
+@pytest.mark.parametrize('jobs', (1, 4))
+def test_ignored_items_are_counted_exactly_by_reason(project, config, jobs):
+    _, generator = scan(config, project, jobs=jobs)
+    stats = generator.stats
+    assert stats['ignored_by_reason'] == EXPECTED
+    assert stats['ignored_items'] == TOTAL
+    assert len(stats['ignored_sample']) == IGNORED_SAMPLE_SIZE
+    assert (stats['total_files'], stats['total_directories']) == (PACKAGES, PACKAGES + 2)
+    summary = generator.ignored_summary()
+    assert summary.startswith(f'{TOTAL} (') and f'archivos: {LOGS}' in summary
+
+
+def test_markdown_sample_is_capped_with_the_rest_summarised(project, config):
+    output, generator = scan(config, project, format='markdown', debug=True)
+    listed = [line for line in output.partition('## 🚫 Elementos Ignorados')[2].splitlines()
+              if line.startswith('- ')]
+    assert len(listed) == IGNORED_SAMPLE_SIZE + 1
+    assert listed[-1] == f'- ... y {TOTAL - IGNORED_SAMPLE_SIZE} más'
+    # El volcado de --debug enseña solo los 10 primeros
+    generator.print_debug_info()
+    assert f"... y {TOTAL - 10} más" in generator.log_stream.getvalue()
+
+
+@pytest.mark.parametrize('jobs', (1, 4))
+def test_debug_full_keeps_every_ignored_item(project, config, jobs):
+    output, generator = scan(config, project, format='markdown', debug=True, debug_full=True, jobs=jobs)
+    assert len(generator.stats['ignored_sample']) == TOTAL
+    listed = [line for line in output.partition('## 🚫 Elementos Ignorados')[2].splitlines()
+              if line.startswith('- ')]
+    assert len(listed) == TOTAL and 'más' not in listed[-1]
+    assert sum(item.endswith('(archivo ignorado)') for item in generator.stats['ignored_sample']) == LOGS
+    generator.print_debug_info()
+    shown = generator.log_stream.getvalue().partition('Elementos ignorados')[2].partition('Configuración')[0]
+    assert shown.count('(archivo ignorado)') == LOGS and '... y' not in shown
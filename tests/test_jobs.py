@@ -0,0 +1,72 @@
+"""POST /tree/jobs: el plazo empieza al ejecutarse y la admisión cuenta hilos ocupados"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pytest
+
+fastapi = pytest.importorskip('fastapi')
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app as server  # noqa: E402
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Un solo hilo de trabajos y sin cola: un hueco ocupado basta para rechazar"""
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(server, 'job_executor', pool)
+    monkeypatch.setattr(server, 'MAX_JOBS', 1)
+    monkeypatch.setattr(server, 'MAX_QUEUED_JOBS', 0)
+    monkeypatch.setattr(server, 'job_futures', set())
+    yield pool
+    pool.shutdown()
+
+
+def wait_status(client: TestClient, job_id: str, statuses: tuple) -> dict:
+    for _ in range(200):
+        info = client.get(f'/tree/jobs/{job_id}').json()
+        if info['status'] in statuses:
+            return info
+        time.sleep(0.01)
+    raise AssertionError(f"El trabajo sigue en {info['status']}")
+
+
+def test_deadline_starts_when_job_leaves_the_queue(tmp_path, pool):
+    client = TestClient(server.app)
+    release = threading.Event()
+    blocker = pool.submit(release.wait)
+    job = server.TreeJob(str(tmp_path), server.build_request_config({'format': 'ascii'}), timeout=0.1)
+    server.jobs[job.id] = job
+    future = pool.submit(job.run)
+    # Más tiempo en cola que su plazo: no debe darse por vencido sin haber empezado
+    time.sleep(0.3)
+    assert client.get(f'/tree/jobs/{job.id}').json()['status'] == 'queued'
+    release.set()
+    wait([blocker, future])
+    assert client.get(f'/tree/jobs/{job.id}').json()['status'] == 'done'
+
+
+def test_timed_out_job_keeps_its_slot_until_the_thread_returns(tmp_path, pool, monkeypatch):
+    client = TestClient(server.app)
+    release = threading.Event()
+
+    def blocked_output(generator, path):
+        # Como una llamada al sistema colgada: no comprueba el plazo
+        release.wait()
+        yield ''
+
+    monkeypatch.setattr(server, 'iter_output', blocked_output)
+    body = {'path': str(tmp_path), 'format': 'ascii', 'timeout': 0.1}
+    response = client.post('/tree/jobs', json=body)
+    assert response.status_code == 202
+    job_id = response.json()['id']
+    assert wait_status(client, job_id, ('timeout',))['status'] == 'timeout'
+
+    # El trabajo ha vencido pero su hilo sigue ocupado
+    assert client.post('/tree/jobs', json=body).status_code == 429
+
+    release.set()
+    wait(list(server.job_futures))
+    assert client.post('/tree/jobs', json=body).status_code == 202
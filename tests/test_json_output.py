@@ -0,0 +1,14 @@
+"""generate_json: la salida por trozos es la misma que json.dumps del árbol"""
+
+import json
+
+from _common import build_tree
+from genProyTree_v2 import ProjectTreeGenerator
+
+
+def test_iter_json_matches_json_dumps(tmp_path, config):
+    root = build_tree(str(tmp_path), 500, per_dir=10, dirs_per_group=5)
+    generator = ProjectTreeGenerator({**config, 'format': 'json'})
+    structure = generator.scan_directory(root)
+    expected = json.dumps(structure.to_dict(), indent=2, ensure_ascii=False)
+    assert generator.generate_json(structure) == expected
@@ -0,0 +1,103 @@
+"""/metrics tras generar árboles y el perfil que vuelca --profile"""
+
+import json
+import re
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('fastapi')
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app as server  # noqa: E402
+from _common import ROOT, build_tree  # noqa: E402
+from genProyTree_v2 import PHASES  # noqa: E402
+
+FILES = 30
+SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})? (\S+)$')
+
+
+@pytest.fixture
+def project(tmp_path):
+    return build_tree(str(tmp_path), FILES, per_dir=10, name='proyecto')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Métricas y caché de resultados propias: las de otras pruebas no cuentan
+    monkeypatch.setattr(server, 'metrics', server.Metrics(server.METRIC_BUCKETS))
+    monkeypatch.setattr(server, 'result_cache', server.ResultCache(
+        server.RESULT_CACHE_ENTRIES, server.RESULT_CACHE_BYTES, server.RESULT_CACHE_TTL))
+    return TestClient(server.app)
+
+
+def scrape(client) -> dict:
+    """{(métrica, etiquetas): valor} de /metrics"""
+    response = client.get('/metrics')
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    samples = {}
+    for line in response.text.splitlines():
+        if line.startswith('#'):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        samples[(name, labels or '')] = float(value)
+    return samples
+
+
+def test_observe_fills_cumulative_buckets():
+    metrics = server.Metrics(server.METRIC_BUCKETS)
+    for seconds in (0.03, 3.0):
+        metrics.observe('tree_request_seconds', 'format="ascii"', seconds)
+    lines = metrics.render({}).splitlines()
+    assert lines[:2] == ['# HELP tree_request_seconds Tiempo total de generación de un árbol',
+                         '# TYPE tree_request_seconds histogram']
+    buckets = {bound: int(line.rpartition(' ')[2]) for bound, line in zip(
+        [str(bound) for bound in server.METRIC_BUCKETS] + ['+Inf'], lines[2:])}
+    assert buckets['0.025'] == 0
+    assert buckets['0.05'] == buckets['2.5'] == 1
+    assert buckets['5.0'] == buckets['30.0'] == buckets['+Inf'] == 2
+    assert lines[-2:] == ['tree_request_seconds_sum{format="ascii"} 3.03',
+                          'tree_request_seconds_count{format="ascii"} 2']
+
+
+def test_tree_request_is_counted_and_timed_by_phase(project, client):
+    response = client.post('/tree', json={'path': project, 'format': 'markdown'},
+                           headers={'Accept-Encoding': 'identity'})
+    assert response.status_code == 200
+    samples = scrape(client)
+
+    assert samples[('tree_requests_total', 'format="markdown",result="ok"')] == 1
+    assert samples[('tree_request_seconds_count', 'format="markdown"')] == 1
+    bounds = [f'format="markdown",le="{bound}"' for bound in server.METRIC_BUCKETS] + ['format="markdown",le="+Inf"']
+    counts = [samples[('tree_request_seconds_bucket', labels)] for labels in bounds]
+    assert counts == sorted(counts) and counts[-1] == 1
+
+    phases = {labels for name, labels in samples if name == 'tree_phase_seconds_count'}
+    assert phases == {f'phase="{phase}"' for phase in PHASES}
+    assert all(samples[('tree_phase_seconds_count', labels)] == 1 for labels in phases)
+    assert samples[('tree_entries_total', '')] == FILES + 1 + FILES // 10 + 1
+    assert samples[('tree_response_bytes_total', 'encoding="identity"')] == len(response.content)
+
+    # Otro formato: los contadores suman, cada formato en su serie
+    client.post('/tree', json={'path': project, 'format': 'ascii'}, headers={'Accept-Encoding': 'identity'})
+    again = scrape(client)
+    assert again[('tree_requests_total', 'format="ascii",result="ok"')] == 1
+    assert again[('tree_requests_total', 'format="markdown",result="ok"')] == 1
+    assert again[('tree_entries_total', '')] == 2 * samples[('tree_entries_total', '')]
+    assert again[('tree_rendered_bytes_total', '')] > samples[('tree_rendered_bytes_total', '')]
+    assert all(again[('tree_phase_seconds_count', labels)] == 2 for labels in phases)
+
+
+def test_cli_profile_file_loads_as_json(project, tmp_path):
+    profile = tmp_path / 'perfil.json'
+    subprocess.run([sys.executable, 'genProyTree_v2.py', project, '--format', 'ascii',
+                    '--output', str(tmp_path / 'arbol.txt'), '--profile', str(profile)],
+                   cwd=ROOT, capture_output=True, check=True)
+    report = json.loads(profile.read_text(encoding='utf-8'))
+    assert set(report['phases']) == set(PHASES)
+    assert all(seconds >= 0 for seconds in report['phases'].values())
+    assert (report['files'], report['jobs']) == (FILES, 1)
+    assert report['rendered_bytes'] == len((tmp_path / 'arbol.txt').read_bytes())
+    assert report['entries'] >= FILES
+    assert report['total_seconds'] >= report['phases']['scan']
@@ -0,0 +1,70 @@
+"""Salida NDJSON: preorden con los tamaños de directorio al final de cada subárbol"""
+
+import json
+import os
+
+import pytest
+
+from genProyTree_v2 import ProjectTreeGenerator, load_ndjson
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for index in range(30):
+        dir_path = tmp_path / 'raiz' / f'paquete_{index % 3}' / f'modulo_{index}'
+        dir_path.mkdir(parents=True)
+        (dir_path / 'archivo.py').write_text('x' * index)
+    (tmp_path / 'raiz' / 'vacio').mkdir()
+    return str(tmp_path / 'raiz')
+
+
+def records(path: str, config: dict) -> list:
+    output = ProjectTreeGenerator({**config, 'format': 'ndjson'}).generate(path)
+    return [json.loads(line) for line in output.splitlines() if line.strip()]
+
+
+def test_load_ndjson_matches_json(tree, config):
+    output = ProjectTreeGenerator({**config, 'format': 'ndjson'}).generate(tree)
+    expected = json.loads(ProjectTreeGenerator({**config, 'format': 'json'}).generate(tree))
+    assert load_ndjson(output.splitlines()) == expected
+
+
+def test_parents_come_before_children_and_sizes_after_subtrees(tree, config):
+    seen = set()
+    closed = set()
+    sizes = {}
+    for record in records(tree, config):
+        if record['type'] == 'size':
+            assert record['id'] in seen and record['id'] not in closed
+            closed.add(record['id'])
+            sizes[record['id']] = record['size']
+            continue
+        # El padre ya se escribió y su subárbol sigue abierto
+        assert record['parent'] is None or (record['parent'] in seen and record['parent'] not in closed)
+        seen.add(record['id'])
+        if record['type'] == 'directory':
+            assert record['size'] is None
+    assert sizes[0] == sum(range(30))
+    # Cada directorio recibe exactamente un tamaño; el de la raíz es el último registro
+    assert closed == {r['id'] for r in records(tree, config) if r['type'] == 'directory'}
+    assert records(tree, config)[-1] == {'id': 0, 'type': 'size', 'size': sum(range(30))}
+
+
+def test_partial_stream_loads_as_partial_tree(tree, config):
+    """Un prefijo del flujo (p. ej. mientras sigue el escaneo) ya es un árbol coherente"""
+    lines = ProjectTreeGenerator({**config, 'format': 'ndjson'}).generate(tree).splitlines()
+    prefix = lines[:len(lines) // 2]
+    root = load_ndjson(prefix)
+    assert root['path'] == tree
+    # Todos los nodos leídos cuelgan del árbol, y sus rutas siguen la jerarquía
+    loaded = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        loaded += 1
+        for child in node.get('children', ()):
+            assert child['path'] == os.path.join(node['path'], child['name'])
+            stack.append(child)
+    assert loaded == sum(1 for line in prefix if json.loads(line)['type'] != 'size')
+    # La raíz sigue abierta: su tamaño todavía no ha llegado
+    assert root['size'] is None
@@ -0,0 +1,17 @@
+"""--jobs: el escaneo en paralelo produce el mismo árbol que el secuencial"""
+
+import pytest
+
+from _common import build_tree
+from genProyTree_v2 import ProjectTreeGenerator
+
+
+@pytest.mark.parametrize('jobs', (2, 4, 16))
+def test_parallel_scan_matches_sequential(tmp_path, config, jobs):
+    root = build_tree(str(tmp_path), 2000, per_dir=20, dirs_per_group=10)
+    sequential = ProjectTreeGenerator({**config, 'format': 'json', 'jobs': 1})
+    expected = sequential.scan_directory(root).to_dict()
+    parallel = ProjectTreeGenerator({**config, 'format': 'json', 'jobs': jobs})
+    assert parallel.scan_directory(root).to_dict() == expected
+    for key in ('total_files', 'total_directories', 'total_size'):
+        assert parallel.stats[key] == sequential.stats[key]
@@ -0,0 +1,37 @@
+"""Caché de resultados de /tree: un acierto no espera a los escaneos en curso"""
+
+import threading
+
+import pytest
+
+pytest.importorskip('fastapi')
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app as server  # noqa: E402
+
+
+def test_cache_hit_is_served_while_scan_pool_is_busy(tmp_path):
+    (tmp_path / 'src').mkdir()
+    (tmp_path / 'src' / 'main.py').write_text('print()' * 500)
+    client = TestClient(server.app)
+    body = {'path': str(tmp_path), 'format': 'markdown'}
+    headers = {'Accept-Encoding': 'gzip'}
+    first = client.post('/tree', json=body, headers=headers)
+    assert first.status_code == 200
+
+    # Todos los hilos de escaneo ocupados, como con varios árboles grandes en marcha
+    release = threading.Event()
+    blockers = [server.executor.submit(release.wait) for _ in range(server.MAX_WORKERS)]
+    responses = []
+    try:
+        request = threading.Thread(target=lambda: responses.append(
+            client.post('/tree', json=body, headers={**headers, 'If-None-Match': first.headers['etag']})))
+        request.start()
+        request.join(timeout=10)
+        assert responses, "El acierto de caché esperó a que quedara libre un hilo de escaneo"
+        assert responses[0].status_code == 304
+    finally:
+        release.set()
+        for blocker in blockers:
+            blocker.result()
+        request.join()
@@ -0,0 +1,71 @@
+"""Caché de escaneos: transacciones cortas y bloqueo liberado al abandonar un escaneo"""
+
+import os
+import sqlite3
+
+import pytest
+
+from conftest import age_tree
+from genProyTree_v2 import ProjectTreeGenerator, ScanCache, ScanCancelled
+
+
+def build_tree(root: str, dirs: int) -> str:
+    for index in range(dirs):
+        # Un nivel más por módulo: el recorrido perezoso lo lista al llegar a él
+        dir_path = os.path.join(root, f'modulo_{index:04d}', 'interno')
+        os.makedirs(dir_path)
+        with open(os.path.join(dir_path, 'archivo.py'), 'w') as f:
+            f.write('x' * index)
+    age_tree(root)
+    return root
+
+
+def cache_path(cache_dir: str) -> str:
+    return os.path.join(cache_dir, ScanCache.FILENAME)
+
+
+def test_cancelled_scan_commits_and_releases_lock(tmp_path, config):
+    root = build_tree(str(tmp_path / 'arbol'), dirs=ScanCache.COMMIT_EVERY * 3)
+    cache_dir = str(tmp_path / 'cache')
+    generator = ProjectTreeGenerator({**config, 'cache_dir': cache_dir})
+    _, nodes = generator.scan_tree(root)
+    visited = 0
+    with pytest.raises(ScanCancelled):
+        for _ in nodes:
+            visited += 1
+            if visited == ScanCache.COMMIT_EVERY * 3 // 2:
+                generator.cancel()
+
+    # Otra conexión puede escribir sin esperar y ve lo que se llegó a escanear
+    other = sqlite3.connect(cache_path(cache_dir), timeout=0)
+    other.execute('BEGIN IMMEDIATE')
+    other.rollback()
+    assert other.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert other.execute('SELECT COUNT(*) FROM listings').fetchone()[0] > 0
+    other.close()
+    generator.close()
+
+
+def test_store_commits_in_batches(tmp_path):
+    root = build_tree(str(tmp_path / 'arbol'), dirs=ScanCache.COMMIT_EVERY)
+    cache = ScanCache(str(tmp_path / 'cache'))
+    reader = sqlite3.connect(cache_path(str(tmp_path / 'cache')))
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        cache.store(path, os.stat(path), [['interno', True, False, None]])
+    # El último store completa un lote: ya es visible sin flush()
+    assert reader.execute('SELECT COUNT(*) FROM listings').fetchone()[0] == ScanCache.COMMIT_EVERY
+    cache.close()
+    cache.close()
+    reader.close()
+
+
+def test_cached_scan_matches_fresh_scan(tmp_path, config):
+    root = build_tree(str(tmp_path / 'arbol'), dirs=20)
+    cached = {**config, 'cache_dir': str(tmp_path / 'cache')}
+    expected = ProjectTreeGenerator(config).generate(root)
+    for _ in range(2):
+        generator = ProjectTreeGenerator(cached)
+        assert generator.generate(root) == expected
+        generator.close()
+    assert generator.stats['cache']['hits'] == 41
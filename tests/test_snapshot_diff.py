@@ -0,0 +1,45 @@
+"""--diff: bajar solo por los directorios cuyo hash difiere encuentra todos los cambios"""
+
+import os
+import random
+
+from _common import build_tree, tree_file
+from genProyTree_v2 import ProjectTreeGenerator, TreeSnapshot, diff_snapshots
+
+FILES = 2000
+PER_DIR = 20
+DIRS_PER_GROUP = 10
+
+
+def snapshot(root: str, path: str, config: dict) -> TreeSnapshot:
+    ProjectTreeGenerator({**config, 'snapshot': path}).write_snapshot(root)
+    return TreeSnapshot(path)
+
+
+def test_hashed_diff_finds_every_change(tmp_path, config):
+    root = build_tree(str(tmp_path), FILES, PER_DIR, DIRS_PER_GROUP)
+    old = snapshot(root, str(tmp_path / 'antes.snap'), config)
+
+    # Un tercio de altas, un tercio de bajas y un tercio de modificaciones
+    expected = set()
+    rng = random.Random(0)
+    for number, index in enumerate(rng.sample(range(FILES), 30)):
+        path = tree_file(root, index, PER_DIR, DIRS_PER_GROUP)
+        if number % 3 == 0:
+            path = os.path.join(os.path.dirname(path), f'nuevo_{index:07d}.py')
+            with open(path, 'w') as f:
+                f.write('nuevo')
+            expected.add(('added', path))
+        elif number % 3 == 1:
+            os.remove(path)
+            expected.add(('removed', path))
+        else:
+            with open(path, 'a') as f:
+                f.write('cambio')
+            expected.add(('modified', path))
+    new = snapshot(root, str(tmp_path / 'despues.snap'), config)
+
+    found = {(change['change'], os.path.join(root, change['path'])) for change in diff_snapshots(old, new)}
+    old.close()
+    new.close()
+    assert found == expected
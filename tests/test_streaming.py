@@ -0,0 +1,111 @@
+"""POST /tree con "stream": true y el recorrido perezoso en el que se apoya"""
+
+import asyncio
+import json
+
+import pytest
+
+from genProyTree_v2 import ProjectTreeGenerator
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = tmp_path / 'proyecto'
+    for index in range(40):
+        dir_path = root / f'paquete_{index % 4}' / f'modulo_{index % 7}'
+        dir_path.mkdir(parents=True, exist_ok=True)
+        (dir_path / f'archivo_{index:02d}.py').write_text('x' * index)
+    (root / 'vacio').mkdir()
+    # Los últimos de su directorio se ignoran: el conector del anterior pasa a └──
+    (root / 'zz_ignorado').mkdir()
+    (root / 'paquete_0' / 'zz.log').write_text('log')
+    return str(root)
+
+
+def walk_lines(generator, nodes):
+    return [(generator.relative_path(node.path), depth, is_last) for node, depth, is_last in nodes]
+
+
+@pytest.mark.parametrize('max_depth', (0, 2))
+def test_lazy_walk_matches_eager_connectors(project, config, max_depth):
+    config = {**config, 'ignore_dirs': ['zz_ignorado'], 'ignore_files': ['*.log'], 'max_depth': max_depth}
+    lazy = ProjectTreeGenerator(config)
+    structure, nodes = lazy.scan_tree(project, lazy=True)
+    lazy_walk = walk_lines(lazy, nodes)
+
+    eager = ProjectTreeGenerator(config)
+    eager_structure, eager_nodes = eager.scan_tree(project, lazy=False)
+    assert lazy_walk == walk_lines(eager, eager_nodes)
+
+    lazy_ascii = ''.join(ProjectTreeGenerator(config).iter_generate(project))
+    assert lazy_ascii.splitlines()[1:] == eager.generate_ascii_tree(eager_structure).splitlines()[1:]
+    assert '└── 📁 vacio' in lazy_ascii
+
+
+async def post_tree(app, body: dict) -> list:
+    """Mensajes ASGI de un POST /tree, para ver cada bloque tal como sale"""
+    requested = False
+    messages = []
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': json.dumps(body).encode(), 'more_body': False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'http_version': '1.1', 'method': 'POST', 'scheme': 'http',
+             'path': '/tree', 'raw_path': b'/tree', 'root_path': '', 'query_string': b'',
+             'headers': [(b'content-type', b'application/json'), (b'accept-encoding', b'identity')],
+             'server': ('test', 80), 'client': ('test', 1)}
+    await asyncio.wait_for(app(scope, receive, send), timeout=10)
+    return messages
+
+
+@pytest.mark.parametrize('output_format', ('ascii', 'json', 'ndjson'))
+def test_stream_is_chunked_and_identical_to_the_buffered_output(project, output_format, monkeypatch):
+    pytest.importorskip('fastapi')
+    from fastapi.testclient import TestClient
+
+    import app as server
+    # Bloques pequeños: el árbol sale en varios
+    monkeypatch.setattr(server, 'STREAM_CHUNK_BYTES', 256)
+    body = {'path': project, 'format': output_format}
+    buffered = TestClient(server.app).post('/tree', json=body)
+    assert buffered.status_code == 200
+
+    messages = asyncio.run(post_tree(server.app, {**body, 'stream': True}))
+    start, *chunks = messages
+    headers = dict(start['headers'])
+    assert start['status'] == 200
+    # Sin Content-Length el servidor lo envía con Transfer-Encoding: chunked
+    assert b'content-length' not in headers and b'etag' not in headers
+    assert headers[b'content-type'].startswith(b'text/plain')
+    parts = [message['body'] for message in chunks if message['body']]
+    assert len(parts) > 1
+    assert b''.join(parts) == buffered.json()['output'].encode('utf-8')
+
+
+def test_stream_and_json_responses_have_distinct_etags(project, monkeypatch):
+    pytest.importorskip('fastapi')
+    from fastapi.testclient import TestClient
+
+    import app as server
+    monkeypatch.setattr(server, 'result_cache', server.ResultCache(
+        server.RESULT_CACHE_ENTRIES, server.RESULT_CACHE_BYTES, server.RESULT_CACHE_TTL))
+    client = TestClient(server.app)
+    body = {'path': project, 'format': 'ascii'}
+    buffered = client.post('/tree', json=body)
+    # El primer streaming llena la caché; el segundo se sirve de ella con su ETag
+    client.post('/tree', json={**body, 'stream': True})
+    streamed = client.post('/tree', json={**body, 'stream': True})
+    assert streamed.headers['etag'] != buffered.headers['etag']
+    assert streamed.text == buffered.json()['output']
+
+    stale = client.post('/tree', json={**body, 'stream': True}, headers={'If-None-Match': buffered.headers['etag']})
+    assert stale.status_code == 200 and stale.text == streamed.text
+    assert client.post('/tree', json={**body, 'stream': True},
+                       headers={'If-None-Match': streamed.headers['etag']}).status_code == 304
@@ -0,0 +1,20 @@
+"""Bucles de enlaces simbólicos y enlaces duros: se podan y se cuentan una vez"""
+
+import pytest
+
+from _common import FILE_SIZE, build_looped_tree
+from genProyTree_v2 import ProjectTreeGenerator
+
+DIRS = 10
+FILES = 3
+
+
+@pytest.mark.parametrize('jobs', (1, 4))
+def test_loops_are_pruned_and_hardlinks_counted_once(tmp_path, config, jobs):
+    root = build_looped_tree(str(tmp_path), DIRS, FILES)
+    generator = ProjectTreeGenerator({**config, 'jobs': jobs})
+    generator.scan_directory(root)
+    stats = generator.stats
+    assert stats['total_size'] == DIRS * FILES * FILE_SIZE
+    assert stats['hardlinks'] == FILES
+    assert stats['ignored_by_reason']['loop'] == 2 * DIRS
@@ -0,0 +1,83 @@
+"""--top: ranking de lo que más ocupa en ASCII, Markdown y JSON, sin guardar directorios"""
+
+import json
+import os
+
+import pytest
+
+from _common import FILE_SIZE, build_looped_tree
+from genProyTree_v2 import ProjectTreeGenerator
+
+# Ruta relativa -> bytes; grande/ ocupa 400, medio/ 150 y la raíz 600 (la raíz cuenta como directorio)
+FILES = {
+    'grande/datos.bin': 300,
+    'grande/modulo.py': 100,
+    'medio/notas.md': 150,
+    'leeme.txt': 50,
+}
+LARGEST_FILES = ['grande/datos.bin', 'medio/notas.md', 'grande/modulo.py']
+LARGEST_DIRS = ['grande', 'medio']
+
+
+@pytest.fixture
+def project(tmp_path):
+    root = tmp_path / 'proyecto'
+    for path, size in FILES.items():
+        target = root / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(b'x' * size)
+    return str(root)
+
+
+def render(config, root, output_format):
+    generator = ProjectTreeGenerator({**config, 'top': 3, 'format': output_format})
+    return ''.join(generator.iter_generate(root)), generator
+
+
+def positions(text, names):
+    return [text.index(name) for name in names]
+
+
+def test_top_json_ranks_files_directories_and_categories(project, config):
+    output, _ = render(config, project, 'json')
+    summary = json.loads(output)
+    assert (summary['size'], summary['files'], summary['directories']) == (600, 4, 3)
+    assert [item['path'] for item in summary['largest_files']] == LARGEST_FILES
+    assert [item['size'] for item in summary['largest_files']] == [300, 150, 100]
+    assert [item['path'] for item in summary['largest_directories']] == LARGEST_DIRS
+    assert [item['size'] for item in summary['largest_directories']] == [400, 150]
+    sizes = [category['size'] for category in summary['categories']]
+    assert sizes == sorted(sizes, reverse=True) and sum(sizes) == 600
+
+
+@pytest.mark.parametrize('output_format', ('ascii', 'markdown'))
+def test_top_text_lists_in_ranking_order(project, config, output_format):
+    output, _ = render(config, project, output_format)
+    directories, _, files = output.partition('Archivos más grandes')
+    assert 'Directorios más grandes' in directories
+    assert positions(directories, [f'{name}/' for name in LARGEST_DIRS]) == sorted(
+        positions(directories, [f'{name}/' for name in LARGEST_DIRS]))
+    assert positions(files, LARGEST_FILES) == sorted(positions(files, LARGEST_FILES))
+    # top = 3: el cuarto archivo no entra
+    assert 'leeme.txt' not in files.partition('Por tipo de archivo')[0]
+    if output_format == 'markdown':
+        assert output.startswith('# 📊 ')
+        assert '| 1 | ' in files and '`grande/datos.bin`' in files
+    else:
+        assert '    1. ' in files
+
+
+def test_top_keeps_only_the_open_chain_and_the_root_mtime(project, config):
+    _, generator = render({**config, 'track_mtimes': True}, project, 'json')
+    assert generator.visited_dirs is None
+    assert generator.open_identities == set()
+    assert list(generator.dir_mtimes) == [os.path.abspath(project)]
+
+
+def test_top_prunes_loops_without_a_global_set(tmp_path, config):
+    dirs, files = 5, 2
+    root = build_looped_tree(str(tmp_path), dirs, files)
+    output, generator = render(config, root, 'json')
+    summary = json.loads(output)
+    assert generator.stats['ignored_by_reason']['loop'] == 2 * dirs
+    assert summary['largest_files'][0]['size'] == FILE_SIZE
@@ -0,0 +1,21 @@
+"""POST /tree genera en proceso la misma salida que la CLI"""
+
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('fastapi')
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app as server  # noqa: E402
+from _common import ROOT, build_tree  # noqa: E402
+
+
+def test_in_process_output_matches_cli(tmp_path):
+    path = build_tree(str(tmp_path), 200, per_dir=10, name='proyecto')
+    cli = subprocess.run([sys.executable, 'genProyTree_v2.py', path, '--format', 'ascii',
+                          '--ignore-dirs', '', '--ignore-files', '', '--max-depth', '0', '--show-sizes'],
+                         cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    response = TestClient(server.app).post('/tree', json={'path': path, 'format': 'ascii'})
+    assert response.json()['output'] == cli
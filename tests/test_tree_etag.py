@@ -0,0 +1,87 @@
+"""ETag de /tree: cambia con el contenido de los archivos, no con volver a renderizar"""
+
+import os
+
+import pytest
+
+pytest.importorskip('fastapi')
+
+import app as server  # noqa: E402
+from conftest import age_tree  # noqa: E402
+
+
+@pytest.fixture
+def repo(tmp_path):
+    root = tmp_path / 'repositorio'
+    (root / 'src').mkdir(parents=True)
+    (root / 'src' / 'a.py').write_text('a' * 10)
+    (root / 'src' / 'b.py').write_text('b' * 10)
+    return str(root)
+
+
+def etag(path: str, output_format: str = 'markdown') -> str:
+    config = server.build_request_config({'path': path, 'format': output_format})
+    return server.render_tree(path, config).etag
+
+
+@pytest.mark.parametrize('output_format', ('markdown', 'ascii', 'json'))
+def test_unchanged_tree_keeps_its_etag(repo, output_format):
+    assert etag(repo, output_format) == etag(repo, output_format)
+
+
+def test_rewrite_without_directory_change_changes_etag(repo):
+    before = etag(repo)
+    src = os.path.join(repo, 'src')
+    dir_stat = os.stat(src)
+    # Uno crece y otro encoge lo mismo: ni el mtime del directorio ni los totales cambian
+    with open(os.path.join(src, 'a.py'), 'w') as f:
+        f.write('a' * 13)
+    with open(os.path.join(src, 'b.py'), 'w') as f:
+        f.write('b' * 7)
+    os.utime(src, ns=(dir_stat.st_atime_ns, dir_stat.st_mtime_ns))
+    assert etag(repo) != before
+
+
+def test_same_size_rewrite_changes_etag(repo):
+    before = etag(repo)
+    path = os.path.join(repo, 'src', 'a.py')
+    mtime = os.stat(path).st_mtime_ns
+    with open(path, 'w') as f:
+        f.write('z' * 10)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+    assert etag(repo) != before
+
+
+def test_refresh_is_304_until_the_tree_changes(repo):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(server.app)
+    body = {'path': repo, 'format': 'markdown'}
+    first = client.post('/tree', json=body)
+    assert first.status_code == 200
+    headers = {'If-None-Match': first.headers['etag']}
+    assert client.post('/tree', json=body, headers=headers).status_code == 304
+
+    with open(os.path.join(repo, 'src', 'nuevo.py'), 'w') as f:
+        f.write('cambio')
+    changed = client.post('/tree', json=body, headers=headers)
+    assert changed.status_code == 200
+    assert 'nuevo.py' in changed.text
+
+
+def test_scan_cache_does_not_hide_in_place_rewrites(repo, tmp_path, monkeypatch):
+    age_tree(repo)
+    monkeypatch.setattr(server, 'CACHE_DIR', str(tmp_path / 'cache'))
+    before = etag(repo)
+    # La segunda pasada lista desde la caché y da el mismo ETag
+    assert etag(repo) == before
+
+    src = os.path.join(repo, 'src')
+    dir_stat = os.stat(src)
+    path = os.path.join(src, 'a.py')
+    mtime = os.stat(path).st_mtime_ns
+    with open(path, 'w') as f:
+        f.write('z' * 10)
+    os.utime(path, ns=(mtime + 10**9, mtime + 10**9))
+    os.utime(src, ns=(dir_stat.st_atime_ns, dir_stat.st_mtime_ns))
+    assert etag(repo) != before
@@ -0,0 +1,145 @@
+"""--watch y /tree/watch: deltas de altas, bajas, cambios y tamaños sobre el árbol en memoria"""
+
+import asyncio
+import json
+import os
+from urllib.parse import urlencode
+
+import pytest
+
+import genProyTree_v2
+from conftest import age_tree
+from genProyTree_v2 import PollingSource, ProjectTreeGenerator, TreeWatcher
+
+
+def no_inotify():
+    raise OSError("sin inotify")
+
+
+@pytest.fixture
+def repo(tmp_path):
+    root = tmp_path / 'repositorio'
+    (root / 'src').mkdir(parents=True)
+    (root / 'src' / 'a.py').write_text('a' * 10)
+    (root / 'src' / 'b.py').write_text('b' * 20)
+    (root / 'docs').mkdir()
+    (root / 'docs' / 'README.md').write_text('r' * 5)
+    # Fuera de la ventana de mtime de la caché de escaneos
+    age_tree(str(root))
+    return str(root)
+
+
+def rewrite_in_place(path: str, content: str):
+    """Reescribe un archivo sin que cambie el mtime de su directorio"""
+    parent = os.stat(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write(content)
+    os.utime(os.path.dirname(path), ns=(parent.st_atime_ns, parent.st_mtime_ns))
+
+
+def test_polling_source_reports_every_kind_of_delta(repo, config, monkeypatch):
+    monkeypatch.setattr(genProyTree_v2, 'InotifySource', no_inotify)
+    watcher = TreeWatcher(ProjectTreeGenerator({**config, 'watch_interval': 0.01}), repo)
+    assert isinstance(watcher.source, PollingSource)
+    src = os.path.join(repo, 'src')
+    with open(os.path.join(src, 'a.py'), 'w') as f:
+        f.write('a' * 15)
+    os.remove(os.path.join(src, 'b.py'))
+    os.mkdir(os.path.join(src, 'nuevo'))
+    with open(os.path.join(src, 'nuevo', 'c.py'), 'w') as f:
+        f.write('c' * 7)
+
+    deltas = next(watcher.watch(timeout=1))
+    by_op = {}
+    for delta in deltas:
+        by_op.setdefault(delta['op'], []).append(delta)
+    assert by_op['update'] == [{'op': 'update', 'path': os.path.join(src, 'a.py'), 'size': 15}]
+    assert by_op['remove'] == [{'op': 'remove', 'path': os.path.join(src, 'b.py')}]
+    [added] = by_op['add']
+    assert (added['parent'], added['node'].name, added['node'].size) == (src, 'nuevo', 7)
+    assert by_op['size'] == [{'op': 'size', 'path': src, 'size': 22},
+                             {'op': 'size', 'path': repo, 'size': 27}]
+    # Los totales describen el árbol actual, no la suma de todos los listados
+    stats = watcher.generator.stats
+    assert (stats['total_files'], stats['total_directories'], stats['total_size']) == (3, 4, 27)
+
+
+def test_rewrite_is_seen_with_a_warm_scan_cache(repo, config, tmp_path):
+    config = {**config, 'cache_dir': str(tmp_path / 'cache')}
+    warm = ProjectTreeGenerator(config)
+    warm.scan_directory(repo)
+    warm.close()
+
+    watcher = TreeWatcher(ProjectTreeGenerator(config), repo)
+    assert watcher.generator.stats['cache']['hits'] > 0
+    src = os.path.join(repo, 'src')
+    rewrite_in_place(os.path.join(src, 'a.py'), 'a' * 12)
+    deltas = watcher.refresh_directory(src)
+    assert deltas == [{'op': 'update', 'path': os.path.join(src, 'a.py'), 'size': 12},
+                      {'op': 'size', 'path': src, 'size': 32},
+                      {'op': 'size', 'path': repo, 'size': 37}]
+    assert watcher.refresh_directory(src) == []
+    assert watcher.generator.stats['total_directories'] == 3
+
+
+async def watch_events(app, path: str, on_snapshot) -> list:
+    """Eventos SSE de /tree/watch hasta el primer delta, y luego desconecta.
+
+    TestClient espera a que termine la respuesta, y esta no termina nunca:
+    se habla ASGI directamente.
+    """
+    disconnected = asyncio.Event()
+    requested = False
+    events = []
+    buffer = ''
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal buffer
+        if message['type'] != 'http.response.body':
+            return
+        buffer += message.get('body', b'').decode('utf-8')
+        while '\n\n' in buffer:
+            block, buffer = buffer.split('\n\n', 1)
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+            if 'event' not in fields:
+                continue
+            events.append((fields['event'], json.loads(fields['data'])))
+            if fields['event'] == 'snapshot':
+                on_snapshot()
+            else:
+                disconnected.set()
+
+    scope = {'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+             'path': '/tree/watch', 'raw_path': b'/tree/watch', 'root_path': '',
+             'query_string': urlencode({'path': path}).encode(), 'headers': [],
+             'server': ('test', 80), 'client': ('test', 1)}
+    await asyncio.wait_for(app(scope, receive, send), timeout=10)
+    return events
+
+
+def test_tree_watch_sends_snapshot_then_deltas(repo, monkeypatch):
+    pytest.importorskip('fastapi')
+    import app as server
+    monkeypatch.setattr(server, 'WATCH_KEEPALIVE', 0.05)
+
+    def add_file():
+        with open(os.path.join(repo, 'docs', 'nuevo.md'), 'w') as f:
+            f.write('n' * 3)
+
+    (first, snapshot), (second, deltas) = asyncio.run(watch_events(server.app, repo, add_file))
+    assert first == 'snapshot'
+    assert snapshot['name'] == 'repositorio' and snapshot['size'] == 35
+    assert second == 'delta'
+    [added] = [delta for delta in deltas if delta['op'] == 'add']
+    assert added['parent'] == os.path.join(repo, 'docs')
+    assert (added['node']['name'], added['node']['size']) == ('nuevo.md', 3)
+    assert {'op': 'size', 'path': repo, 'size': 38} in deltas
+    assert server.active_watchers == 0